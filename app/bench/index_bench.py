@@ -0,0 +1,253 @@
+"""
+索引基准测试, 比较建立索引 (迁移版本 2) 前后列表接口筛选查询的耗时与查询计划
+
+在临时 SQLite 数据库中生成题目、知识点与错题数据 (默认 100 万道题目), 先在没有
+二级索引的结构上执行各查询, 再建立模型中声明的全部索引后重复执行
+
+用法:
+    python -m app.bench.index_bench --questions 1000000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Connection, Select, false, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from ..db import KnowledgePoint, MistakeRecord, Question, StudentInfo
+from ..db.config import Base, apply_sqlite_pragmas, sqlite_pragmas
+from ..db.migrations import create_indexes
+from ..db.models.question import question_knowledge_association
+from ..routers._pagination import keyset
+
+SUBJECTS = ("语文", "数学", "英语", "物理", "化学", "生物", "历史", "地理", "政治")
+START = datetime.fromisoformat("2026-01-01 00:00:00")
+GRADES = tuple(f"{n}年级" for n in "一二三四五六七八九")
+QUESTION_TYPES = ("单选", "多选", "填空", "简答")
+
+BATCH = 20000
+PAGE_SIZE = 50
+
+
+def _created_at(i: int) -> str:
+    return (START + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _batches(rows: Iterator[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _insert(conn: AsyncConnection, table: Any, rows: Iterator[dict]) -> None:
+    for batch in _batches(rows):
+        await conn.execute(insert(table), batch)
+
+
+async def seed(conn: AsyncConnection, args: argparse.Namespace) -> None:
+    kps = [
+        {
+            "id": f"kp-{i}",
+            "name": f"知识点{i}",
+            "subject": SUBJECTS[i % len(SUBJECTS)],
+            "level": 1,
+        }
+        for i in range(args.knowledge_points)
+    ]
+    await _insert(conn, KnowledgePoint, iter(kps))
+    await _insert(
+        conn,
+        Question,
+        (
+            {
+                "id": f"q-{i}",
+                "title": f"压测题目 {i}",
+                "question_type": random.choice(QUESTION_TYPES),
+                "subject": random.choice(SUBJECTS),
+                "grade": random.choice(GRADES),
+                "difficulty": random.randint(1, 5),
+                "answer": "A",
+                "created_at": _created_at(i),
+            }
+            for i in range(args.questions)
+        ),
+    )
+    await _insert(
+        conn,
+        question_knowledge_association,
+        (
+            {"question_id": f"q-{i}", "knowledge_point_id": kp["id"]}
+            for i in range(args.questions)
+            for kp in random.sample(kps, 2)
+        ),
+    )
+    await _insert(
+        conn,
+        StudentInfo,
+        (
+            {"student_id": f"s-{i}", "student_name": "压测学生", "gender": "女"}
+            for i in range(args.students)
+        ),
+    )
+    await _insert(
+        conn,
+        MistakeRecord,
+        (
+            {
+                "id": f"m-{i}",
+                "question_id": f"q-{random.randrange(args.questions)}",
+                "student_id": f"s-{random.randrange(args.students)}",
+                "is_resolved": random.random() < 0.3,
+            }
+            for i in range(args.mistakes)
+        ),
+    )
+
+
+def queries(args: argparse.Namespace) -> dict[str, Select]:
+    """各列表接口的典型筛选条件与分页, 与路由中构造的查询一致"""
+    keys = (Question.created_at, Question.id)
+    # 按创建时间倒序的第 offset 行, 即深页游标指向的位置
+    offset = args.questions // 2
+    i = args.questions - 1 - offset
+    after = [_created_at(i), f"q-{i}"]
+    return {
+        "题目: 学科+年级+题型+难度": select(Question).where(
+            Question.subject == "数学",
+            Question.grade == "七年级",
+            Question.question_type == "单选",
+            Question.difficulty == 3,
+        ),
+        "题目: 学科+年级": select(Question).where(
+            Question.subject == "数学", Question.grade == "七年级"
+        ),
+        "题目: 年级+题型": select(Question).where(
+            Question.grade == "七年级", Question.question_type == "填空"
+        ),
+        "题目: 题型+难度": select(Question).where(
+            Question.question_type == "简答", Question.difficulty == 5
+        ),
+        "题目: 知识点": select(Question)
+        .join(question_knowledge_association)
+        .join(KnowledgePoint)
+        .where(KnowledgePoint.name == "知识点7"),
+        "知识点: 名称+学科": select(KnowledgePoint).where(
+            KnowledgePoint.name == "知识点7", KnowledgePoint.subject == SUBJECTS[7]
+        ),
+        "错题: 学生": select(MistakeRecord).where(
+            MistakeRecord.student_id == f"s-{args.students // 2}"
+        ),
+        "错题: 学生+未解决": select(MistakeRecord).where(
+            MistakeRecord.student_id == f"s-{args.students // 2}",
+            MistakeRecord.is_resolved == false(),
+        ),
+        "错题: 学生+题目": select(MistakeRecord).where(
+            MistakeRecord.student_id == f"s-{args.students // 2}",
+            MistakeRecord.question_id == "q-7",
+        ),
+        "分页: 第 1 页": keyset(select(Question), keys, None, PAGE_SIZE),
+        "分页: 中间页 (游标)": keyset(select(Question), keys, after, PAGE_SIZE),
+        "分页: 中间页 (OFFSET)": select(Question)
+        .order_by(*(key.desc() for key in keys))
+        .offset(offset)
+        .limit(PAGE_SIZE),
+        "分页: 学科, 第 1 页": keyset(
+            select(Question).where(Question.subject == "数学"), keys, None, PAGE_SIZE
+        ),
+        "分页: 学科, 中间页 (游标)": keyset(
+            select(Question).where(Question.subject == "数学"), keys, after, PAGE_SIZE
+        ),
+    }
+
+
+def _create_all_indexes(conn: Connection) -> None:
+    """create_indexes 与迁移版本 5 建立的唯一索引, 生成的数据不含重复项"""
+    create_indexes(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.unique:
+                index.create(conn, checkfirst=True)
+
+
+async def measure(
+    conn: AsyncConnection, query: Select, repeat: int
+) -> tuple[float, int, str]:
+    """返回耗时中位数 (毫秒)、结果行数与查询计划"""
+    sql = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    durations, rows = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = (await conn.execute(query)).all()
+        durations.append(time.perf_counter() - start)
+    detail = "; ".join(row.detail for row in plan)
+    return statistics.median(durations) * 1000, len(rows), detail
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{workdir}/bench.sqlite3")
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    await conn.run_sync(index.drop)
+
+            start = time.perf_counter()
+            await seed(conn, args)
+            sys.stdout.write(f"生成数据 {time.perf_counter() - start:.1f}s\n")
+
+        results: dict[str, list[tuple[float, int, str]]] = {}
+        for phase in ("before", "after"):
+            async with engine.begin() as conn:
+                if phase == "after":
+                    start = time.perf_counter()
+                    await conn.run_sync(_create_all_indexes)
+                    sys.stdout.write(f"建立索引 {time.perf_counter() - start:.1f}s\n")
+                for name, query in queries(args).items():
+                    result = await measure(conn, query, args.repeat)
+                    results.setdefault(name, []).append(result)
+        await engine.dispose()
+
+    header = f"{'查询':<24}{'行数':>8}{'无索引 ms':>12}{'有索引 ms':>12}{'加速':>8}"
+    lines = [header, "-" * len(header)]
+    plans = []
+    for name, ((before, rows, _), (after, _, plan)) in results.items():
+        lines.append(
+            f"{name:<24}{rows:>8}{before:>12.2f}{after:>12.2f}{before / after:>7.1f}x"
+        )
+        plans.append(f"  {name}: {plan}")
+    sys.stdout.write("\n".join([*lines, "", "查询计划 (有索引):", *plans]) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="列表接口筛选条件的索引基准测试")
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--knowledge-points", type=int, default=5000)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--mistakes", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的执行次数")
+    parser.add_argument("--dir", help="临时数据库所在目录")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
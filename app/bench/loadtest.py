@@ -0,0 +1,596 @@
+"""
+端到端压测工具, 按目标 RPS 以开环方式驱动所有路由, 统计各路由的延迟与错误率
+
+用法:
+    # 自动启动模拟 LLM 服务与被测服务
+    python -m app.bench.loadtest --spawn --rps 20 --duration 60 --time-scale 0.1
+
+    # 压测已启动的服务, 保存结果并与基线比较
+    python -m app.bench.loadtest --base-url http://127.0.0.1:8000 \\
+        --output result.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+TOPICS = ["分数的加减法", "光的折射", "唐诗中的月亮", "民间剪纸", "水的循环"]
+
+
+def _sample_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), (30, 144, 255)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@dataclass
+class LoadContext:
+    """压测前准备的共享数据, 供各场景构造请求"""
+
+    student_id: str
+    question_id: str
+    story_id: str
+    plan_id: str
+    image: bytes = field(default_factory=_sample_image)
+    homework_orders: Iterator[int] = field(default_factory=lambda: itertools.count(1))
+
+    def files(self, name: str) -> dict[str, tuple[str, bytes, str]]:
+        return {name: ("sample.png", self.image, "image/png")}
+
+
+@dataclass
+class Scenario:
+    name: str
+    """报告中的路由名称, 如 "POST /api/interactive/activities" """
+    weight: float
+    build: Callable[[LoadContext], dict[str, Any]]
+    """构造 httpx 请求参数, 需包含 method 与 url"""
+    stream: bool = False
+    """响应为 SSE 流, 读取完整个流才计为完成"""
+
+
+def _get(path: str, **params: Any) -> Callable[[LoadContext], dict[str, Any]]:
+    return lambda _: {"method": "GET", "url": path, "params": params}
+
+
+SCENARIOS: list[Scenario] = [
+    # 只读接口
+    Scenario("GET /api/students/", 3, _get("/api/students/")),
+    Scenario(
+        "GET /api/question_bank/questions", 3, _get("/api/question_bank/questions")
+    ),
+    Scenario(
+        "GET /api/question_bank/knowledge_points",
+        1,
+        _get("/api/question_bank/knowledge_points", subject="数学"),
+    ),
+    Scenario("GET /api/question_bank/mistakes", 1, _get("/api/question_bank/mistakes")),
+    Scenario(
+        "GET /api/cultural-corridor/stories", 2, _get("/api/cultural-corridor/stories")
+    ),
+    Scenario(
+        "GET /api/cultural-corridor/cases", 1, _get("/api/cultural-corridor/cases")
+    ),
+    Scenario("GET /api/interactive/activities", 1, _get("/api/interactive/activities")),
+    Scenario("GET /api/analysis/class", 1, _get("/api/analysis/class")),
+    Scenario(
+        "GET /api/analysis/student/{student_id}",
+        1,
+        lambda ctx: {"method": "GET", "url": f"/api/analysis/student/{ctx.student_id}"},
+    ),
+    # 调用 LLM 的接口
+    Scenario(
+        "GET /api/interactive/recommendations",
+        2,
+        lambda _: {
+            "method": "GET",
+            "url": "/api/interactive/recommendations",
+            "params": {"topic": random.choice(TOPICS)},
+        },
+    ),
+    Scenario(
+        "POST /api/interactive/activities",
+        1,
+        lambda _: {
+            "method": "POST",
+            "url": "/api/interactive/activities",
+            "json": {
+                "activity_type": "game",
+                "subject": "数学",
+                "grade": "五年级",
+                "topic": random.choice(TOPICS),
+                "duration": 20,
+            },
+        },
+    ),
+    Scenario(
+        "POST /api/interactive/scenarios",
+        1,
+        lambda _: {
+            "method": "POST",
+            "url": "/api/interactive/scenarios",
+            "json": {
+                "scenario_type": "historical",
+                "subject": "历史",
+                "grade": "八年级",
+                "theme": random.choice(TOPICS),
+            },
+        },
+    ),
+    Scenario(
+        "POST /api/cultural-corridor/stories",
+        1,
+        lambda _: {
+            "method": "POST",
+            "url": "/api/cultural-corridor/stories",
+            "json": {"theme": "勤学", "keywords": [random.choice(TOPICS)]},
+        },
+    ),
+    Scenario(
+        "POST /api/cultural-corridor/cases",
+        1,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/cultural-corridor/cases",
+            "json": {
+                "story_id": ctx.story_id,
+                "main_discipline": "语文",
+                "related_disciplines": ["物理"],
+                "suitable_grades": "七至八年级",
+            },
+        },
+    ),
+    Scenario(
+        "POST /api/question_bank/generate",
+        1,
+        lambda _: {
+            "method": "POST",
+            "url": "/api/question_bank/generate",
+            "json": {
+                "subject": "数学",
+                "grade": "七年级",
+                "question_types": ["单选题"],
+                "difficulty": 3,
+                "knowledge_points": [random.choice(TOPICS)],
+                "count": 3,
+            },
+        },
+    ),
+    Scenario(
+        "POST /api/question_bank/generate/stream",
+        1,
+        lambda _: {
+            "method": "POST",
+            "url": "/api/question_bank/generate/stream",
+            "json": {
+                "subject": "数学",
+                "grade": "七年级",
+                "question_types": ["单选题"],
+                "difficulty": 3,
+                "knowledge_points": [random.choice(TOPICS)],
+                "count": 3,
+            },
+        },
+        stream=True,
+    ),
+    Scenario(
+        "POST /api/question_bank/mistakes/analyze",
+        1,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/question_bank/mistakes/analyze",
+            "json": {
+                "question_id": ctx.question_id,
+                "student_id": ctx.student_id,
+                "student_answer": random.choice("BCD"),
+            },
+        },
+    ),
+    Scenario(
+        "POST /api/homework/",
+        1,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/homework/",
+            "params": {
+                "student_id": ctx.student_id,
+                "homework_order": next(ctx.homework_orders),
+            },
+            "files": ctx.files("homework_file"),
+        },
+    ),
+    Scenario(
+        "POST /api/analysis/image",
+        1,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/analysis/image",
+            "files": ctx.files("file"),
+        },
+    ),
+    Scenario(
+        "POST /api/teaching/generate_plan",
+        0.5,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/teaching/generate_plan",
+            "data": {"grade": "七年级"},
+            "files": ctx.files("images"),
+        },
+    ),
+    Scenario(
+        "POST /api/teaching/generate_plan/stream",
+        0.5,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/teaching/generate_plan/stream",
+            "data": {"grade": "七年级"},
+            "files": ctx.files("images"),
+        },
+        stream=True,
+    ),
+    Scenario(
+        "GET /api/teaching/plan_document/{plan_id}",
+        0.5,
+        lambda ctx: {
+            "method": "GET",
+            "url": f"/api/teaching/plan_document/{ctx.plan_id}",
+        },
+    ),
+    Scenario(
+        "POST /api/style-transfer/generate",
+        0.5,
+        lambda ctx: {
+            "method": "POST",
+            "url": "/api/style-transfer/generate",
+            "data": {"style_prompt": "水墨画"},
+            "files": ctx.files("file"),
+        },
+    ),
+]
+
+
+async def prepare(client: httpx.AsyncClient) -> LoadContext:
+    """创建压测所需的学生、题目、故事与教案"""
+    student_id = f"bench-{uuid.uuid4().hex[:8]}"
+    response = await client.post(
+        "/api/students/",
+        json={"student_id": student_id, "student_name": "压测学生", "gender": "女"},
+    )
+    response.raise_for_status()
+
+    response = await client.post(
+        "/api/question_bank/generate",
+        json={
+            "subject": "数学",
+            "grade": "七年级",
+            "question_types": ["单选题"],
+            "difficulty": 3,
+            "knowledge_points": ["有理数"],
+            "count": 1,
+        },
+    )
+    response.raise_for_status()
+    question_id = response.json()[0]["id"]
+
+    response = await client.post(
+        "/api/cultural-corridor/stories", json={"theme": "勤学", "keywords": []}
+    )
+    response.raise_for_status()
+    story_id = response.json()["id"]
+
+    image = _sample_image()
+    response = await client.post(
+        "/api/teaching/generate_plan",
+        data={"grade": "七年级"},
+        files={"images": ("sample.png", image, "image/png")},
+    )
+    response.raise_for_status()
+    plan_id = response.json()["plan_id"]
+
+    # 提交一次作业, 使班级与学生分析接口有数据可查
+    response = await client.post(
+        "/api/homework/",
+        params={"student_id": student_id, "homework_order": 0},
+        files={"homework_file": ("sample.png", image, "image/png")},
+    )
+    response.raise_for_status()
+
+    return LoadContext(student_id, question_id, story_id, plan_id, image)
+
+
+@dataclass
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: defaultdict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    def percentile(self, q: float) -> float:
+        """最近秩百分位数 (秒)"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        return {
+            "requests": self.count,
+            "throughput": self.count / elapsed if elapsed else 0.0,
+            "error_rate": self.error_count / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "errors": dict(self.errors),
+        }
+
+
+async def execute(
+    client: httpx.AsyncClient, scenario: Scenario, ctx: LoadContext
+) -> str | None:
+    """发送一次请求, 成功时返回 None, 失败时返回错误类别"""
+    request = scenario.build(ctx)
+    if not scenario.stream:
+        response = await client.request(**request)
+        return None if response.is_success else str(response.status_code)
+
+    async with client.stream(**request) as response:
+        if not response.is_success:
+            return str(response.status_code)
+        async for line in response.aiter_lines():
+            if line == "event: error":
+                return "sse_error"
+    return None
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    ctx: LoadContext,
+    arrivals: Iterable[tuple[float, Scenario]],
+    max_inflight: int,
+) -> tuple[dict[str, RouteStats], float]:
+    """开环压测: 在各请求的到达时间 (距开始的秒数) 发起请求, 不等待前一个请求完成"""
+    stats: defaultdict[str, RouteStats] = defaultdict(RouteStats)
+    inflight: set[asyncio.Task[None]] = set()
+
+    async def one(scenario: Scenario) -> None:
+        start = time.perf_counter()
+        try:
+            error = await execute(client, scenario, ctx)
+        except httpx.HTTPError as err:
+            error = type(err).__name__
+        route = stats[scenario.name]
+        route.latencies.append(time.perf_counter() - start)
+        if error:
+            route.errors[error] += 1
+
+    start = time.perf_counter()
+    for offset, scenario in arrivals:
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        if len(inflight) >= max_inflight:
+            # 被测服务已无法跟上目标 RPS, 记为客户端丢弃
+            stats[scenario.name].errors["dropped"] += 1
+            continue
+        task = asyncio.create_task(one(scenario))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+
+    if inflight:
+        await asyncio.wait(inflight)
+    return dict(stats), time.perf_counter() - start
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    ctx: LoadContext,
+    scenarios: list[Scenario],
+    rps: float,
+    duration: float,
+    max_inflight: int,
+) -> tuple[dict[str, RouteStats], float]:
+    """按固定间隔发起请求, 路由按场景权重随机选择"""
+    weights = [scenario.weight for scenario in scenarios]
+    arrivals = (
+        (i / rps, random.choices(scenarios, weights)[0])
+        for i in range(int(rps * duration))
+    )
+    return await drive(client, ctx, arrivals, max_inflight)
+
+
+def report(stats: dict[str, RouteStats], elapsed: float) -> dict[str, Any]:
+    routes = {name: stats[name].summary(elapsed) for name in sorted(stats)}
+    total = RouteStats()
+    for route in stats.values():
+        total.latencies.extend(route.latencies)
+        for kind, count in route.errors.items():
+            total.errors[kind] += count
+    return {"elapsed": elapsed, "routes": routes, "total": total.summary(elapsed)}
+
+
+def format_report(result: dict[str, Any]) -> str:
+    header = f"{'route':<48}{'reqs':>7}{'rps':>8}{'err%':>7}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for name, row in [*result["routes"].items(), ("TOTAL", result["total"])]:
+        lines.append(
+            f"{name:<48}{row['requests']:>7}{row['throughput']:>8.2f}"
+            f"{row['error_rate'] * 100:>7.1f}{row['p50_ms']:>10.0f}"
+            f"{row['p95_ms']:>10.0f}{row['p99_ms']:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(
+    result: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """与基线比较 p95 延迟和错误率, 返回退化的路由说明"""
+    regressions: list[str] = []
+    for name, row in result["routes"].items():
+        if (base := baseline["routes"].get(name)) is None:
+            continue
+        if row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {base['p95_ms']:.0f}ms -> {row['p95_ms']:.0f}ms"
+            )
+        if row["error_rate"] > base["error_rate"] + tolerance / 10:
+            regressions.append(
+                f"{name}: 错误率 {base['error_rate']:.1%} -> {row['error_rate']:.1%}"
+            )
+    return regressions
+
+
+async def _wait_ready(url: str, wait: float = 30) -> None:
+    deadline = time.monotonic() + wait
+    async with httpx.AsyncClient() as client:
+        while True:
+            with contextlib.suppress(httpx.HTTPError):
+                await client.get(url)
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"服务启动超时: {url}")
+            await asyncio.sleep(0.2)
+
+
+@contextlib.asynccontextmanager
+async def spawn(args: argparse.Namespace) -> AsyncIterator[str]:
+    """在临时数据目录中启动模拟 LLM 服务与被测服务, 返回被测服务地址"""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = os.environ | {
+        "PYTHONPATH": str(PROJECT_ROOT),
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "GEMINI_API_KEY": "mock",
+        "GEMINI_BASE_URL": mock_url,
+        "MOCK_LLM_TIME_SCALE": str(args.time_scale),
+        "MOCK_LLM_ERROR_RATE": str(args.error_rate),
+        "MOCK_LLM_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "MOCK_LLM_MALFORMED_RATE": str(args.malformed_rate),
+    }
+    env.pop("DATABASE_URL", None)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        commands = [
+            ["app.bench.mock_provider", "--port", str(args.mock_port)],
+            ["uvicorn", "app.main:app", "--port", str(args.app_port)],
+        ]
+        processes = [
+            await asyncio.create_subprocess_exec(
+                sys.executable, "-m", *command, cwd=workdir, env=env
+            )
+            for command in commands
+        ]
+        try:
+            await _wait_ready(f"{mock_url}/health")
+            await _wait_ready(f"{app_url}/docs")
+            yield app_url
+        finally:
+            for process in processes:
+                process.terminate()
+                await process.wait()
+
+
+@contextlib.asynccontextmanager
+async def connect(
+    args: argparse.Namespace,
+) -> AsyncIterator[tuple[httpx.AsyncClient, LoadContext]]:
+    """连接被测服务 (--spawn 时先启动), 并准备压测数据"""
+    async with contextlib.AsyncExitStack() as stack:
+        base_url = (
+            await stack.enter_async_context(spawn(args))
+            if args.spawn
+            else args.base_url
+        )
+        limits = httpx.Limits(max_connections=args.max_inflight)
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits)
+        )
+        yield client, await prepare(client)
+
+
+async def run(args: argparse.Namespace, scenarios: list[Scenario]) -> dict[str, Any]:
+    async with connect(args) as (client, ctx):
+        stats, elapsed = await run_load(
+            client, ctx, scenarios, args.rps, args.duration, args.max_inflight
+        )
+    return report(stats, elapsed)
+
+
+def add_target_arguments(parser: argparse.ArgumentParser) -> None:
+    """被测服务、模拟 LLM 服务与结果比较的命令行参数, 与回放工具共用"""
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="将结果保存为 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的结果比较")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="p95 允许的相对退化比例"
+    )
+    parser.add_argument(
+        "--spawn", action="store_true", help="自动启动模拟 LLM 服务与被测服务"
+    )
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+
+
+def finish(args: argparse.Namespace, result: dict[str, Any]) -> None:
+    """输出报告, 按需保存结果并与基线比较, 退化时以非零状态退出"""
+    sys.stdout.write(format_report(result) + "\n")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if regressions := compare(result, baseline, args.tolerance):
+            sys.exit("性能退化:\n" + "\n".join(f"  {r}" for r in regressions))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="端到端压测工具")
+    parser.add_argument("--rps", type=float, default=10, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长(秒)")
+    parser.add_argument("--routes", default="", help="只压测名称匹配该正则的路由")
+    add_target_arguments(parser)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    scenarios = [s for s in SCENARIOS if re.search(args.routes, s.name)]
+    if not scenarios:
+        sys.exit(f"没有匹配 {args.routes!r} 的路由")
+
+    finish(args, asyncio.run(run(args, scenarios)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+"""
+本地模拟 LLM 服务, 替代 OpenAI chat completions 与 Gemini generateContent 接口
+
+- 按提示词模板识别请求所属任务, 返回符合该任务 JSON 结构的固定内容
+- 响应延迟服从对数正态分布, 可按比例缩放, 并可按概率注入 5xx 与 429 错误
+- 可按概率返回缺少字段的 JSON, 用于验证结构化输出的修复流程
+- 支持 OpenAI 流式响应 (stream=true)
+
+用法:
+    python -m app.bench.mock_provider --port 9100 --time-scale 0.1 --error-rate 0.01
+
+被测服务配置:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+    GEMINI_BASE_URL=http://127.0.0.1:9100
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+from ..services.json_extract import extract_json
+from ..services.prompts import prompts
+
+
+@dataclass
+class LatencyProfile:
+    """对数正态分布的响应延迟, 以中位数与 p95 (秒) 描述"""
+
+    median: float
+    p95: float
+
+    def sample(self, rng: random.Random, scale: float) -> float:
+        sigma = math.log(self.p95 / self.median) / 1.645
+        return self.median * math.exp(sigma * rng.gauss(0, 1)) * scale
+
+
+# 各任务的默认延迟, 大致参照线上模型的实际耗时
+LATENCY: dict[str, LatencyProfile] = {
+    "teaching_plan/generate": LatencyProfile(6, 15),
+    "teaching_plan/convert": LatencyProfile(4, 10),
+    "question_bank/generate": LatencyProfile(4, 10),
+    "question_bank/analyze_mistake": LatencyProfile(1.5, 4),
+    "cultural_corridor/generate_story": LatencyProfile(3, 8),
+    "cultural_corridor/generate_case": LatencyProfile(3, 8),
+    "interactive/activity": LatencyProfile(2.5, 6),
+    "interactive/scenario": LatencyProfile(3, 7),
+    "interactive/recommendation": LatencyProfile(1.5, 4),
+    "homework/prompt": LatencyProfile(2, 5),
+    "analysis/color": LatencyProfile(1.5, 4),
+    "gemini/image": LatencyProfile(5, 12),
+}
+DEFAULT_LATENCY = LatencyProfile(2, 5)
+
+
+@dataclass
+class MockConfig:
+    time_scale: float = 1.0
+    """延迟缩放比例, 压测时可设为 0.1 等较小值"""
+    error_rate: float = 0.0
+    """返回 500 错误的概率"""
+    rate_limit_rate: float = 0.0
+    """返回 429 错误的概率"""
+    malformed_rate: float = 0.0
+    """返回缺少字段的 JSON 的概率"""
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        seed = os.getenv("MOCK_LLM_SEED")
+        return cls(
+            time_scale=float(os.getenv("MOCK_LLM_TIME_SCALE", "1")),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0")),
+            malformed_rate=float(os.getenv("MOCK_LLM_MALFORMED_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+
+config = MockConfig.from_env()
+rng = random.Random(config.seed)
+
+
+def _question(index: int) -> dict:
+    return {
+        # 题干带随机编号, 避免分批生成的题目被当作重复题目去除
+        "title": f"模拟题目 {index + 1}-{rng.getrandbits(40):010x}: 下列说法正确的是",
+        "question_type": "单选题",
+        "subject": "数学",
+        "grade": "七年级",
+        "difficulty": 3,
+        "answer": "A",
+        "analysis": "模拟解析: 根据定义逐项判断即可。",
+        "options": [
+            {"key": key, "value": f"选项内容 {key}"} for key in ("A", "B", "C", "D")
+        ],
+        "knowledge_points": ["有理数", "数轴"],
+    }
+
+
+def _questions(prompt: str) -> object:
+    match = re.search(r"生成数量：(\d+)题", prompt)
+    return [_question(i) for i in range(int(match[1]) if match else 5)]
+
+
+TEACHING_PLAN_MARKDOWN = """\
+# 模拟美术教案: 多样的中国民间美术
+
+## 课程概况
+- 授课对象: 七年级
+- 课时规划: 2 课时
+
+## 教学目标
+1. 欣赏中国民间美术作品, 感受其艺术特点
+2. 运用民间美术元素进行简单的设计创作
+
+## 教学环节
+### 新课导入
+教师展示民间美术作品图片, 学生观察并回答问题。
+
+### 实践探究
+学生分组讨论, 完成以民间美术元素为主题的设计。
+
+### 小结
+回顾本课内容, 梳理知识要点。
+"""
+
+_activity_step = {"教师活动": ["模拟教师活动"], "学生活动": ["模拟学生活动"]}
+
+
+# 各任务的模拟输出, 结构与 app/assets 中对应模板要求的 JSON 一致
+def _fill(value: object, schema: dict, defs: dict) -> object:
+    """按 JSON Schema 补全缺失的必填字段"""
+    if ref := schema.get("$ref"):
+        schema = defs[ref.rsplit("/", 1)[-1]]
+    if options := schema.get("anyOf"):
+        schema = next(item for item in options if item.get("type") != "null")
+
+    match schema.get("type"):
+        case "object":
+            result = value if isinstance(value, dict) else {}
+            properties = schema.get("properties", {})
+            for name in schema.get("required", []):
+                result[name] = _fill(result.get(name), properties[name], defs)
+            return result
+        case "array":
+            items = value if isinstance(value, list) and value else [None]
+            return [_fill(item, schema["items"], defs) for item in items]
+        case "integer" | "number":
+            return value if isinstance(value, int | float) else 1
+        case "boolean":
+            return value if isinstance(value, bool) else True
+        case _:
+            return value if isinstance(value, str) else "模拟修复内容"
+
+
+def _repair(prompt: str) -> object:
+    """模拟修复: 按提示词中的 Schema 补全待修复内容"""
+    schema = json.loads(prompt.split("```json\n", 1)[1].split("\n```", 1)[0])
+    content = prompt.split("## 待修复的内容", 1)[1].rsplit("## 要求", 1)[0]
+    try:
+        value = extract_json(content, "[" if schema.get("type") == "array" else "{")
+    except ValueError:
+        value = None
+    return _fill(value, schema, schema.get("$defs", {}))
+
+
+def _malform(output: object) -> object:
+    """去掉对象 (或数组第一个元素) 的第一个字段"""
+    target = output[0] if isinstance(output, list) and output else output
+    if isinstance(target, dict) and target:
+        del target[next(iter(target))]
+    return output
+
+
+CANNED: dict[str, Callable[[str], object]] = {
+    "question_bank/generate": _questions,
+    "question_bank/analyze_mistake": lambda _: {
+        "mistake_reason": "概念理解错误",
+        "analysis": "模拟分析: 学生混淆了相反数与倒数的概念。",
+        "suggestion": "模拟建议: 结合数轴复习相反数的定义。",
+    },
+    "cultural_corridor/generate_story": lambda _: {
+        "title": "模拟故事: 凿壁偷光",
+        "dynasty": "西汉",
+        "period": "西汉时期",
+        "theme": "勤学",
+        "content": "匡衡勤奋好学, 家中没有蜡烛, 便凿穿墙壁引来邻居的烛光读书。" * 8,
+        "moral": "学习需要刻苦努力",
+        "reference": "《西京杂记》",
+    },
+    "cultural_corridor/generate_case": lambda _: {
+        "title": "模拟案例: 从凿壁偷光看光的直线传播",
+        "content": "以故事为引, 结合物理与语文开展跨学科学习。",
+        "teaching_objectives": ["理解光的直线传播", "体会勤学精神"],
+        "key_concepts": {"物理": ["光的直线传播"], "语文": ["文言叙事"]},
+        "implementation_suggestions": "分组实验并撰写读后感。",
+        "extension_activities": ["小孔成像实验"],
+        "resources": [
+            {"type": "参考书籍", "title": "西京杂记", "description": "故事出处"},
+            {"type": "网络资源", "title": "光学演示", "url": "https://example.com"},
+        ],
+    },
+    "interactive/activity": lambda _: {
+        "title": "模拟活动: 分数大挑战",
+        "description": "通过小组竞赛巩固分数运算。",
+        "preparation": ["分数卡片", "计时器"],
+        "objectives": ["熟练进行分数加减", "培养合作意识"],
+        "steps": [
+            {
+                "name": "热身",
+                "duration": 5,
+                "teacher_action": "讲解规则",
+                "student_action": "分组准备",
+            },
+            {
+                "name": "竞赛",
+                "duration": 15,
+                "teacher_action": "出示题目并计分",
+                "student_action": "抢答计算",
+            },
+        ],
+        "evaluation": {"criteria": ["正确率", "参与度"], "method": "小组积分"},
+        "extensions": ["设计分数谜题"],
+    },
+    "interactive/scenario": lambda _: {
+        "title": "模拟情景: 穿越到宋朝集市",
+        "background": "北宋汴京的繁华集市。",
+        "educational_value": "了解宋代商业与市井文化。",
+        "scenes": [
+            {
+                "name": "虹桥",
+                "description": "商贩云集的虹桥两岸",
+                "visual_elements": ["清明上河图"],
+                "audio_elements": ["叫卖声"],
+            },
+        ],
+        "characters": [
+            {"name": "张择端", "role": "画师", "description": "记录集市景象"},
+        ],
+        "interactive_elements": [
+            {
+                "type": "选择",
+                "description": "选择要购买的商品",
+                "options": ["茶叶", "瓷器"],
+                "outcomes": ["了解茶文化", "了解瓷器工艺"],
+            },
+        ],
+        "teacher_guide": {
+            "setup": ["展示画作"],
+            "facilitation_tips": ["引导学生观察细节"],
+            "reflection_questions": ["宋代商业为何繁荣?"],
+        },
+    },
+    "interactive/recommendation": lambda _: {
+        "recommendations": [
+            {"type": kind, "title": f"模拟{kind}", "content": ["步骤一", "步骤二"]}
+            for kind in ("提问策略", "小组活动", "辩论设计")
+        ],
+    },
+    "homework/prompt": lambda _: {"score": 86.5, "comment": "模拟评语: 构图完整。"},
+    "structured/repair": _repair,
+    "analysis/color": lambda _: {
+        "keywords": ["温暖", "明快", "活力", "传统", "和谐"],
+        "dimensions": {
+            "warmth": 75,
+            "brightness": 80,
+            "contrast": 60,
+            "saturation": 70,
+            "harmony": 85,
+        },
+    },
+    "teaching_plan/generate": lambda _: TEACHING_PLAN_MARKDOWN,
+    "teaching_plan/convert": lambda _: {
+        "课程概况": {
+            "课程标题": "多样的中国民间美术",
+            "授课对象": "七年级",
+            "课时规划": "2课时",
+            "参考教材": "《义务教育教科书 美术 七年级下册》",
+            "学习领域": "欣赏·评述、造型·表现",
+        },
+        "教材分析": "模拟教材分析",
+        "学情分析": "模拟学情分析",
+        "设计思路": "模拟设计思路",
+        "教学目标": {
+            "审美感知": "模拟",
+            "艺术表现": "模拟",
+            "文化理解": "模拟",
+            "创意实践": "模拟",
+        },
+        "教学重难点": {"教学重点": ["模拟重点"], "教学难点": ["模拟难点"]},
+        "教学方法": ["讲授法", "演示法"],
+        "教学准备": {"教具准备": "PPT 课件", "学具准备": "绘画工具"},
+        "教学环节": {
+            "新课导入": _activity_step | {"设计构思": "模拟"},
+            "知识新授": [_activity_step | {"设计构思": "模拟"}],
+            "实践探究": _activity_step | {"设计构思": "模拟"},
+            "展示评价": _activity_step | {"设计构思": "模拟"},
+            "小结": _activity_step | {"设计构思": "模拟"},
+            "课后作业": _activity_step | {"设计构思": "模拟"},
+        },
+    },
+}
+
+
+def _signatures() -> list[tuple[str, str]]:
+    """提取每个模板最长的一段固定文本, 用于识别渲染后的提示词"""
+    signatures: list[tuple[str, str]] = []
+    for name in CANNED:
+        source = (prompts.root / name).with_suffix(".md").read_text("utf-8")
+        literals = re.split(r"{{.*?}}|{%.*?%}", source, flags=re.DOTALL)
+        signatures.append((max(literals, key=len).strip(), name))
+    # 固定文本越长越具体, 优先匹配
+    return sorted(signatures, key=lambda item: -len(item[0]))
+
+
+SIGNATURES = _signatures()
+
+
+def detect_task(prompt: str) -> str | None:
+    return next((name for text, name in SIGNATURES if text in prompt), None)
+
+
+def _render(task: str | None, prompt: str) -> str:
+    if task is None:
+        return "模拟回复"
+    output = CANNED[task](prompt)
+    if isinstance(output, str):
+        return output
+    if task != "structured/repair" and rng.random() < config.malformed_rate:
+        output = _malform(output)
+    # 与真实模型一样包裹在代码块中, 覆盖服务端的 JSON 提取逻辑
+    return f"```json\n{json.dumps(output, ensure_ascii=False, indent=2)}\n```"
+
+
+def _failure() -> int | None:
+    roll = rng.random()
+    if roll < config.error_rate:
+        return 500
+    if roll < config.error_rate + config.rate_limit_rate:
+        return 429
+    return None
+
+
+def _delay(task: str | None) -> float:
+    return LATENCY.get(task or "", DEFAULT_LATENCY).sample(rng, config.time_scale)
+
+
+def _gemini_image() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 60)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+GEMINI_IMAGE = _gemini_image()
+
+app = FastAPI(title="Mock LLM Provider")
+
+
+@app.get("/health")
+async def health() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request) -> Response:
+    body = await request.json()
+    prompt = "\n".join(
+        part["text"]
+        for message in body["messages"]
+        for part in (
+            message["content"]
+            if isinstance(message["content"], list)
+            else [{"type": "text", "text": message["content"]}]
+        )
+        if part["type"] == "text"
+    )
+    task = detect_task(prompt)
+    delay = _delay(task)
+
+    if status := _failure():
+        await asyncio.sleep(delay / 4)
+        error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+        return JSONResponse(
+            {"error": {"message": "模拟错误", "type": error_type, "code": None}},
+            status_code=status,
+            headers={"Retry-After": "1"} if status == 429 else None,
+        )
+
+    content = _render(task, prompt)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "mock")
+    usage = {
+        "prompt_tokens": len(prompt) // 2,
+        "completion_tokens": len(content) // 2,
+        "total_tokens": (len(prompt) + len(content)) // 2,
+    }
+
+    if not body.get("stream"):
+        await asyncio.sleep(delay)
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def events() -> AsyncIterator[str]:
+        def chunk(delta: dict | None, finish_reason: str | None = None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            if delta is None:
+                # stream_options.include_usage: 最后一个数据块只包含用量
+                data |= {"choices": [], "usage": usage}
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        # 首个 token 约占总耗时的 30%, 其余内容均匀输出
+        pieces = [content[i : i + 20] for i in range(0, len(content), 20)]
+        await asyncio.sleep(delay * 0.3)
+        yield chunk({"role": "assistant", "content": ""})
+        for piece in pieces:
+            await asyncio.sleep(delay * 0.7 / len(pieces))
+            yield chunk({"content": piece})
+        yield chunk({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield chunk(None)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/{api_version}/models/{model}:generateContent")
+async def generate_content(model: str) -> Response:
+    delay = _delay("gemini/image")
+    if status := _failure():
+        await asyncio.sleep(delay / 4)
+        return JSONResponse(
+            {"error": {"code": status, "message": "模拟错误", "status": "INTERNAL"}},
+            status_code=status,
+        )
+
+    await asyncio.sleep(delay)
+    return JSONResponse(
+        {
+            "candidates": [
+                {
+                    "content": {
+                        "role": "model",
+                        "parts": [
+                            {"text": "模拟风格化结果"},
+                            {
+                                "inlineData": {
+                                    "mimeType": "image/png",
+                                    "data": GEMINI_IMAGE,
+                                }
+                            },
+                        ],
+                    },
+                    "finishReason": "STOP",
+                }
+            ],
+            "usageMetadata": {
+                "promptTokenCount": 300,
+                "candidatesTokenCount": 1300,
+                "totalTokenCount": 1600,
+            },
+            "modelVersion": model,
+        }
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地模拟 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--time-scale", type=float, default=config.time_scale)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate)
+    parser.add_argument("--malformed-rate", type=float, default=config.malformed_rate)
+    parser.add_argument("--seed", type=int, default=config.seed)
+    args = parser.parse_args()
+
+    config.time_scale = args.time_scale
+    config.error_rate = args.error_rate
+    config.rate_limit_rate = args.rate_limit_rate
+    config.malformed_rate = args.malformed_rate
+    rng.seed(args.seed)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+按 LLM 调用日志回放真实流量, 驱动被测服务与模拟 LLM 服务
+
+从 llm_call_logs 中按请求标识还原各请求的路由与到达时间, 以相同的路由构成
+(可按倍速压缩的到达节奏) 发起请求; 请求内容由压测场景构造, 日志只提供流量形状
+
+局限: 日志只记录实际调用了模型服务的请求, 命中补全缓存的请求、不调用模型的
+增删改查接口, 以及在调用模型之前就失败的请求都不会出现在回放中, 还原出的
+路由构成偏向未命中缓存的生成类请求, 压测结果应视为生成路径的上限而非全站流量
+
+用法:
+    # 以 10 倍速回放生产库某时段的请求
+    python -m app.bench.replay --database sqlite+aiosqlite:///data/db.sqlite3 \\
+        --since "2026-10-18 09:00" --until "2026-10-18 10:00" --speed 10 --spawn
+
+    # 只保留路由构成, 以固定 RPS 压测 60 秒
+    python -m app.bench.replay --rps 20 --duration 60 --spawn
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from ..db import LLMCallLog
+from .loadtest import (
+    SCENARIOS,
+    Scenario,
+    add_target_arguments,
+    connect,
+    drive,
+    finish,
+    report,
+    run_load,
+)
+
+
+@dataclass
+class RecordedRequest:
+    route: str
+    """路由模板, 与压测场景名称一致"""
+    offset: float
+    """距第一个请求的秒数"""
+
+
+async def load_requests(
+    database: str, since: str | None, until: str | None
+) -> list[RecordedRequest]:
+    """
+    读取时间范围内调用过模型服务的请求, 同一请求的多次 LLM 调用只计一次,
+    按到达时间排序; 未调用模型的请求不在日志中, 见模块说明
+    """
+    started = func.min(LLMCallLog.created_at).label("started")
+    query = (
+        select(LLMCallLog.route, started)
+        .where(LLMCallLog.request_id != "-")
+        .group_by(LLMCallLog.request_id, LLMCallLog.route)
+        .order_by(started)
+    )
+    if since:
+        query = query.where(LLMCallLog.created_at >= since)
+    if until:
+        query = query.where(LLMCallLog.created_at < until)
+
+    engine = create_async_engine(database)
+    try:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(query)).all()
+    finally:
+        await engine.dispose()
+
+    times = [datetime.fromisoformat(row.started) for row in rows]
+    return [
+        RecordedRequest(row.route, (at - times[0]).total_seconds())
+        for row, at in zip(rows, times, strict=True)
+    ]
+
+
+async def replay(
+    args: argparse.Namespace, requests: list[RecordedRequest]
+) -> dict[str, Any]:
+    scenarios = {scenario.name: scenario for scenario in SCENARIOS}
+    async with connect(args) as (client, ctx):
+        if args.rps:
+            # 只保留路由构成: 以记录中的请求数作为场景权重
+            counts = Counter(request.route for request in requests)
+            weighted = [
+                Scenario(name, count, scenarios[name].build, scenarios[name].stream)
+                for name, count in counts.items()
+            ]
+            stats, elapsed = await run_load(
+                client, ctx, weighted, args.rps, args.duration, args.max_inflight
+            )
+        else:
+            first = requests[0].offset
+            arrivals = (
+                ((request.offset - first) / args.speed, scenarios[request.route])
+                for request in requests
+            )
+            stats, elapsed = await drive(client, ctx, arrivals, args.max_inflight)
+    return report(stats, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按 LLM 调用日志回放流量")
+    parser.add_argument(
+        "--database",
+        default=os.getenv("DATABASE_URL", "sqlite+aiosqlite:///data/db.sqlite3"),
+        help="读取调用日志的数据库",
+    )
+    parser.add_argument("--since", help="起始时间, 如 2026-10-18 09:00")
+    parser.add_argument("--until", help="结束时间 (不含)")
+    parser.add_argument("--speed", type=float, default=1, help="到达节奏的倍速")
+    parser.add_argument(
+        "--rps", type=float, help="设置后忽略到达时间, 按路由构成以固定 RPS 压测"
+    )
+    parser.add_argument("--duration", type=float, default=30, help="固定 RPS 时长(秒)")
+    parser.add_argument("--routes", default="", help="只回放名称匹配该正则的路由")
+    add_target_arguments(parser)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    requests = asyncio.run(load_requests(args.database, args.since, args.until))
+    known = {scenario.name for scenario in SCENARIOS}
+    skipped = Counter(r.route for r in requests if r.route not in known)
+    for route, count in skipped.most_common():
+        sys.stderr.write(f"没有对应的压测场景, 跳过 {count} 个请求: {route}\n")
+    requests = [
+        r for r in requests if r.route in known and re.search(args.routes, r.route)
+    ]
+    if not requests:
+        sys.exit("调用日志中没有可回放的请求")
+
+    finish(args, asyncio.run(replay(args, requests)))
+
+
+if __name__ == "__main__":
+    main()
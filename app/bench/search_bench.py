@@ -0,0 +1,148 @@
+"""
+全文检索基准测试, 比较故事列表按关键词查询时 LIKE 子串匹配与 FTS5 检索表的耗时
+
+在临时 SQLite 数据库中生成故事 (默认 10 万篇, 正文约 500 字), 按不同出现频率
+嵌入关键词, 分别用 LIKE 与 story_search 执行与列表接口相同的第 1 页查询
+
+用法:
+    python -m app.bench.search_bench --stories 100000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from ..db import TraditionalStory
+from ..db.config import Base, apply_sqlite_pragmas, sqlite_pragmas
+from ..db.fulltext import story_search
+from ..routers._pagination import keyset
+from .index_bench import _insert
+
+START = datetime.fromisoformat("2026-01-01 00:00:00")
+PAGE_SIZE = 50
+
+# 生成正文所用的常用字, 不含下面的关键词用字
+CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可"
+    "主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家"
+    "电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合"
+)
+# 关键词 -> 包含该词的故事比例
+KEYWORDS = {"卧薪尝胆": 0.001, "精忠报国": 0.01, "温故知新": 0.1}
+
+
+def _text(length: int) -> str:
+    text = "".join(random.choices(CHARS, k=length))
+    for keyword, ratio in KEYWORDS.items():
+        if random.random() < ratio:
+            i = random.randrange(length)
+            text = text[:i] + keyword + text[i:]
+    return text
+
+
+def _story(i: int) -> dict[str, Any]:
+    return {
+        "id": f"s-{i:08d}",
+        "title": _text(8),
+        "theme": "压测",
+        "content": _text(500),
+        "created_at": (START + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def queries() -> dict[str, tuple[Select, Select]]:
+    """关键词 -> (LIKE 查询, 全文检索查询), 均为列表接口的第 1 页"""
+    keys = (TraditionalStory.created_at, TraditionalStory.id)
+    result = {}
+    for keyword in (*KEYWORDS, "尝胆", "胆"):
+        like = select(TraditionalStory).where(
+            or_(
+                TraditionalStory.title.contains(keyword),
+                TraditionalStory.content.contains(keyword),
+            )
+        )
+        query, rank = story_search.match(
+            select(TraditionalStory), {("title", "content"): keyword}
+        )
+        if rank is None:
+            raise ValueError(f"关键词没有可检索的词元: {keyword}")
+        ranked = (rank, TraditionalStory.id)
+        result[keyword] = (
+            keyset(like, keys, None, PAGE_SIZE),
+            keyset(query, ranked, None, PAGE_SIZE, descending=False),
+        )
+    return result
+
+
+async def measure(
+    conn: AsyncConnection, query: Select, repeat: int
+) -> tuple[float, int, str]:
+    """返回耗时中位数 (毫秒)、结果行数与查询计划"""
+    sql = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    durations, rows = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = (await conn.execute(query)).all()
+        durations.append(time.perf_counter() - start)
+    detail = "; ".join(row.detail for row in plan)
+    return statistics.median(durations) * 1000, len(rows), detail
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{workdir}/bench.sqlite3")
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            start = time.perf_counter()
+            await _insert(conn, TraditionalStory, map(_story, range(args.stories)))
+            sys.stdout.write(f"生成数据 {time.perf_counter() - start:.1f}s\n")
+
+            start = time.perf_counter()
+            await conn.run_sync(story_search.create)
+            await conn.run_sync(story_search.rebuild)
+            sys.stdout.write(f"建立检索表 {time.perf_counter() - start:.1f}s\n")
+
+            header = f"{'关键词':<10}{'匹配行数':>8}{'LIKE ms':>12}"
+            header += f"{'检索 ms':>12}{'加速':>8}"
+            lines = [header, "-" * len(header)]
+            plans = []
+            for keyword, (like, search) in queries().items():
+                before, _, _ = await measure(conn, like, args.repeat)
+                after, _, plan = await measure(conn, search, args.repeat)
+                matches = search.limit(None).order_by(None).subquery()
+                rows = await conn.scalar(select(func.count()).select_from(matches))
+                lines.append(
+                    f"{keyword:<10}{rows:>8}{before:>12.2f}{after:>12.2f}"
+                    f"{before / after:>7.1f}x"
+                )
+                plans.append(f"  {keyword}: {plan}")
+        await engine.dispose()
+
+    sys.stdout.write("\n".join([*lines, "", "查询计划 (全文检索):", *plans]) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="故事关键词检索的基准测试")
+    parser.add_argument("--stories", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的执行次数")
+    parser.add_argument("--dir", help="临时数据库所在目录")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
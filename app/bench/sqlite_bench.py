@@ -0,0 +1,161 @@
+"""
+SQLite 连接参数基准测试, 比较 SQLAlchemy 与 SQLite 的默认配置 (default) 和
+应用使用的连接池与 SQLITE_PRAGMAS 配置 (tuned) 的读写吞吐
+
+在临时数据库中并发写入作业记录 (模拟作业上传) 并查询 (模拟成绩分析),
+每个协程使用独立的会话与连接
+
+用法:
+    python -m app.bench.sqlite_bench --writers 32 --readers 16 --duration 15
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from ..db import HomeworkInfo, StudentInfo
+from ..db.config import (
+    Base,
+    apply_sqlite_pragmas,
+    sqlite_pool_options,
+    sqlite_pragmas,
+)
+from ..services.metrics import percentile
+
+
+@dataclass
+class OpStats:
+    latencies: list[float] = field(default_factory=list)
+    locked: int = 0
+    """database is locked 错误数"""
+
+    def summary(self, elapsed: float) -> str:
+        ordered = sorted(self.latencies)
+        return (
+            f"{len(ordered) / elapsed:>10.0f}"
+            f"{percentile(ordered, 0.50) * 1000:>10.1f}"
+            f"{percentile(ordered, 0.95) * 1000:>10.1f}"
+            f"{self.locked:>8}"
+        )
+
+
+async def _setup(engine: AsyncEngine, students: int) -> list[str]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    ids = [f"bench-{i:04d}" for i in range(students)]
+    async with async_sessionmaker(engine)() as db:
+        db.add_all(
+            StudentInfo(student_id=sid, student_name="压测学生", gender="女")
+            for sid in ids
+        )
+        await db.commit()
+    return ids
+
+
+async def run_profile(
+    path: Path, *, tuned: bool, args: argparse.Namespace
+) -> tuple[OpStats, OpStats, float]:
+    url = f"sqlite+aiosqlite:///{path}"
+    if tuned:
+        engine = create_async_engine(url, **sqlite_pool_options())
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+    else:
+        engine = create_async_engine(url)
+    session_factory = async_sessionmaker(engine)
+    students = await _setup(engine, args.students)
+    orders = itertools.count()
+    writes, reads = OpStats(), OpStats()
+    deadline = time.perf_counter() + args.duration
+
+    async def writer() -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    db.add(
+                        HomeworkInfo(
+                            student_id=random.choice(students),
+                            homework_order=next(orders),
+                            homework_image_path="uploads/homeworks/bench.png",
+                            score=random.uniform(60, 100),
+                            comment="压测评语" * 20,
+                        )
+                    )
+                    await db.commit()
+            except OperationalError:
+                writes.locked += 1
+                continue
+            writes.latencies.append(time.perf_counter() - start)
+
+    async def reader() -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session_factory() as db:
+                    await db.execute(
+                        select(HomeworkInfo).where(
+                            HomeworkInfo.student_id == random.choice(students)
+                        )
+                    )
+                    await db.execute(
+                        select(HomeworkInfo.student_id, func.avg(HomeworkInfo.score))
+                        .group_by(HomeworkInfo.student_id)
+                        .limit(20)
+                    )
+            except OperationalError:
+                reads.locked += 1
+                continue
+            reads.latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(writer() for _ in range(args.writers)),
+        *(reader() for _ in range(args.readers)),
+    )
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return writes, reads, elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    header = f"{'profile':<10}{'op':<7}{'ops/s':>10}{'p50 ms':>10}"
+    header += f"{'p95 ms':>10}{'locked':>8}"
+    lines = [header, "-" * len(header)]
+    for name, tuned in (("default", False), ("tuned", True)):
+        with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+            writes, reads, elapsed = await run_profile(
+                Path(workdir) / "bench.sqlite3", tuned=tuned, args=args
+            )
+        lines.append(f"{name:<10}{'write':<7}{writes.summary(elapsed)}")
+        lines.append(f"{name:<10}{'read':<7}{reads.summary(elapsed)}")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite 连接参数基准测试")
+    parser.add_argument("--writers", type=int, default=32, help="并发写入协程数")
+    parser.add_argument("--readers", type=int, default=16, help="并发查询协程数")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10, help="每组测试时长(秒)")
+    parser.add_argument(
+        "--dir", help="临时数据库所在目录, 应与生产数据库位于同一磁盘上"
+    )
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
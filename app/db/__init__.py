@@ -1,8 +1,11 @@
 from .config import DBSession as DBSession
+from .config import open_session as open_session
+from .migrations import run_migrations as run_migrations
 from .models import CrossDisciplineCase as CrossDisciplineCase
 from .models import HomeworkInfo as HomeworkInfo
 from .models import InteractiveActivity as InteractiveActivity
 from .models import KnowledgePoint as KnowledgePoint
+from .models import LLMCallLog as LLMCallLog
 from .models import MistakeRecord as MistakeRecord
 from .models import Question as Question
 from .models import ScenarioSimulation as ScenarioSimulation
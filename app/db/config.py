@@ -1,10 +1,10 @@
-import asyncio
+import contextlib
 import os
-from typing import Annotated
+from typing import Annotated, Any
 
 import sqlalchemy.ext.asyncio as sa_async
 from fastapi import Depends
-from sqlalchemy import make_url
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, declarative_base
 
@@ -38,6 +38,62 @@ DBSession = Annotated[sa_async.AsyncSession, Depends(get_session, use_cache=True
 """
 
 
+open_session = contextlib.asynccontextmanager(get_session)
+"""
+在依赖注入之外使用数据库会话, 如流式响应和后台任务
+
+- 用法: async with open_session() as db: ...
+- 正常退出时提交事务, 出现错误时回滚事务
+"""
+
+
+# SQLite 连接参数, 每个连接建立时设置
+# 可由环境变量 SQLITE_<参数名> 覆盖, 如 SQLITE_SYNCHRONOUS=FULL, 为空则不设置
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # 读写互不阻塞
+    "synchronous": "NORMAL",  # WAL 模式下断电只可能丢失最近的事务, 不会损坏数据库
+    "busy_timeout": "5000",  # 等待写锁的毫秒数, 超时才报 database is locked
+    "mmap_size": str(256 * 1024 * 1024),
+    "cache_size": str(-64 * 1024),  # 负数表示 KiB, 即每个连接 64MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def sqlite_pragmas() -> dict[str, str]:
+    """按环境变量覆盖后的 SQLite 连接参数"""
+    return {
+        name: value
+        for name, default in SQLITE_PRAGMAS.items()
+        if (value := os.getenv(f"SQLITE_{name.upper()}", default))
+    }
+
+
+def sqlite_pool_options() -> dict[str, Any]:
+    """SQLite 连接池参数
+
+    SQLite 同时只允许一个写事务, 连接过多时写事务在文件锁上争抢, 没有先后顺序,
+    部分请求会等待超过 busy_timeout 而报错; 限制连接数 (SQLITE_POOL_SIZE, 默认 16)
+    后改为在连接池中按顺序排队
+    """
+    return {
+        "pool_size": int(os.getenv("SQLITE_POOL_SIZE", "16")),
+        "max_overflow": 0,
+        "pool_timeout": 30,
+    }
+
+
+def apply_sqlite_pragmas(engine: AsyncEngine, pragmas: dict[str, str]) -> None:
+    """在引擎的每个新连接上设置 SQLite 参数"""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
 # 数据库驱动配置
 # 参考 pyproject.toml 的可选依赖
 _DB_DRIVER = {
@@ -63,7 +119,9 @@ def _init_orm() -> None:
             url,
             future=True,
             echo=os.getenv("SQL_ECHO", "false").lower() == "true",
+            **sqlite_pool_options(),
         )
+        apply_sqlite_pragmas(_engine, sqlite_pragmas())
     else:
         # 其他数据库配置（如 MySQL、PostgreSQL 等）
         _engine = create_async_engine(
@@ -77,11 +135,10 @@ def _init_orm() -> None:
 
     _session_factory = sa_async.async_sessionmaker(_engine)
 
-    async def create_all_tables():
-        async with _engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
 
-    asyncio.get_event_loop().create_task(create_all_tables())
+def get_engine() -> AsyncEngine:
+    """当前的数据库引擎, 用于会话之外的操作, 如结构迁移"""
+    return _engine
 
 
 _init_orm()
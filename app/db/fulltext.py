@@ -0,0 +1,281 @@
+"""
+传统故事与跨学科案例的全文检索
+
+- 中文没有空格分词, 按相邻两字 (bigram) 切分建立索引, 关键词按同样方式切分后
+  作为短语匹配, 对连续汉字效果等同子串匹配; 单字关键词按前缀匹配
+- 字母与数字按单词索引, 关键词按单词前缀匹配 ("py" 匹配 "Python"), 单词中间的
+  子串 ("thon") 不能匹配; 汉字与字母数字混合的关键词拆开后分别匹配, 不要求相邻
+- SQLite 使用 FTS5 虚拟表, 按 bm25 排序; PostgreSQL 使用 tsvector 列与 GIN 索引,
+  按 ts_rank 排序; 其他数据库退回 LIKE 子串匹配, 不排序
+- 检索表由迁移创建并回填, 之后通过 ORM 事件在插入、更新、删除时同步;
+  绕过 ORM 的批量写入 (如 insert(Model)) 不会同步, 需调用 rebuild
+"""
+
+import re
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    Connection,
+    MetaData,
+    Select,
+    String,
+    Table,
+    Text,
+    and_,
+    bindparam,
+    cast,
+    delete,
+    event,
+    false,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+)
+from sqlalchemy.dialects.postgresql import TSQUERY, TSVECTOR
+from sqlalchemy.orm import DeclarativeBase
+
+from .config import get_engine
+from .models import CrossDisciplineCase, TraditionalStory
+
+# 中日韩统一表意文字, 按 bigram 切分; 字母与数字按单词切分
+_TOKEN = re.compile(r"([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|([0-9A-Za-z]+)")
+
+# PostgreSQL tsvector 最多 4 个权重等级, 即最多 4 个检索列
+_PG_WEIGHTS = "ABCD"
+
+
+def tokenize(text: str) -> list[str]:
+    """索引用的词元: 连续汉字的每个 bigram 及末尾的单字, 小写的字母数字单词
+
+    每段汉字的 bigram 连续排列, 末尾单字使单字关键词能匹配到段尾的字
+    """
+    tokens = []
+    for chars, word in _TOKEN.findall(text):
+        if word:
+            tokens.append(word.lower())
+            continue
+        tokens.extend(chars[i : i + 2] for i in range(len(chars) - 1))
+        tokens.append(chars[-1])
+    return tokens
+
+
+def _query_terms(keyword: str) -> list[tuple[list[str], bool]]:
+    """关键词切分为 (短语词元, 是否前缀匹配) 列表, 各项之间为 AND 关系"""
+    terms = []
+    for chars, word in _TOKEN.findall(keyword):
+        if word:
+            terms.append(([word.lower()], True))
+        elif len(chars) == 1:
+            terms.append(([chars], True))
+        else:
+            terms.append(([chars[i : i + 2] for i in range(len(chars) - 1)], False))
+    return terms
+
+
+class SearchIndex:
+    """一个模型的全文检索表
+
+    参数:
+        model: 被检索的模型, 主键列名须为 id
+        columns: 检索列及其在排序中的权重, 按重要程度从高到低排列
+    """
+
+    def __init__(
+        self, model: type[DeclarativeBase], columns: Mapping[str, float]
+    ) -> None:
+        if len(columns) > len(_PG_WEIGHTS):
+            raise ValueError(f"检索列不能超过 {len(_PG_WEIGHTS)} 个")
+        self.model = model
+        self.columns = dict(columns)
+        self.name = f"{model.__tablename__}_search"
+        # SQLite FTS5 虚拟表的各列, PostgreSQL 为 (id, document)
+        self.fts = Table(
+            self.name,
+            MetaData(),
+            Column("id", String(50), primary_key=True),
+            *(Column(name, Text) for name in columns),
+        )
+        self.pg = Table(
+            self.name,
+            MetaData(),
+            Column("id", String(50), primary_key=True),
+            Column("document", TSVECTOR),
+        )
+        for identifier in ("after_insert", "after_update"):
+            event.listen(model, identifier, self._on_write)
+        event.listen(model, "after_delete", self._on_delete)
+
+    @property
+    def dialect(self) -> str:
+        return get_engine().dialect.name
+
+    def _document(self, target: Any) -> str:
+        """PostgreSQL tsvector 文本, 词元带位置与列权重"""
+        positions: dict[str, list[str]] = {}
+        position = 0
+        for weight, name in zip(_PG_WEIGHTS, self.columns, strict=False):
+            for token in tokenize(getattr(target, name) or ""):
+                position += 1
+                positions.setdefault(token, []).append(f"{position}{weight}")
+            # 列之间留出间隔, 短语不会跨列匹配
+            position += 1
+        return " ".join(f"'{token}':{','.join(p)}" for token, p in positions.items())
+
+    def _write(self, conn: Connection, targets: Sequence[Any]) -> None:
+        if not targets:
+            return
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            conn.execute(
+                insert(self.fts),
+                [
+                    {
+                        "id": target.id,
+                        **{
+                            name: " ".join(tokenize(getattr(target, name) or ""))
+                            for name in self.columns
+                        },
+                    }
+                    for target in targets
+                ],
+            )
+        elif dialect == "postgresql":
+            document = cast(bindparam("doc", type_=Text), TSVECTOR)
+            conn.execute(
+                insert(self.pg).values(id=bindparam("doc_id"), document=document),
+                [{"doc_id": t.id, "doc": self._document(t)} for t in targets],
+            )
+
+    def _table(self, dialect: str) -> Table | None:
+        return {"sqlite": self.fts, "postgresql": self.pg}.get(dialect)
+
+    def _on_write(self, _: Any, conn: Connection, target: Any) -> None:
+        if (table := self._table(conn.dialect.name)) is None:
+            return
+        conn.execute(delete(table).where(table.c.id == target.id))
+        self._write(conn, [target])
+
+    def _on_delete(self, _: Any, conn: Connection, target: Any) -> None:
+        if (table := self._table(conn.dialect.name)) is not None:
+            conn.execute(delete(table).where(table.c.id == target.id))
+
+    def create(self, conn: Connection) -> None:
+        """创建检索表, 已存在时跳过"""
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            columns = ", ".join(self.columns)
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} "
+                f"USING fts5(id UNINDEXED, {columns}, tokenize='unicode61')"
+            )
+        elif dialect == "postgresql":
+            self.pg.create(conn, checkfirst=True)
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.name}_document "
+                f"ON {self.name} USING GIN (document)"
+            )
+
+    def drop(self, conn: Connection) -> None:
+        """删除检索表, 检索列变更时先删除再重新创建"""
+        if (table := self._table(conn.dialect.name)) is not None:
+            table.drop(conn, checkfirst=True)
+
+    def rebuild(self, conn: Connection, batch: int = 1000) -> None:
+        """按模型表重建检索表的全部内容"""
+        if (table := self._table(conn.dialect.name)) is None:
+            return
+        conn.execute(delete(table))
+        model: Any = self.model
+        query = select(*(getattr(model, name) for name in ("id", *self.columns)))
+        query = query.order_by(model.id).limit(batch)
+        rows = conn.execute(query).all()
+        while rows:
+            self._write(conn, rows)
+            rows = conn.execute(query.where(model.id > rows[-1].id)).all()
+
+    def _fts_query(self, terms: Mapping[tuple[str, ...], str]) -> str:
+        parts = []
+        for columns, keyword in terms.items():
+            phrases = [
+                f'"{" ".join(tokens)}"' + ("*" if prefix else "")
+                for tokens, prefix in _query_terms(keyword)
+            ]
+            if phrases:
+                parts.append(f"{{{' '.join(columns)}}} : ({' AND '.join(phrases)})")
+        return " AND ".join(parts)
+
+    def _ts_query(self, terms: Mapping[tuple[str, ...], str]) -> str:
+        names = list(self.columns)
+        parts = []
+        for columns, keyword in terms.items():
+            weights = "".join(_PG_WEIGHTS[names.index(name)] for name in columns)
+            for tokens, prefix in _query_terms(keyword):
+                suffix = f":*{weights}" if prefix else f":{weights}"
+                parts.append(" <-> ".join(f"'{token}'{suffix}" for token in tokens))
+        return " & ".join(f"({part})" for part in parts)
+
+    def match[T: Select](
+        self, query: T, terms: Mapping[Sequence[str], str | None]
+    ) -> tuple[T, ColumnElement[float] | None]:
+        """按关键词筛选查询, 返回筛选后的查询与相关度
+
+        参数:
+            query: 以 self.model 为主体的查询
+            terms: 检索列 -> 关键词, 关键词为空的项忽略, 各项之间为 AND 关系
+
+        相关度越小越相关, 没有可检索的关键词时为 None;
+        退回 LIKE 匹配时相关度恒为 0
+        """
+        active = {tuple(columns): kw for columns, kw in terms.items() if kw}
+        if not active:
+            return query, None
+        # 只含标点等无法切分的关键词没有可匹配的词元, 视为无结果
+        if not all(_query_terms(kw) for kw in active.values()):
+            return query.where(false()), literal(0.0)
+
+        dialect = self.dialect
+        model: Any = self.model
+        if dialect == "sqlite":
+            table = literal_column(self.name)
+            weights = list(self.columns.values())
+            matches = (
+                select(self.fts.c.id, func.bm25(table, 0.0, *weights).label("rank"))
+                .where(table.match(self._fts_query(active)))
+                .subquery()
+            )
+        elif dialect == "postgresql":
+            ts_query = cast(self._ts_query(active), TSQUERY)
+            rank = -func.ts_rank(self.pg.c.document, ts_query)
+            matches = (
+                select(self.pg.c.id, rank.label("rank"))
+                .where(self.pg.c.document.op("@@")(ts_query))
+                .subquery()
+            )
+        else:
+            conditions = [
+                or_(*(getattr(model, name).contains(kw) for name in columns))
+                for columns, kw in active.items()
+            ]
+            return query.where(and_(*conditions)), literal(0.0)
+
+        query = query.join(matches, matches.c.id == model.id)
+        return query, matches.c.rank
+
+
+story_search = SearchIndex(TraditionalStory, {"title": 10.0, "content": 1.0})
+case_search = SearchIndex(CrossDisciplineCase, {"title": 10.0, "content": 1.0})
+
+SEARCH_INDEXES = (story_search, case_search)
+
+
+def create_search_indexes(conn: Connection) -> None:
+    """创建并回填全部检索表"""
+    for index in SEARCH_INDEXES:
+        index.create(conn)
+        index.rebuild(conn)
@@ -0,0 +1,228 @@
+"""
+数据库结构迁移
+
+- schema_version 表记录已执行的迁移版本, 应用启动时按版本顺序执行未执行的迁移
+- 每个迁移在独立的事务中执行, 成功后记录版本; 失败时应用启动失败, 已执行的迁移保留
+- 新增迁移时在 MIGRATIONS 末尾追加, 版本号递增, 已发布的迁移不再修改
+- 新建的数据库由版本 1 按当前模型建表 (含索引), 后续迁移会在其上再执行一次,
+  因此迁移须可重复执行, 如 checkfirst、先检查列是否存在
+- 已有数据可能违反唯一索引, create_indexes 不创建唯一索引, 由清理数据的迁移
+  按固定的列显式创建, 不随模型变化
+"""
+
+import logging
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple, cast
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    update,
+)
+
+from .config import Base, get_engine
+from .fulltext import case_search, create_search_indexes
+from .models import CrossDisciplineCase, KnowledgePoint, MistakeRecord, Question
+from .models.cultural_corridor import replace_case_tags
+from .models.question import question_knowledge_association
+
+logger = logging.getLogger(__name__)
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", String(30), nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_tables(conn: Connection) -> None:
+    """创建缺失的数据表 (已存在的表不会变更, 也不会补建其索引)"""
+    Base.metadata.create_all(conn)
+
+
+def create_indexes(conn: Connection) -> None:
+    """创建模型中声明而数据库中缺失的非唯一索引, 并更新查询规划器的统计信息"""
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            if not index.unique:
+                index.create(conn, checkfirst=True)
+    if conn.dialect.name in {"sqlite", "postgresql"}:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def add_pagination_indexes(conn: Connection) -> None:
+    """分页按 (created_at, id) 比较游标, 空值无法比较, 改为空字符串 (排在最后)"""
+    for model in (Question, MistakeRecord):
+        conn.execute(
+            update(model).where(model.created_at.is_(None)).values(created_at="")
+        )
+    create_indexes(conn)
+
+
+def dedupe_knowledge_points(conn: Connection) -> None:
+    """合并 (名称, 学科) 相同的知识点, 保留ID最小的一个, 然后建立唯一索引"""
+    kp = cast("Table", KnowledgePoint.__table__)
+    link = question_knowledge_association
+    groups = (
+        select(kp.c.name, kp.c.subject, func.min(kp.c.id))
+        .group_by(kp.c.name, kp.c.subject)
+        .having(func.count() > 1)
+    )
+    for name, subject, keep in conn.execute(groups).all():
+        duplicates = conn.scalars(
+            select(kp.c.id).where(
+                kp.c.name == name,
+                kp.c.subject.is_not_distinct_from(subject),
+                kp.c.id != keep,
+            )
+        ).all()
+        conn.execute(
+            update(link)
+            .where(link.c.knowledge_point_id.in_(duplicates))
+            .values(knowledge_point_id=keep)
+        )
+        conn.execute(
+            update(kp).where(kp.c.parent_id.in_(duplicates)).values(parent_id=keep)
+        )
+        conn.execute(delete(kp).where(kp.c.id.in_(duplicates)))
+
+    # 合并后同一题目可能重复关联同一知识点, 每组只保留一行
+    pairs = (
+        select(link.c.question_id, link.c.knowledge_point_id)
+        .group_by(link.c.question_id, link.c.knowledge_point_id)
+        .having(func.count() > 1)
+    )
+    for question_id, knowledge_point_id in conn.execute(pairs).all():
+        row = {"question_id": question_id, "knowledge_point_id": knowledge_point_id}
+        conn.execute(
+            delete(link).where(
+                link.c.question_id == question_id,
+                link.c.knowledge_point_id == knowledge_point_id,
+            )
+        )
+        conn.execute(insert(link).values(row))
+
+    # 唯一索引取代原来的普通索引
+    table = Table(kp.name, MetaData(), Column("name"), Column("subject"))
+    old = "ix_knowledge_points_name_subject"
+    if old in {index["name"] for index in inspect(conn).get_indexes(kp.name)}:
+        Index(old, table.c.name, table.c.subject).drop(conn)
+    unique = Index(
+        "ux_knowledge_points_name_subject", table.c.name, table.c.subject, unique=True
+    )
+    unique.create(conn, checkfirst=True)
+    create_indexes(conn)
+
+
+def add_case_tags(conn: Connection) -> None:
+    """建立案例的学科、年级关联表并按现有案例回填
+
+    相关学科、适用年级改由关联表筛选, 案例检索表不再包含这两列, 随之重建
+    """
+    create_tables(conn)
+    cases = conn.execute(
+        select(
+            CrossDisciplineCase.id,
+            CrossDisciplineCase.related_disciplines,
+            CrossDisciplineCase.suitable_grades,
+        )
+    ).all()
+    for i in range(0, len(cases), 1000):
+        replace_case_tags(conn, cases[i : i + 1000])
+    case_search.drop(conn)
+    case_search.create(conn)
+    case_search.rebuild(conn)
+
+
+# 迁移 7 中被以 (created_at, id) 结尾的分页索引取代的索引, 后者以其为前缀
+_REPLACED_INDEXES = {
+    "traditional_stories": (
+        "ix_traditional_stories_dynasty_theme",
+        "ix_traditional_stories_theme",
+    ),
+    "cross_discipline_case": ("ix_cross_discipline_case_main_discipline",),
+    "interactive_activities": ("ix_interactive_activities_type",),
+    "scenario_simulations": ("ix_scenario_simulations_type",),
+    "mistake_records": ("ix_mistake_records_student_resolved",),
+}
+
+
+def add_filtered_pagination_indexes(conn: Connection) -> None:
+    """为带筛选条件的分页建立以筛选列开头、(created_at, id) 结尾的索引
+
+    同时将题目与错题的创建时间改为非空; SQLite 不支持修改列约束,
+    已有数据库依靠模型的默认值, 新建的数据库由建表语句约束
+    """
+    for model in (Question, MistakeRecord):
+        conn.execute(
+            update(model).where(model.created_at.is_(None)).values(created_at="")
+        )
+        table = model.__tablename__
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"
+            )
+        elif conn.dialect.name == "mysql":
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table} MODIFY created_at VARCHAR(30) NOT NULL"
+            )
+
+    for name, indexes in _REPLACED_INDEXES.items():
+        table = Table(name, MetaData(), Column("id"))
+        existing = {index["name"] for index in inspect(conn).get_indexes(name)}
+        for index in indexes:
+            if index in existing:
+                Index(index, table.c.id).drop(conn)
+    create_indexes(conn)
+
+
+MIGRATIONS = [
+    Migration(1, "按模型建表", create_tables),
+    Migration(2, "为列表接口的筛选条件建立索引", create_indexes),
+    Migration(3, "为分页排序建立索引", add_pagination_indexes),
+    Migration(4, "建立故事与案例的全文检索表", create_search_indexes),
+    Migration(5, "合并重复的知识点, 知识点名称在学科内唯一", dedupe_knowledge_points),
+    Migration(6, "建立案例的学科与年级关联表", add_case_tags),
+    Migration(7, "为带筛选条件的分页建立索引", add_filtered_pagination_indexes),
+]
+
+
+async def run_migrations() -> None:
+    """执行未执行的迁移, 在应用启动时调用"""
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(schema_version.create, checkfirst=True)
+        applied = set(await conn.scalars(select(schema_version.c.version)))
+
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        logger.info("执行数据库迁移 %d: %s", migration.version, migration.description)
+        async with engine.begin() as conn:
+            await conn.run_sync(migration.upgrade)
+            await conn.execute(
+                insert(schema_version).values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                )
+            )
@@ -2,6 +2,7 @@ from .cultural_corridor import CrossDisciplineCase as CrossDisciplineCase
 from .cultural_corridor import TraditionalStory as TraditionalStory
 from .interactive import InteractiveActivity as InteractiveActivity
 from .interactive import ScenarioSimulation as ScenarioSimulation
+from .llm import LLMCallLog as LLMCallLog
 from .question import KnowledgePoint as KnowledgePoint
 from .question import MistakeRecord as MistakeRecord
 from .question import Question as Question
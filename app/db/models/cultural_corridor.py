@@ -1,4 +1,19 @@
-from sqlalchemy import ForeignKey, String, Text
+import re
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    ForeignKey,
+    Index,
+    String,
+    Table,
+    Text,
+    delete,
+    event,
+    insert,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..config import Base
@@ -8,6 +23,18 @@ class TraditionalStory(Base):
     """传统故事模型"""
 
     __tablename__ = "traditional_stories"
+    __table_args__ = (
+        Index("ix_traditional_stories_created", "created_at", "id"),
+        Index(
+            "ix_traditional_stories_dynasty_theme_created",
+            "dynasty",
+            "theme",
+            "created_at",
+            "id",
+        ),
+        Index("ix_traditional_stories_dynasty_created", "dynasty", "created_at", "id"),
+        Index("ix_traditional_stories_theme_created", "theme", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     """故事ID"""
@@ -38,6 +65,16 @@ class CrossDisciplineCase(Base):
     """跨学科延展案例模型"""
 
     __tablename__ = "cross_discipline_case"
+    __table_args__ = (
+        Index("ix_cross_discipline_case_story", "story_id"),
+        Index(
+            "ix_cross_discipline_case_main_discipline_created",
+            "main_discipline",
+            "created_at",
+            "id",
+        ),
+        Index("ix_cross_discipline_case_created", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     """案例ID"""
@@ -69,3 +106,101 @@ class CrossDisciplineCase(Base):
     story: Mapped[TraditionalStory | None] = relationship(
         back_populates="cross_discipline_cases"
     )
+
+
+# 案例的相关学科与适用年级, 由 related_disciplines、suitable_grades 拆分而来,
+# 通过 ORM 事件与案例同步, 用于按学科、年级筛选与统计
+case_disciplines = Table(
+    "case_disciplines",
+    Base.metadata,
+    Column(
+        "case_id",
+        String(50),
+        ForeignKey(CrossDisciplineCase.id),
+        primary_key=True,
+    ),
+    Column("discipline", String(50), primary_key=True),
+    Index("ix_case_disciplines_discipline", "discipline", "case_id"),
+)
+case_grades = Table(
+    "case_grades",
+    Base.metadata,
+    Column(
+        "case_id",
+        String(50),
+        ForeignKey(CrossDisciplineCase.id),
+        primary_key=True,
+    ),
+    Column("grade", String(100), primary_key=True),
+    Index("ix_case_grades_grade", "grade", "case_id"),
+)
+
+_SEPARATORS = re.compile(r"[,，、;；/]")
+_RANGE = re.compile(r"(.+?)[至到~～—-](.+)")
+_NUMERALS = "一二三四五六七八九"
+GRADES = [*(f"{n}年级" for n in _NUMERALS), "高一", "高二", "高三"]
+_GRADE_ALIASES = {"初一": "七年级", "初二": "八年级", "初三": "九年级"}
+
+
+def _split(text: str) -> list[str]:
+    """按逗号、顿号等拆分, 去除空白与重复项"""
+    parts = (part.strip() for part in _SEPARATORS.split(text))
+    return list(dict.fromkeys(part for part in parts if part))
+
+
+def split_disciplines(text: str) -> list[str]:
+    """相关学科拆分为列表"""
+    return _split(text)
+
+
+def normalize_grade(grade: str) -> str:
+    """年级的规范名称, 如 "初一"、"七"、"7年级" 均为 "七年级"; 无法识别的原样返回"""
+    grade = grade.strip().translate(str.maketrans("123456789", _NUMERALS))
+    grade = _GRADE_ALIASES.get(grade, grade)
+    return f"{grade}年级" if grade and grade in _NUMERALS else grade
+
+
+def split_grades(text: str) -> list[str]:
+    """适用年级范围拆分为年级列表, 如 "七至八年级" 为 ["七年级", "八年级"]"""
+    grades = []
+    for part in _split(text):
+        if match := _RANGE.fullmatch(part):
+            start, end = normalize_grade(match[1]), normalize_grade(match[2])
+            if start in GRADES and end in GRADES[GRADES.index(start) :]:
+                grades.extend(GRADES[GRADES.index(start) : GRADES.index(end) + 1])
+                continue
+        grades.append(normalize_grade(part))
+    return list(dict.fromkeys(grades))
+
+
+def replace_case_tags(conn: Connection, cases: Sequence[Any]) -> None:
+    """按案例的 related_disciplines、suitable_grades 重写其学科与年级关联"""
+    ids = [case.id for case in cases]
+    for table in (case_disciplines, case_grades):
+        conn.execute(delete(table).where(table.c.case_id.in_(ids)))
+    disciplines = [
+        {"case_id": case.id, "discipline": discipline}
+        for case in cases
+        for discipline in split_disciplines(case.related_disciplines)
+    ]
+    grades = [
+        {"case_id": case.id, "grade": grade}
+        for case in cases
+        for grade in split_grades(case.suitable_grades)
+    ]
+    if disciplines:
+        conn.execute(insert(case_disciplines), disciplines)
+    if grades:
+        conn.execute(insert(case_grades), grades)
+
+
+@event.listens_for(CrossDisciplineCase, "after_insert")
+@event.listens_for(CrossDisciplineCase, "after_update")
+def _write_case_tags(_: Any, conn: Connection, case: CrossDisciplineCase) -> None:
+    replace_case_tags(conn, [case])
+
+
+@event.listens_for(CrossDisciplineCase, "before_delete")
+def _delete_case_tags(_: Any, conn: Connection, case: CrossDisciplineCase) -> None:
+    for table in (case_disciplines, case_grades):
+        conn.execute(delete(table).where(table.c.case_id == case.id))
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Text
+from sqlalchemy import Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..config import Base
@@ -8,6 +8,32 @@ class InteractiveActivity(Base):
     """互动环节模型"""
 
     __tablename__ = "interactive_activities"
+    __table_args__ = (
+        Index(
+            "ix_interactive_activities_subject_grade",
+            "subject",
+            "grade",
+            "activity_type",
+        ),
+        Index("ix_interactive_activities_created", "created_at", "id"),
+        Index(
+            "ix_interactive_activities_subject_grade_created",
+            "subject",
+            "grade",
+            "created_at",
+            "id",
+        ),
+        Index(
+            "ix_interactive_activities_subject_created", "subject", "created_at", "id"
+        ),
+        Index("ix_interactive_activities_grade_created", "grade", "created_at", "id"),
+        Index(
+            "ix_interactive_activities_type_created",
+            "activity_type",
+            "created_at",
+            "id",
+        ),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -31,6 +57,27 @@ class ScenarioSimulation(Base):
     """情景模拟沙盘模型"""
 
     __tablename__ = "scenario_simulations"
+    __table_args__ = (
+        Index(
+            "ix_scenario_simulations_subject_grade",
+            "subject",
+            "grade",
+            "scenario_type",
+        ),
+        Index("ix_scenario_simulations_created", "created_at", "id"),
+        Index(
+            "ix_scenario_simulations_subject_grade_created",
+            "subject",
+            "grade",
+            "created_at",
+            "id",
+        ),
+        Index("ix_scenario_simulations_subject_created", "subject", "created_at", "id"),
+        Index("ix_scenario_simulations_grade_created", "grade", "created_at", "id"),
+        Index(
+            "ix_scenario_simulations_type_created", "scenario_type", "created_at", "id"
+        ),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -0,0 +1,35 @@
+from sqlalchemy import Float, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..config import Base
+
+
+class LLMCallLog(Base):
+    """LLM 服务商调用日志, 由 services.call_log 在后台批量写入"""
+
+    __tablename__ = "llm_call_logs"
+    __table_args__ = (
+        # 回放流量时按时间范围读取
+        Index("ix_llm_call_logs_created_at", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    request_id: Mapped[str] = mapped_column(String(32), nullable=False)
+    """所属 HTTP 请求的标识, 同一请求的多次调用相同"""
+    route: Mapped[str] = mapped_column(String(100), nullable=False)
+    """路由模板, 如 "POST /api/interactive/activities" """
+    template: Mapped[str] = mapped_column(String(100), nullable=False)
+    """提示词模板 (任务名称)"""
+    template_version: Mapped[str | None] = mapped_column(String(12))
+    """提示词模板内容哈希, 无对应模板文件时为空"""
+    prompt_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    """完整渲染后的提示词哈希, 图片按内容哈希计算"""
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    """调用结果：ok、error、cancelled"""
+    duration: Mapped[float] = mapped_column(Float, nullable=False)
+    """调用耗时(秒), 不含排队时间"""
+    prompt_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    completion_tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[str] = mapped_column(String(30), nullable=False)
+    """调用开始时间, 精确到微秒"""
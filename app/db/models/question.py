@@ -1,15 +1,33 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Table, Text
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..config import Base
 from .student import StudentInfo
 
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
 # 题目与知识点多对多关联表
 question_knowledge_association = Table(
     "question_knowledge_association",
     Base.metadata,
     Column("question_id", String(50), ForeignKey("questions.id")),
     Column("knowledge_point_id", String(50), ForeignKey("knowledge_points.id")),
+    Index("ix_question_knowledge_question", "question_id", "knowledge_point_id"),
+    Index("ix_question_knowledge_point", "knowledge_point_id", "question_id"),
 )
 
 
@@ -17,6 +35,27 @@ class Question(Base):
     """题目模型"""
 
     __tablename__ = "questions"
+    __table_args__ = (
+        # 题目列表的筛选条件: 学科、年级、题型、难度可任意组合
+        Index(
+            "ix_questions_subject_grade",
+            "subject",
+            "grade",
+            "question_type",
+            "difficulty",
+        ),
+        Index("ix_questions_grade_type", "grade", "question_type", "difficulty"),
+        Index("ix_questions_type_difficulty", "question_type", "difficulty"),
+        # 分页按 (created_at, id) 排序; 筛选后的分页以筛选列开头、排序列结尾
+        Index("ix_questions_created", "created_at", "id"),
+        Index("ix_questions_subject_created", "subject", "created_at", "id"),
+        Index(
+            "ix_questions_subject_grade_created", "subject", "grade", "created_at", "id"
+        ),
+        Index("ix_questions_grade_created", "grade", "created_at", "id"),
+        Index("ix_questions_type_created", "question_type", "created_at", "id"),
+        Index("ix_questions_difficulty_created", "difficulty", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     title: Mapped[str] = mapped_column(Text, nullable=False)
@@ -35,7 +74,7 @@ class Question(Base):
     """解析"""
     options: Mapped[str | None] = mapped_column(Text)
     """选择题选项，JSON格式"""
-    created_at: Mapped[str | None] = mapped_column(String(30))
+    created_at: Mapped[str] = mapped_column(String(30), nullable=False, default=_now)
     """创建时间"""
 
     # 与知识点的多对多关系
@@ -56,6 +95,11 @@ class KnowledgePoint(Base):
     """知识点模型"""
 
     __tablename__ = "knowledge_points"
+    __table_args__ = (
+        # 同一学科下知识点名称唯一, 并发生成题目时不会重复创建
+        Index("ux_knowledge_points_name_subject", "name", "subject", unique=True),
+        Index("ix_knowledge_points_subject_parent", "subject", "parent_id"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -92,6 +136,19 @@ class MistakeRecord(Base):
     """错题记录模型"""
 
     __tablename__ = "mistake_records"
+    __table_args__ = (
+        Index("ix_mistake_records_student_question", "student_id", "question_id"),
+        Index(
+            "ix_mistake_records_student_resolved_created",
+            "student_id",
+            "is_resolved",
+            "created_at",
+            "id",
+        ),
+        Index("ix_mistake_records_question", "question_id"),
+        Index("ix_mistake_records_created", "created_at", "id"),
+        Index("ix_mistake_records_student_created", "student_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(50), primary_key=True)
     question_id: Mapped[str] = mapped_column(
@@ -108,7 +165,7 @@ class MistakeRecord(Base):
     """是否已解决"""
     resolve_times: Mapped[int] = mapped_column(Integer, default=0)
     """解决尝试次数"""
-    created_at: Mapped[str | None] = mapped_column(String(30))
+    created_at: Mapped[str] = mapped_column(String(30), nullable=False, default=_now)
     """创建时间"""
     updated_at: Mapped[str | None] = mapped_column(String(30))
     """最后更新时间"""
@@ -76,4 +76,5 @@ class HomeworkInfo(Base):
         back_populates="homeworks",
     )
 
+    # 主键 (student_id, homework_order) 已覆盖按学号的查询, 无需另建索引
     __table_args__ = {"comment": "学生作业信息表"}  # noqa: RUF012
@@ -1,22 +1,55 @@
+import contextvars
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from sqlalchemy import event
 
 load_dotenv()
 
+from .db import run_migrations  # noqa: E402
+from .db.config import get_engine  # noqa: E402
 from .routers import (  # noqa: E402
     analysis,
     cultural_corridor,
     homework,
     interactive,
+    llm,
     question_bank,
     students,
     style_transfer,
     teaching,
 )
+from .routers._depends import bind_route, route_name  # noqa: E402
+from .routers._pagination import NEXT_CURSOR_HEADER  # noqa: E402
+from .routers.question_bank import SHORTFALL_HEADER  # noqa: E402
+from .services import metrics  # noqa: E402
+from .services.call_log import call_log  # noqa: E402
+from .services.executors import (  # noqa: E402
+    shutdown_executors,
+    warm_up_executors,
+)
+from .services.llm import call_summary  # noqa: E402
+from .services.prompts import prompts  # noqa: E402
+from .services.utils import close_openai_client  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    await run_migrations()
+    await warm_up_executors()
+    async with prompts.hot_reload(), call_log.running():
+        yield
+    await close_openai_client()
+    shutdown_executors()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 配置CORS
 app.add_middleware(
@@ -25,6 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SHORTFALL_HEADER],
 )
 
 # 注册路由
@@ -37,8 +71,50 @@ for router in (
     question_bank.router,
     cultural_corridor.router,
     style_transfer.router,
+    llm.router,
 ):
-    app.include_router(router, prefix="/api")
+    app.include_router(router, prefix="/api", dependencies=[Depends(bind_route)])
+
+
+http_request_duration = metrics.Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求处理耗时(秒), 流式响应只计算到响应头发出",
+    ("route", "status"),
+)
+http_request_db_queries = metrics.Histogram(
+    "http_request_db_queries",
+    "每个请求执行的 SQL 语句数, 随返回行数增长时说明存在逐行查询",
+    ("route",),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+_db_queries: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar(
+    "db_queries", default=None
+)
+
+
+@event.listens_for(get_engine().sync_engine, "before_cursor_execute")
+def count_db_query(*_: Any) -> None:
+    if (counter := _db_queries.get()) is not None:
+        counter[0] += 1
+
+
+@app.middleware("http")
+async def track_request_duration(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    # 路由在复制的上下文中执行, 通过共享的列表回传计数
+    queries = [0]
+    _db_queries.set(queries)
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = route_name(request)
+    http_request_duration.observe(
+        time.perf_counter() - start,
+        route=route,
+        status=str(response.status_code),
+    )
+    http_request_db_queries.observe(queries[0], route=route)
+    return response
 
 
 @app.get("/", response_class=RedirectResponse)
@@ -46,6 +122,17 @@ async def root() -> RedirectResponse:
     return RedirectResponse(url="/docs")
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def export_metrics() -> str:
+    return metrics.render()
+
+
+@app.get("/metrics/summary", include_in_schema=False)
+async def export_metrics_summary() -> list[dict[str, Any]]:
+    """各路由最近 LLM 调用的延迟与 token 用量摘要"""
+    return call_summary.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,8 +1,68 @@
-from typing import Annotated
+import os
+import secrets
+import uuid
+from typing import Annotated, Any
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from ..db import DBSession, StudentInfo
+from ..services.metrics import current_request, current_route
+from ..services.utils import set_deadline
+
+
+def route_name(request: Request) -> str:
+    """请求匹配的路由模板, 如 "GET /api/students/{student_id}", 未匹配时为 "-" """
+    route = request.scope.get("route")
+    return f"{request.method} {route.path}" if route else "-"
+
+
+async def bind_route(request: Request) -> None:
+    """将路由模板与请求标识记录到上下文, 供 LLM 调用指标与调用日志按路由分组
+
+    同时设置请求的默认时间预算 REQUEST_DEADLINE (秒), 默认 60
+    """
+    current_route.set(route_name(request))
+    current_request.set(uuid.uuid4().hex)
+    set_deadline(float(os.getenv("REQUEST_DEADLINE", "60")))
+
+
+def deadline(seconds: float) -> Any:
+    """为耗时较长的路由单独设置时间预算
+
+    用法:
+        @router.post("/generate", dependencies=[deadline(180)])
+    """
+
+    async def set_route_deadline() -> None:
+        set_deadline(seconds)
+
+    return Depends(set_route_deadline)
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def require_admin(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(_bearer)],
+) -> None:
+    """管理接口的鉴权, 请求头须带 Authorization: Bearer <ADMIN_TOKEN>
+
+    未配置 ADMIN_TOKEN 时管理接口一律拒绝
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(
+            status_code=403, detail="未配置 ADMIN_TOKEN, 管理接口已禁用"
+        )
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), token.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="管理令牌无效",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 
 async def student_from_id(db: DBSession, student_id: str):
@@ -0,0 +1,105 @@
+import base64
+import json
+from collections.abc import Sequence
+from typing import Annotated, Any
+
+from fastapi import Depends, HTTPException, Query, Response
+from sqlalchemy import ColumnElement, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+SortKey = InstrumentedAttribute[Any] | ColumnElement[Any]
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    data = json.dumps(list(values), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="无效的分页游标") from e
+    if not isinstance(values, list) or not all(
+        isinstance(value, str | int | float) for value in values
+    ):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return values
+
+
+def keyset[T: Select](
+    query: T,
+    keys: Sequence[SortKey],
+    after: list[Any] | None,
+    limit: int,
+    *,
+    descending: bool = True,
+) -> T:
+    """按 keys 排序, 取排在 after 之后的 limit 行
+
+    keys 须能唯一确定一行 (最后一列通常为主键), 且应有以 keys 结尾的索引,
+    这样任意一页都只需在索引上定位后顺序读取 limit 行, 与页码无关;
+    keys 也可以是计算列, 如全文检索的相关度, 此时每页都需计算全部匹配行
+    """
+    if after is not None:
+        if len(after) != len(keys):
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+        row, cursor = tuple_(*keys), tuple_(*after)
+        query = query.filter(row < cursor if descending else row > cursor)
+    order = [key.desc() if descending else key.asc() for key in keys]
+    return query.order_by(*order).limit(limit)
+
+
+class Page:
+    """列表接口的分页参数
+
+    - 通常按创建时间从新到旧返回, limit 为每页条数, 默认 50, 最多 200
+    - 还有下一页时, 响应头 X-Next-Cursor 为下一页的游标, 作为 cursor 参数传入
+    - 游标对客户端不透明, 只能原样传回
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        limit: Annotated[
+            int, Query(ge=1, le=MAX_PAGE_SIZE, description="每页条数")
+        ] = DEFAULT_PAGE_SIZE,
+        cursor: Annotated[
+            str | None, Query(description="上一页响应头 X-Next-Cursor 的值")
+        ] = None,
+    ) -> None:
+        self.response = response
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    async def fetch[T](
+        self,
+        db: AsyncSession,
+        query: Select[tuple[T]],
+        *keys: SortKey,
+        descending: bool = True,
+    ) -> list[T]:
+        """执行查询并返回按 keys 排序的一页对象, 有下一页时设置响应头"""
+        query = keyset(query, keys, self.after, self.limit + 1, descending=descending)
+        # 排序键随结果一并查询, 作为下一页的游标
+        rows = (await db.execute(query.add_columns(*keys))).all()
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            self.response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][1:])
+        return [row[0] for row in rows]
+
+
+Pagination = Annotated[Page, Depends()]
+"""
+依赖注入类型: 列表接口的分页参数
+
+- 在路由函数中声明参数 page: Pagination
+- 用法: items = await page.fetch(db, query, Model.created_at, Model.id)
+"""
@@ -0,0 +1,22 @@
+import json
+from collections.abc import AsyncIterable
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+
+def sse_event(event: str, data: Any) -> str:
+    """构造一条 Server-Sent Events 消息, data 以 JSON 编码"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterable[str]) -> StreamingResponse:
+    """将 SSE 消息流包装为响应
+
+    - 关闭代理缓冲, 保证每条消息立即送达浏览器
+    """
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
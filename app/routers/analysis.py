@@ -8,6 +8,8 @@ from sqlalchemy import func, select
 from ..db import DBSession, HomeworkInfo, StudentInfo
 from ..services import fleep
 from ..services.analysis import analyze_image_emotion, extract_dominant_colors
+from ..services.executors import Executor, run_sync
+from ..services.structured import register_output
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
@@ -32,6 +34,10 @@ class ImageAnalysisResponse(BaseModel):
     dimensions: ColorEmotionDimension = Field(description="基于图片颜色分析的情感维度")
 
 
+# 颜色由服务端提取, 模型只输出关键词与情感维度
+register_output("analysis/color", ImageAnalysisResponse, exclude={"colors"})
+
+
 # 学生个人分析响应模型
 class KnowledgePoint(BaseModel):
     knowledge: str = Field(description="知识点名称")
@@ -65,7 +71,7 @@ async def analyze_image(file: UploadFile = File()):
     if len(content) > 10 * 1024 * 1024:  # 10MB
         raise HTTPException(status_code=400, detail="图片大小不能超过10MB")
 
-    colors = extract_dominant_colors(content)
+    colors = await run_sync(extract_dominant_colors, Executor.CPU)(content)
     if not colors:
         raise HTTPException(status_code=500, detail="无法提取图片颜色信息")
     colors.sort(key=lambda x: x["percentage"], reverse=True)
@@ -3,10 +3,14 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, ConfigDict, Field, field_validator
-from sqlalchemy import and_, select
+from sqlalchemy import Select, and_, func, select
 
 from ..db import CrossDisciplineCase, DBSession, TraditionalStory
+from ..db.fulltext import case_search, story_search
+from ..db.models.cultural_corridor import case_disciplines, case_grades, normalize_grade
 from ..services.cultural_corridor import CulturalCorridorService
+from ..services.structured import register_output
+from ._pagination import Pagination
 
 router = APIRouter(prefix="/cultural-corridor", tags=["cultural-corridor"])
 
@@ -61,6 +65,16 @@ class CaseResponse(BaseModel):
         return v
 
 
+class FacetCount(BaseModel):
+    value: str = Field(description="取值")
+    count: int = Field(description="案例数量")
+
+
+class CaseFacets(BaseModel):
+    disciplines: list[FacetCount] = Field(description="各相关学科的案例数量")
+    grades: list[FacetCount] = Field(description="各适用年级的案例数量")
+
+
 class DynastyInfo(BaseModel):
     name: str = Field(description="朝代名称")
     period: str = Field(description="时间范围")
@@ -80,6 +94,25 @@ class DisciplineCategory(BaseModel):
 # 递归引用
 DynastyInfo.model_rebuild()
 
+# 模型输出的校验格式, 元数据字段由服务端填充
+register_output(
+    "cultural_corridor/generate_story", StoryResponse, exclude={"id", "created_at"}
+)
+register_output(
+    "cultural_corridor/generate_case",
+    CaseResponse,
+    exclude={
+        "id",
+        "created_at",
+        "story_id",
+        "main_discipline",
+        "related_disciplines",
+        "suitable_grades",
+    },
+    # 模型输出目标列表, 保存时按行拼接
+    overrides={"teaching_objectives": (list[str], Field(description="教学目标"))},
+)
+
 
 # API端点
 @router.get("/dynasties", response_model=list[DynastyInfo])
@@ -122,6 +155,8 @@ async def generate_story(request: GenerateStoryRequest, db: DBSession):
         await db.commit()
         return story_data
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"故事生成失败: {e}") from e
 
@@ -129,24 +164,33 @@ async def generate_story(request: GenerateStoryRequest, db: DBSession):
 @router.get("/stories", response_model=list[StoryResponse])
 async def list_stories(
     db: DBSession,
+    page: Pagination,
     dynasty: str | None = None,
     theme: str | None = None,
     keyword: str | None = None,
 ):
-    """查询传统故事列表"""
+    """查询传统故事列表, 按创建时间从新到旧分页
+
+    指定关键词时在标题与内容中全文检索, 按相关度排序
+    """
     query = select(TraditionalStory)
     if dynasty:
         query = query.filter(TraditionalStory.dynasty == dynasty)
     if theme:
         query = query.filter(TraditionalStory.theme == theme)
-    if keyword:
-        query = query.filter(
-            TraditionalStory.title.contains(keyword)
-            | TraditionalStory.content.contains(keyword)
-        )
+    query, rank = story_search.match(query, {("title", "content"): keyword})
 
     try:
-        return (await db.scalars(query)).all()
+        if rank is not None:
+            # 按关键词检索时按相关度排序
+            return await page.fetch(
+                db, query, rank, TraditionalStory.id, descending=False
+            )
+        return await page.fetch(
+            db, query, TraditionalStory.created_at, TraditionalStory.id
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {e}") from e
 
@@ -217,43 +261,125 @@ async def generate_case(request: GenerateCaseRequest, db: DBSession):
         raise HTTPException(status_code=500, detail=f"案例生成失败: {e}") from e
 
 
+def _filter_cases[T: Select](
+    query: T,
+    story_id: str | None,
+    main_discipline: str | None,
+    related_discipline: str | None,
+    suitable_grade: str | None,
+) -> T:
+    """按条件筛选案例, 相关学科与适用年级通过关联表连接筛选"""
+    if story_id:
+        query = query.filter(CrossDisciplineCase.story_id == story_id)
+    if main_discipline:
+        query = query.filter(CrossDisciplineCase.main_discipline == main_discipline)
+    if related_discipline:
+        query = query.join(
+            case_disciplines,
+            and_(
+                case_disciplines.c.case_id == CrossDisciplineCase.id,
+                case_disciplines.c.discipline == related_discipline,
+            ),
+        )
+    if suitable_grade:
+        query = query.join(
+            case_grades,
+            and_(
+                case_grades.c.case_id == CrossDisciplineCase.id,
+                case_grades.c.grade == normalize_grade(suitable_grade),
+            ),
+        )
+    return query
+
+
 @router.get("/cases", response_model=list[CaseResponse])
 async def list_cases(
     db: DBSession,
+    page: Pagination,
     story_id: str | None = None,
     main_discipline: str | None = None,
     related_discipline: str | None = None,
     suitable_grade: str | None = None,
+    keyword: str | None = None,
 ):
-    """查询跨学科案例列表"""
-    try:
-        # 构建查询条件
-        conditions = []
-        if story_id:
-            conditions.append(CrossDisciplineCase.story_id == story_id)
-        if main_discipline:
-            conditions.append(CrossDisciplineCase.main_discipline == main_discipline)
-        if related_discipline:
-            conditions.append(
-                CrossDisciplineCase.related_disciplines.contains(related_discipline)
-            )
-        if suitable_grade:
-            conditions.append(
-                CrossDisciplineCase.suitable_grades.contains(suitable_grade)
-            )
+    """查询跨学科案例列表, 按创建时间从新到旧分页
 
-        # 基本查询
-        query = select(CrossDisciplineCase)
-        if conditions:
-            query = query.filter(and_(*conditions))
+    - 相关学科、适用年级按拆分后的单项精确匹配, 年级可写作 "七年级"、"初一" 等
+    - 指定关键词时在标题与内容中全文检索, 按相关度排序
+    """
+    try:
+        query = _filter_cases(
+            select(CrossDisciplineCase),
+            story_id,
+            main_discipline,
+            related_discipline,
+            suitable_grade,
+        )
+        query, rank = case_search.match(query, {("title", "content"): keyword})
 
         # 执行查询
-        return (await db.scalars(query)).all()
+        if rank is not None:
+            return await page.fetch(
+                db, query, rank, CrossDisciplineCase.id, descending=False
+            )
+        return await page.fetch(
+            db, query, CrossDisciplineCase.created_at, CrossDisciplineCase.id
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {e}") from e
 
 
+@router.get("/cases/facets", response_model=CaseFacets)
+async def get_case_facets(
+    db: DBSession,
+    story_id: str | None = None,
+    main_discipline: str | None = None,
+    related_discipline: str | None = None,
+    suitable_grade: str | None = None,
+    keyword: str | None = None,
+):
+    """统计满足筛选条件的案例在各相关学科、适用年级下的数量, 用于筛选项
+
+    条件与案例列表相同; 统计某一维度时不应用该维度自身的条件,
+    以便列出可切换到的其他取值
+    """
+
+    def counts(column: Any, disciplines: str | None, grades: str | None) -> Select:
+        cases, _ = case_search.match(
+            _filter_cases(
+                select(CrossDisciplineCase.id),
+                story_id,
+                main_discipline,
+                disciplines,
+                grades,
+            ),
+            {("title", "content"): keyword},
+        )
+        count = func.count().label("count")
+        return (
+            select(column, count)
+            .where(column.table.c.case_id.in_(cases))
+            .group_by(column)
+            .order_by(count.desc(), column)
+        )
+
+    try:
+        disciplines = await db.execute(
+            counts(case_disciplines.c.discipline, None, suitable_grade)
+        )
+        grades = await db.execute(counts(case_grades.c.grade, related_discipline, None))
+        return CaseFacets(
+            disciplines=[FacetCount(value=v, count=n) for v, n in disciplines],
+            grades=[FacetCount(value=v, count=n) for v, n in grades],
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"统计失败: {e}") from e
+
+
 @router.get("/cases/{case_id}", response_model=CaseResponse)
 async def get_case(case_id: str, db: DBSession):
     """获取跨学科案例详情"""
@@ -8,6 +8,7 @@ from sqlalchemy import select
 from ..constant import UPLOAD_DIR
 from ..db import DBSession, HomeworkInfo, StudentInfo
 from ..services import fleep
+from ..services.executors import Executor, run_sync
 from ..services.homework import generate_homework_feedback
 from ._depends import StudentFromId
 
@@ -27,7 +28,7 @@ async def save_homework_image(file: UploadFile) -> Path:
     # 生成唯一文件名
     filename = f"{uuid.uuid4()}.{info.extension[0]}"
     file_path = HOMEWORK_UPLOAD_DIR / filename
-    file_path.write_bytes(head + await file.read())
+    await run_sync(file_path.write_bytes, Executor.DISK)(head + await file.read())
     return file_path.relative_to(Path.cwd())
 
 
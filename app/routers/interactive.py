@@ -7,6 +7,8 @@ from sqlalchemy import select
 
 from ..db import DBSession, InteractiveActivity, ScenarioSimulation
 from ..services.interactive import InteractiveGenerator
+from ..services.structured import register_output
+from ._pagination import Pagination
 
 router = APIRouter(prefix="/interactive", tags=["interactive"])
 
@@ -137,6 +139,20 @@ class RecommendedInteraction(BaseModel):
     content: list[str] = Field(description="互动内容")
 
 
+# 模型输出的校验格式, 元数据字段由服务端填充
+register_output(
+    "interactive/activity",
+    ActivityResponse,
+    exclude={"id", "activity_type", "subject", "grade", "duration", "created_at"},
+)
+register_output(
+    "interactive/scenario",
+    ScenarioResponse,
+    exclude={"id", "scenario_type", "subject", "grade", "created_at"},
+)
+register_output("interactive/recommendation", RecommendedInteraction)
+
+
 # API端点
 @router.post("/activities", response_model=ActivityResponse)
 async def generate_activity(request: GenerateActivityRequest, db: DBSession):
@@ -159,6 +175,8 @@ async def generate_activity(request: GenerateActivityRequest, db: DBSession):
         await db.commit()
         return {**metadata, **content}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"活动生成失败: {e!s}") from e
 
@@ -183,6 +201,8 @@ async def generate_scenario(request: GenerateScenarioRequest, db: DBSession):
         await db.commit()
         return {**metadata, **content}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"场景生成失败: {e!s}") from e
 
@@ -190,11 +210,12 @@ async def generate_scenario(request: GenerateScenarioRequest, db: DBSession):
 @router.get("/activities", response_model=list[ActivityResponse])
 async def list_activities(
     db: DBSession,
+    page: Pagination,
     subject: str | None = None,
     grade: str | None = None,
     activity_type: str | None = None,
 ):
-    """查询互动教学活动列表"""
+    """查询互动教学活动列表, 按创建时间从新到旧分页"""
     query = select(InteractiveActivity)
 
     if subject:
@@ -204,8 +225,9 @@ async def list_activities(
     if activity_type:
         query = query.filter(InteractiveActivity.activity_type == activity_type)
 
-    result = await db.execute(query)
-    activities = result.scalars().all()
+    activities = await page.fetch(
+        db, query, InteractiveActivity.created_at, InteractiveActivity.id
+    )
 
     return [ActivityResponse.from_orm(activity) for activity in activities]
 
@@ -226,11 +248,12 @@ async def get_activity(activity_id: str, db: DBSession):
 @router.get("/scenarios", response_model=list[ScenarioResponse])
 async def list_scenarios(
     db: DBSession,
+    page: Pagination,
     subject: str | None = None,
     grade: str | None = None,
     scenario_type: str | None = None,
 ):
-    """查询情景模拟场景列表"""
+    """查询情景模拟场景列表, 按创建时间从新到旧分页"""
     query = select(ScenarioSimulation)
 
     if subject:
@@ -240,8 +263,9 @@ async def list_scenarios(
     if scenario_type:
         query = query.filter(ScenarioSimulation.scenario_type == scenario_type)
 
-    result = await db.execute(query)
-    scenarios = result.scalars().all()
+    scenarios = await page.fetch(
+        db, query, ScenarioSimulation.created_at, ScenarioSimulation.id
+    )
 
     return [ScenarioResponse.from_orm(scenario) for scenario in scenarios]
 
@@ -264,5 +288,7 @@ async def get_recommendations(topic: str):
     """获取主题相关的互动建议"""
     try:
         return await InteractiveGenerator().generate_recommendations(topic)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"推荐生成失败: {e!s}") from e
@@ -0,0 +1,60 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, PositiveFloat
+
+from ..services.routing import model_router
+from ._depends import require_admin
+
+router = APIRouter(prefix="/llm", tags=["llm"])
+
+
+class TierStats(BaseModel):
+    model: str = Field(description="模型名称")
+    timeout: float = Field(description="单次调用超时(秒)")
+    calls: int = Field(description="统计窗口内的调用次数")
+    error_rate: float = Field(description="错误率")
+    p50_seconds: float = Field(description="成功调用耗时中位数(秒)")
+    p95_seconds: float = Field(description="成功调用耗时 p95 (秒)")
+
+
+class RoutingResponse(BaseModel):
+    tiers: dict[str, TierStats] = Field(description="各档位的模型与最近调用统计")
+    tasks: dict[str, str] = Field(
+        description="任务到档位的映射, 未列出的任务使用 standard"
+    )
+
+
+class UpdateRoutingRequest(BaseModel):
+    models: dict[str, str] = Field(
+        default={}, description='修改档位模型, 如 {"fast": "gpt-4o-mini"}'
+    )
+    timeouts: dict[str, PositiveFloat] = Field(
+        default={}, description="修改档位超时(秒), 须大于 0"
+    )
+    tasks: dict[str, str] = Field(
+        default={}, description='修改任务档位, 如 {"homework/prompt": "fast"}'
+    )
+
+
+@router.get("/routing", response_model=RoutingResponse)
+async def get_routing() -> dict[str, Any]:
+    """查看模型档位路由表与各档位的最近延迟"""
+    return model_router.snapshot()
+
+
+@router.put(
+    "/routing", response_model=RoutingResponse, dependencies=[Depends(require_admin)]
+)
+async def update_routing(request: UpdateRoutingRequest) -> dict[str, Any]:
+    """运行时修改模型档位路由, 进程重启后恢复为环境变量配置
+
+    需要管理令牌, 见 ADMIN_TOKEN
+    """
+    try:
+        model_router.configure(request.models, request.timeouts, request.tasks)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"档位不存在: {e.args[0]}") from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return model_router.snapshot()
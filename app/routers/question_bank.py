@@ -1,16 +1,36 @@
 import json
 import uuid
+from collections.abc import Iterable
 from datetime import datetime
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict, Field
-from sqlalchemy import and_, select
-
-from ..db import DBSession, KnowledgePoint, MistakeRecord, Question, StudentInfo
+from sqlalchemy import Insert, Select, and_, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import contains_eager, selectinload
+
+from ..db import (
+    DBSession,
+    KnowledgePoint,
+    MistakeRecord,
+    Question,
+    StudentInfo,
+    open_session,
+)
+from ..db.models.question import question_knowledge_association
 from ..services.question_bank import QuestionBankService  # , MistakeBookService
+from ..services.structured import register_output
+from ..services.utils import Priority, scheduler
+from ._depends import deadline
+from ._pagination import Pagination
+from ._sse import sse_event, sse_response
 
 router = APIRouter(prefix="/question_bank", tags=["question_bank"])
 
+SHORTFALL_HEADER = "X-Question-Shortfall"
+
 
 # 请求和响应模型
 class GenerateQuestionsRequest(BaseModel):
@@ -19,7 +39,7 @@ class GenerateQuestionsRequest(BaseModel):
     question_types: list[str] = Field(description="题型列表")
     difficulty: int = Field(ge=1, le=5, description="难度等级，1-5")
     knowledge_points: list[str] = Field(description="知识点列表")
-    count: int = Field(default=5, ge=1, le=20, description="生成题目数量")
+    count: int = Field(default=5, ge=1, le=100, description="生成题目数量")
 
 
 class QuestionOption(BaseModel):
@@ -78,6 +98,14 @@ class MistakeRecordResponse(BaseModel):
     updated_at: str = Field(description="最后更新时间")
 
 
+class MistakeStatsItem(BaseModel):
+    student_id: str | None = Field(default=None, description="学生ID")
+    subject: str | None = Field(default=None, description="学科")
+    mistake_reason: str | None = Field(default=None, description="错误原因分类")
+    is_resolved: bool | None = Field(default=None, description="是否已解决")
+    count: int = Field(description="错题数")
+
+
 class UpdateMistakeRequest(BaseModel):
     is_resolved: bool = Field(description="是否已解决")
 
@@ -85,11 +113,123 @@ class UpdateMistakeRequest(BaseModel):
 # 递归引用 KnowledgePointNode
 KnowledgePointNode.model_rebuild()
 
+# 模型输出的校验格式, 元数据字段由服务端填充
+register_output(
+    "question_bank/generate", QuestionResponse, exclude={"id", "created_at"}
+)
+register_output("question_bank/analyze_mistake", MistakeAnalysisResponse)
+
 
 # API端点
-@router.post("/generate", response_model=list[QuestionResponse])
-async def generate_questions(request: GenerateQuestionsRequest, db: DBSession):
-    """生成符合条件的题目"""
+def _insert_ignoring_conflicts(dialect: str) -> Insert:
+    """插入知识点, 与已有的 (名称, 学科) 冲突的行忽略"""
+    if dialect == "postgresql":
+        return postgresql.insert(KnowledgePoint).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(KnowledgePoint).on_conflict_do_nothing()
+    return insert(KnowledgePoint).prefix_with("IGNORE", dialect="mysql")
+
+
+async def resolve_knowledge_points(
+    db: DBSession, subject: str, names: Iterable[str]
+) -> dict[str, str]:
+    """按名称查找学科下的知识点, 不存在的先创建, 返回 名称 -> 知识点ID
+
+    先用一条 IN 查询查找, 有缺失时再批量插入并查询一次, 与知识点数量无关
+    """
+    names = set(names)
+    if not names:
+        return {}
+
+    def query(names: set[str]) -> Select[tuple[str, str]]:
+        return select(KnowledgePoint.name, KnowledgePoint.id).filter(
+            KnowledgePoint.subject == subject, KnowledgePoint.name.in_(names)
+        )
+
+    ids = dict((await db.execute(query(names))).tuples().all())
+    if missing := names - ids.keys():
+        dialect = db.get_bind().dialect.name
+        await db.execute(
+            _insert_ignoring_conflicts(dialect),
+            [
+                {"id": str(uuid.uuid4()), "name": name, "subject": subject}
+                for name in sorted(missing)
+            ],
+        )
+        # 并发生成时同名知识点可能已由其他事务插入, 重新查询实际的ID
+        ids.update((await db.execute(query(missing))).tuples().all())
+    return ids
+
+
+async def save_generated_questions(
+    db: DBSession, subject: str, questions: list[dict]
+) -> list[dict]:
+    """批量保存生成的题目及其知识点, 返回题目响应数据
+
+    知识点、题目、关联关系各自批量写入, 语句数不随题目与知识点数量增加
+    """
+    # 同一道题目中重复的知识点只关联一次
+    names = [list(dict.fromkeys(q.get("knowledge_points", []))) for q in questions]
+    ids = await resolve_knowledge_points(
+        db, subject, (name for kps in names for name in kps)
+    )
+
+    rows = [
+        {
+            "id": q["id"],
+            "title": q["title"],
+            "question_type": q["question_type"],
+            "subject": q["subject"],
+            "grade": q["grade"],
+            "difficulty": q["difficulty"],
+            "answer": q["answer"],
+            "analysis": q.get("analysis", ""),
+            "options": q.get("options"),
+            "created_at": q["created_at"],
+        }
+        for q in questions
+    ]
+    if rows:
+        await db.execute(insert(Question), rows)
+    links = [
+        {"question_id": q["id"], "knowledge_point_id": ids[name]}
+        for q, kps in zip(questions, names, strict=True)
+        for name in kps
+    ]
+    if links:
+        await db.execute(insert(question_knowledge_association), links)
+
+    result = []
+    for row, kps in zip(rows, names, strict=True):
+        # 处理选项格式
+        options = None
+        if row["options"]:
+            try:
+                options = json.loads(row["options"])
+            except json.JSONDecodeError:
+                options = None
+        result.append(
+            {
+                **row,
+                "analysis": row["analysis"] or "",
+                "options": options,
+                "knowledge_points": kps,
+            }
+        )
+    return result
+
+
+@router.post(
+    "/generate", response_model=list[QuestionResponse], dependencies=[deadline(180)]
+)
+async def generate_questions(
+    request: GenerateQuestionsRequest, db: DBSession, response: Response
+):
+    """生成符合条件的题目
+
+    部分批次失败且补齐后仍不足 count 道时, 返回已生成的题目,
+    响应头 X-Question-Shortfall 为缺少的题目数
+    """
     try:
         service = QuestionBankService()
         questions = await service.generate_questions(
@@ -102,156 +242,125 @@ async def generate_questions(request: GenerateQuestionsRequest, db: DBSession):
         )
 
         # 保存到数据库
-        for question_data in questions:
-            # 解析知识点
-            knowledge_point_names = question_data.pop("knowledge_points", [])
-            options_json = question_data.pop("options", None)
-
-            # 创建题目实例
-            question = Question(
-                id=question_data["id"],
-                title=question_data["title"],
-                question_type=question_data["question_type"],
-                subject=question_data["subject"],
-                grade=question_data["grade"],
-                difficulty=question_data["difficulty"],
-                answer=question_data["answer"],
-                analysis=question_data.get("analysis", ""),
-                options=options_json,
-                created_at=question_data["created_at"],
-            )
+        result = await save_generated_questions(db, request.subject, questions)
+        await db.commit()
+        if len(result) < request.count:
+            response.headers[SHORTFALL_HEADER] = str(request.count - len(result))
+        return result
 
-            # 关联知识点
-            for kp_name in knowledge_point_names:
-                # 检查知识点是否存在，不存在则创建
-                query = select(KnowledgePoint).filter(
-                    KnowledgePoint.name == kp_name,
-                    KnowledgePoint.subject == request.subject,
-                )
-                result = await db.execute(query)
-                knowledge_point = result.scalar_one_or_none()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"题目生成失败: {e!s}") from e
+
+
+@router.post(
+    "/generate/stream", response_class=StreamingResponse, dependencies=[deadline(300)]
+)
+async def stream_generate_questions(request: GenerateQuestionsRequest):
+    """
+    流式生成题目 (Server-Sent Events), 每道题目生成后立即保存并推送
+
+    - question: 单道题目, data 结构同 QuestionResponse
+    - done: 生成结束, data 为 {"count": 题目数量, "requested": 请求的题目数量},
+      count 少于 requested 表示补齐后仍不足
+    - error: 生成失败, data 为 {"detail": "..."}
+    """
+    # 流开始后无法再返回错误状态码, 先检查排队情况
+    scheduler.check_capacity("openai", Priority.BULK)
 
-                if not knowledge_point:
-                    knowledge_point = KnowledgePoint(
-                        id=str(uuid.uuid4()), name=kp_name, subject=request.subject
+    async def events():
+        count = 0
+        try:
+            async with open_session() as db:
+                async for question_data in QuestionBankService().stream_questions(
+                    request.subject,
+                    request.grade,
+                    request.question_types,
+                    request.difficulty,
+                    request.knowledge_points,
+                    request.count,
+                ):
+                    [question] = await save_generated_questions(
+                        db, request.subject, [question_data]
+                    )
+                    await db.commit()
+                    count += 1
+                    yield sse_event(
+                        "question",
+                        QuestionResponse.model_validate(question).model_dump(),
                     )
-                    db.add(knowledge_point)
+        except Exception as e:
+            yield sse_event("error", {"detail": f"题目生成失败: {e!s}"})
+            return
 
-                question.knowledge_points.append(knowledge_point)
+        yield sse_event("done", {"count": count, "requested": request.count})
 
-            db.add(question)
+    return sse_response(events())
 
-        await db.commit()
 
-        # 准备返回数据
-        result = []
-        for q in questions:
-            # 处理选项格式
+def _question_response(question: Question) -> dict:
+    """题目的响应数据, 知识点须已加载"""
+    # 处理选项
+    options = None
+    if question.options:
+        try:
+            options = json.loads(question.options)
+        except json.JSONDecodeError:
             options = None
-            if q.get("options"):
-                if isinstance(q["options"], str):
-                    try:
-                        options = json.loads(q["options"])
-                    except json.JSONDecodeError:
-                        options = None
-                else:
-                    options = q["options"]
-
-            result.append(
-                {
-                    "id": q["id"],
-                    "title": q["title"],
-                    "question_type": q["question_type"],
-                    "subject": q["subject"],
-                    "grade": q["grade"],
-                    "difficulty": q["difficulty"],
-                    "answer": q["answer"],
-                    "analysis": q.get("analysis", ""),
-                    "options": options,
-                    "knowledge_points": q.get("knowledge_points", []),
-                    "created_at": q["created_at"],
-                }
-            )
 
-        return result
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"题目生成失败: {e!s}") from e
+    return {
+        "id": question.id,
+        "title": question.title,
+        "question_type": question.question_type,
+        "subject": question.subject,
+        "grade": question.grade,
+        "difficulty": question.difficulty,
+        "answer": question.answer,
+        "analysis": question.analysis or "",
+        "options": options,
+        "knowledge_points": [kp.name for kp in question.knowledge_points],
+        "created_at": question.created_at,
+    }
 
 
 @router.get("/questions", response_model=list[QuestionResponse])
 async def list_questions(
     db: DBSession,
+    page: Pagination,
     subject: str | None = None,
     grade: str | None = None,
     question_type: str | None = None,
     difficulty: int | None = None,
     knowledge_point: str | None = None,
 ):
-    """查询题目列表"""
+    """查询题目列表, 按创建时间从新到旧分页
+
+    题目与知识点共两条查询, 不随题目数量增加
+    """
     try:
-        # 构建查询条件
-        query = select(Question)
+        query = select(Question).options(selectinload(Question.knowledge_points))
         if subject:
-            query.filter(Question.subject == subject)
+            query = query.filter(Question.subject == subject)
         if grade:
-            query.filter(Question.grade == grade)
+            query = query.filter(Question.grade == grade)
         if question_type:
-            query.filter(Question.question_type == question_type)
+            query = query.filter(Question.question_type == question_type)
         if difficulty:
-            query.filter(Question.difficulty == difficulty)
-
-        # 知识点过滤需要单独处理
+            query = query.filter(Question.difficulty == difficulty)
         if knowledge_point:
-            kp_query = select(KnowledgePoint).filter(
-                KnowledgePoint.name == knowledge_point
-            )
-            kp = await db.scalar(kp_query)
-            if not kp:
-                # 如果知识点不存在，返回空列表
-                return []
-
-            # 使用关联表过滤
-            query = query.filter(
-                Question.knowledge_points.any(KnowledgePoint.id == kp.id)
-            )
-
-        # 执行查询
-        questions = (await db.scalars(query)).all()
-
-        # 格式化响应
-        response = []
-        for q in questions:
-            # 处理选项
-            options = None
-            if q.options:
-                try:
-                    options = json.loads(q.options)
-                except json.JSONDecodeError:
-                    options = None
-
-            # 获取知识点名称列表
-            await db.refresh(q, ["knowledge_points"])
-            knowledge_point_names = [kp.name for kp in q.knowledge_points]
-
-            response.append(
-                {
-                    "id": q.id,
-                    "title": q.title,
-                    "question_type": q.question_type,
-                    "subject": q.subject,
-                    "grade": q.grade,
-                    "difficulty": q.difficulty,
-                    "answer": q.answer,
-                    "analysis": q.analysis or "",
-                    "options": options,
-                    "knowledge_points": knowledge_point_names,
-                    "created_at": q.created_at,
-                }
+            # 不同学科可能有同名知识点, 去重
+            query = (
+                query.join(Question.knowledge_points)
+                .filter(KnowledgePoint.name == knowledge_point)
+                .distinct()
             )
 
-        return response
+        questions = await page.fetch(db, query, Question.created_at, Question.id)
+        return [_question_response(q) for q in questions]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"查询失败: {e!s}") from e
 
@@ -259,38 +368,13 @@ async def list_questions(
 @router.get("/questions/{question_id}", response_model=QuestionResponse)
 async def get_question(question_id: str, db: DBSession):
     """获取题目详情"""
-    query = select(Question).filter(Question.id == question_id)
-    result = await db.execute(query)
-    question = result.scalar_one_or_none()
-
+    question = await db.get(
+        Question, question_id, options=[selectinload(Question.knowledge_points)]
+    )
     if not question:
         raise HTTPException(status_code=404, detail="题目不存在")
 
-    # 处理选项
-    options = None
-    if question.options:
-        try:
-            options = json.loads(question.options)
-        except json.JSONDecodeError:
-            options = None
-
-    # 获取知识点名称列表
-    await db.refresh(question, ["knowledge_points"])
-    knowledge_point_names = [kp.name for kp in question.knowledge_points]
-
-    return {
-        "id": question.id,
-        "title": question.title,
-        "question_type": question.question_type,
-        "subject": question.subject,
-        "grade": question.grade,
-        "difficulty": question.difficulty,
-        "answer": question.answer,
-        "analysis": question.analysis or "",
-        "options": options,
-        "knowledge_points": knowledge_point_names,
-        "created_at": question.created_at,
-    }
+    return _question_response(question)
 
 
 @router.get("/knowledge_points", response_model=list[KnowledgePointNode])
@@ -373,87 +457,122 @@ async def analyze_mistake(request: AnalyzeMistakeRequest, db: DBSession):
         await db.commit()
         return analysis_result
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"错题分析失败: {e!s}") from e
 
 
+def _mistake_response(mistake: MistakeRecord) -> dict:
+    """错题记录的响应数据, 题目及其知识点须已加载"""
+    return {
+        "id": mistake.id,
+        "question_id": mistake.question_id,
+        "student_id": mistake.student_id,
+        "question": mistake.question and _question_response(mistake.question),
+        "answer": mistake.answer,
+        "mistake_reason": mistake.mistake_reason,
+        "is_resolved": mistake.is_resolved,
+        "resolve_times": mistake.resolve_times,
+        "created_at": mistake.created_at,
+        "updated_at": mistake.updated_at,
+    }
+
+
 @router.get("/mistakes", response_model=list[MistakeRecordResponse])
 async def list_mistakes(
     db: DBSession,
+    page: Pagination,
     student_id: str | None = None,
     subject: str | None = None,
     is_resolved: bool | None = None,
 ):
-    """获取错题列表"""
+    """获取错题列表, 按创建时间从新到旧分页
+
+    错题与题目在一条查询中联表读取, 题目的知识点另用一条查询加载
+    """
     try:
         # 构建查询条件
         conditions = []
         if student_id:
             conditions.append(MistakeRecord.student_id == student_id)
+        if subject:
+            conditions.append(Question.subject == subject)
         if is_resolved is not None:
             conditions.append(MistakeRecord.is_resolved == is_resolved)
 
-        # 基本查询
-        query = select(MistakeRecord)
+        query = (
+            select(MistakeRecord)
+            .outerjoin(MistakeRecord.question)
+            .options(
+                contains_eager(MistakeRecord.question).selectinload(
+                    Question.knowledge_points
+                )
+            )
+        )
         if conditions:
             query = query.filter(and_(*conditions))
 
-        # 执行查询
-        mistakes = (await db.scalars(query)).all()
+        mistakes = await page.fetch(
+            db, query, MistakeRecord.created_at, MistakeRecord.id
+        )
+        return [_mistake_response(m) for m in mistakes]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询失败: {e!s}") from e
 
-        # 格式化响应
-        response = []
-        for m in mistakes:
-            # 查询相关题目
-            question_query = select(Question).filter(Question.id == m.question_id)
-            question_result = await db.execute(question_query)
-            question = question_result.scalar_one_or_none()
 
-            # 如果指定了学科过滤且题目不属于该学科，则跳过
-            if subject and question and question.subject != subject:
-                continue
+# 错题统计可选的分组维度
+MISTAKE_STATS_DIMENSIONS = {
+    "student_id": MistakeRecord.student_id,
+    "subject": Question.subject,
+    "mistake_reason": MistakeRecord.mistake_reason,
+    "is_resolved": MistakeRecord.is_resolved,
+}
 
-            # 题目字典
-            question_dict = None
-            if question:
-                options = None
-                if question.options:
-                    try:
-                        options = json.loads(question.options)
-                    except json.JSONDecodeError:
-                        options = None
-
-                question_dict = {
-                    "id": question.id,
-                    "title": question.title,
-                    "question_type": question.question_type,
-                    "subject": question.subject,
-                    "grade": question.grade,
-                    "difficulty": question.difficulty,
-                    "answer": question.answer,
-                    "analysis": question.analysis or "",
-                    "options": options,
-                }
-
-            response.append(
-                {
-                    "id": m.id,
-                    "question_id": m.question_id,
-                    "student_id": m.student_id,
-                    "question": question_dict,
-                    "answer": m.answer,
-                    "mistake_reason": m.mistake_reason,
-                    "is_resolved": m.is_resolved,
-                    "resolve_times": m.resolve_times,
-                    "created_at": m.created_at,
-                    "updated_at": m.updated_at,
-                }
-            )
 
-        return response
+@router.get(
+    "/mistakes/stats",
+    response_model=list[MistakeStatsItem],
+    response_model_exclude_unset=True,
+)
+async def mistake_stats(
+    db: DBSession,
+    group_by: Annotated[
+        list[Literal["student_id", "subject", "mistake_reason", "is_resolved"]] | None,
+        Query(description="分组维度, 可重复指定, 默认使用全部维度"),
+    ] = None,
+    student_id: str | None = None,
+    subject: str | None = None,
+    is_resolved: bool | None = None,
+):
+    """按学生、学科、错误原因与解决状态统计错题数, 在数据库中分组计数
+
+    响应中只包含分组维度与错题数
+    """
+    dimensions = dict.fromkeys(group_by or MISTAKE_STATS_DIMENSIONS)
+    columns = [MISTAKE_STATS_DIMENSIONS[name].label(name) for name in dimensions]
+    count = func.count(MistakeRecord.id).label("count")
+    query = (
+        select(*columns, count)
+        .select_from(MistakeRecord)
+        .outerjoin(MistakeRecord.question)
+        .group_by(*columns)
+        .order_by(count.desc())
+    )
+    if student_id:
+        query = query.filter(MistakeRecord.student_id == student_id)
+    if subject:
+        query = query.filter(Question.subject == subject)
+    if is_resolved is not None:
+        query = query.filter(MistakeRecord.is_resolved == is_resolved)
 
+    try:
+        return (await db.execute(query)).mappings().all()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"查询失败: {e!s}") from e
+        raise HTTPException(status_code=500, detail=f"统计失败: {e!s}") from e
 
 
 @router.patch("/mistakes/{mistake_id}", response_model=MistakeRecordResponse)
@@ -473,4 +592,6 @@ async def update_mistake(mistake_id: str, request: UpdateMistakeRequest, db: DBS
     await db.commit()
     await db.refresh(mistake)
     await db.refresh(mistake, ["question"])
-    return mistake
+    if mistake.question:
+        await db.refresh(mistake.question, ["knowledge_points"])
+    return _mistake_response(mistake)
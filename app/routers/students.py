@@ -5,9 +5,11 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, ConfigDict, field_validator
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 from ..db import DBSession, StudentInfo
 from ._depends import StudentFromId
+from ._pagination import Pagination
 from .homework import HomeworkResponse
 
 router = APIRouter(prefix="/students", tags=["students"])
@@ -30,26 +32,23 @@ class StudentResponse(BaseModel):
 @router.get("/", response_model=list[StudentResponse])
 async def get_students(
     db: DBSession,
+    page: Pagination,
     student_name: str | None = None,
     gender: str | None = None,
 ):
     """
     根据姓名和性别筛选学生及其作业信息
-    作业按照次序升序排序展示
+    学生按学号升序分页, 作业按照次序升序排序展示
     """
 
-    stmt = select(StudentInfo)
+    stmt = select(StudentInfo).options(selectinload(StudentInfo.homeworks))
     if student_name:
         stmt = stmt.filter(StudentInfo.student_name.like(f"%{student_name}%"))
     if gender:
         stmt = stmt.filter(StudentInfo.gender == gender)
 
-    # 获取符合条件的学生
-    students = (await db.scalars(stmt)).all()
-    for student in students:
-        await db.refresh(student, ["homeworks"])
-
-    return students
+    # 获取符合条件的学生, 作业在一条查询中一并加载
+    return await page.fetch(db, stmt, StudentInfo.student_id, descending=False)
 
 
 class CreateStudentRequest(BaseModel):
@@ -3,12 +3,13 @@ from fastapi.responses import FileResponse
 
 from ..services import fleep
 from ..services.style_transfer import StyleTransferService
+from ._depends import deadline
 
 router = APIRouter(prefix="/style-transfer", tags=["style-transfer"])
 service = StyleTransferService()
 
 
-@router.post("/generate", response_class=FileResponse)
+@router.post("/generate", response_class=FileResponse, dependencies=[deadline(120)])
 async def generate_styled_image(
     style_prompt: str = Form(...),
     file: UploadFile = File(...),
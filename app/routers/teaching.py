@@ -2,10 +2,13 @@ import asyncio
 import uuid
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from ..services.teaching_plan import TeachingPlanGenerator
+from ..services.utils import scheduler
+from ._depends import deadline
+from ._sse import sse_event, sse_response
 
 router = APIRouter(prefix="/teaching", tags=["teaching"])
 teaching_plan_cache: dict[str, str] = {}
@@ -16,7 +19,19 @@ class GenerateTeachingPlanResponse(BaseModel):
     plan: str = Field(description="生成的教案")
 
 
-@router.post("/generate_plan", response_model=GenerateTeachingPlanResponse)
+def save_teaching_plan(plan: str) -> str:
+    """缓存教案一小时, 返回教案 ID"""
+    plan_id = str(uuid.uuid4())
+    teaching_plan_cache[plan_id] = plan
+    asyncio.get_event_loop().call_later(3600, teaching_plan_cache.pop, plan_id)
+    return plan_id
+
+
+@router.post(
+    "/generate_plan",
+    response_model=GenerateTeachingPlanResponse,
+    dependencies=[deadline(180)],
+)
 async def generate_teaching_plan(
     grade: str = Form(description="年级"),
     images: list[UploadFile] = File(description="教材图片文件"),
@@ -24,13 +39,53 @@ async def generate_teaching_plan(
     plan = await TeachingPlanGenerator().generate(
         grade, [await img.read() for img in images]
     )
-    plan_id = str(uuid.uuid4())
-    teaching_plan_cache[plan_id] = plan
-    asyncio.get_event_loop().call_later(3600, teaching_plan_cache.pop, plan_id)
-    return {"plan": plan, "plan_id": plan_id}
+    return {"plan": plan, "plan_id": save_teaching_plan(plan)}
+
+
+@router.post(
+    "/generate_plan/stream",
+    response_class=StreamingResponse,
+    dependencies=[deadline(300)],
+)
+async def stream_teaching_plan(
+    grade: str = Form(description="年级"),
+    images: list[UploadFile] = File(description="教材图片文件"),
+):
+    """
+    流式生成教案 (Server-Sent Events)
+
+    - delta: 教案 Markdown 增量, data 为 {"text": "..."}
+    - done: 生成结束, data 为 {"plan_id": "..."}
+    - error: 生成失败, data 为 {"detail": "..."}
+    """
+    # 流开始后无法再返回错误状态码, 先检查排队情况
+    scheduler.check_capacity("openai")
+    contents = [await img.read() for img in images]
+
+    async def events():
+        chunks: list[str] = []
+        try:
+            async for delta in TeachingPlanGenerator().generate_stream(grade, contents):
+                chunks.append(delta)
+                yield sse_event("delta", {"text": delta})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"教案生成失败: {e}"})
+            return
+
+        if not chunks:
+            # 模型输出中没有标题, 不保存空教案
+            yield sse_event("error", {"detail": "教案生成失败: 模型未返回教案内容"})
+            return
+        yield sse_event("done", {"plan_id": save_teaching_plan("".join(chunks))})
+
+    return sse_response(events())
 
 
-@router.get("/plan_document/{plan_id}", response_class=FileResponse)
+@router.get(
+    "/plan_document/{plan_id}",
+    response_class=FileResponse,
+    dependencies=[deadline(180)],
+)
 async def get_teaching_plan_document(plan_id: str) -> FileResponse:
     plan = teaching_plan_cache.get(plan_id)
     if plan is None:
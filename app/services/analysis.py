@@ -1,15 +1,14 @@
 import io
-import json
 from collections import Counter
 
 from fastapi import HTTPException
 from PIL import Image
 
-from ..constant import ASSETS_DIR
-from .utils import CompletionMessage, get_openai_client, run_sync
-
-ASSETS_ROOT = ASSETS_DIR / "analysis"
-PROMPT_ANALYZE_COLOR = ASSETS_ROOT / "color.md"
+from .images import image_optimizer
+from .llm import complete
+from .prompts import prompts
+from .structured import parse_output, response_format
+from .utils import CompletionMessage
 
 
 def normalize_color(color: tuple[int, ...]) -> tuple[int, ...]:
@@ -61,24 +60,23 @@ async def analyze_image_emotion(
     color_info = "\n".join(
         f"- {color['hex']} 占比{color['percentage']}%" for color in colors
     )
-    prompt = PROMPT_ANALYZE_COLOR.read_text(encoding="utf-8").replace(
-        "{{color_info}}", color_info
-    )
-
-    client, model_name = get_openai_client()
+    prompt = prompts.render("analysis/color", color_info=color_info)
 
     try:
-        response = await run_sync(client.chat.completions.create)(
-            model=model_name,
-            messages=[CompletionMessage().text(prompt).image(image).build()],
+        [image_url] = await image_optimizer.data_urls([image])
+        content = await complete(
+            CompletionMessage().text(prompt).image(image_url),
+            task="analysis/color",
+            response_format=response_format("analysis/color"),
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail="分析图片情感失败，请稍后再试",
         ) from e
 
-    content = response.choices[0].message.content or ""
     if not content:
         raise HTTPException(
             status_code=500,
@@ -86,8 +84,8 @@ async def analyze_image_emotion(
         )
 
     try:
-        return json.loads(content[content.find("{") : content.rfind("}") + 1])
-    except json.JSONDecodeError as e:
+        return await parse_output("analysis/color", content)
+    except ValueError as e:
         raise HTTPException(
             status_code=500,
             detail="分析结果格式错误，请稍后再试",
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from ..constant import CACHE_DIR
+from .executors import Executor, run_sync
+from .metrics import Counter
+
+COMPLETION_CACHE_DIR = CACHE_DIR / "completions"
+
+# 各任务(提示词模板)的缓存有效期(秒), 未列出的任务不缓存
+CACHE_TTL: dict[str, float] = {
+    "interactive/recommendation": 24 * 3600,
+    "cultural_corridor/generate_case": 6 * 3600,
+    "question_bank/analyze_mistake": 24 * 3600,
+    "teaching_plan/convert": 3600,
+}
+
+cache_lookups = Counter(
+    "llm_cache_lookups_total",
+    "LLM 补全缓存查询次数",
+    ("task", "result"),
+)
+
+
+def _normalize(obj: Any) -> Any:
+    """图片以 data URL 形式出现在消息中, 替换为其哈希以缩短序列化长度"""
+    if isinstance(obj, dict):
+        if obj.get("type") == "image_url":
+            url: str = obj["image_url"]["url"]
+            return {"image": hashlib.sha256(url.encode()).hexdigest()}
+        return {k: _normalize(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_normalize(v) for v in obj]
+    return obj
+
+
+def completion_key(
+    model: str,
+    messages: list[Any],
+    temperature: float | None,
+    version: str | None = None,
+) -> str:
+    """计算补全请求的缓存键
+
+    - 键由模型名称、完整渲染后的提示词、图片内容哈希、温度和
+      提示词模板版本共同决定, 模板修改后旧缓存自然失效
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": _normalize(messages),
+            "temperature": temperature,
+            "version": version,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def prompt_hash(messages: list[Any]) -> str:
+    """完整渲染后的提示词哈希, 与模型和采样参数无关, 用于调用日志"""
+    payload = json.dumps(_normalize(messages), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CompletionCache:
+    """两级 LLM 补全缓存
+
+    - 第一级: 进程内 LRU, 容量由 LLM_CACHE_MEMORY_SIZE 配置, 默认 512
+    - 第二级: CACHE_DIR/completions 下的 JSON 文件, 进程重启后仍可命中
+    - 有效期按任务配置 (见 CACHE_TTL)
+    - 环境变量 LLM_CACHE_DISABLE 可关闭缓存: 逗号分隔的任务名, 或 * 表示全部
+    """
+
+    def __init__(self) -> None:
+        self.max_size = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "512"))
+        self.disabled = {
+            task.strip()
+            for task in os.getenv("LLM_CACHE_DISABLE", "").split(",")
+            if task.strip()
+        }
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def ttl(self, task: str) -> float | None:
+        """获取任务的缓存有效期, 未启用缓存时返回 None"""
+        if "*" in self.disabled or task in self.disabled:
+            return None
+        return CACHE_TTL.get(task)
+
+    @staticmethod
+    def _path(key: str) -> Path:
+        return COMPLETION_CACHE_DIR / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> tuple[float, str] | None:
+        try:
+            data = json.loads(self._path(key).read_text("utf-8"))
+            return float(data["expires_at"]), str(data["content"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, expires_at: float, content: str) -> None:
+        path = self._path(key)
+        temp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp.write_text(
+                json.dumps({"expires_at": expires_at, "content": content}),
+                "utf-8",
+            )
+            temp.replace(path)
+        except OSError:
+            # 磁盘缓存写入失败不影响本次请求
+            temp.unlink(missing_ok=True)
+
+    def _remember(self, key: str, expires_at: float, content: str) -> None:
+        self._memory[key] = (expires_at, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, task: str, key: str) -> str | None:
+        """查询缓存, 未命中或已过期时返回 None"""
+        if self.ttl(task) is None:
+            return None
+
+        now = time.time()
+        if (entry := self._memory.get(key)) is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                cache_lookups.inc(task=task, result="memory_hit")
+                return entry[1]
+            del self._memory[key]
+
+        entry = await run_sync(self._read_disk, Executor.DISK)(key)
+        if entry is not None and entry[0] > now:
+            self._remember(key, *entry)
+            cache_lookups.inc(task=task, result="disk_hit")
+            return entry[1]
+
+        cache_lookups.inc(task=task, result="miss")
+        return None
+
+    async def set(self, task: str, key: str, content: str) -> None:
+        """写入缓存, 任务未启用缓存时忽略"""
+        if (ttl := self.ttl(task)) is None:
+            return
+
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, content)
+        await run_sync(self._write_disk, Executor.DISK)(key, expires_at, content)
+
+
+completion_cache = CompletionCache()
@@ -0,0 +1,99 @@
+import asyncio
+import dataclasses
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import insert
+
+from ..db import LLMCallLog, open_session
+from .metrics import Counter
+
+if TYPE_CHECKING:
+    from .llm import CallRecord
+
+logger = logging.getLogger(__name__)
+
+call_log_rows = Counter(
+    "llm_call_log_rows_total",
+    "LLM 调用日志的记录数, result 为 written、queue_full (队列已满) 或 db_error",
+    ("result",),
+)
+
+
+class CallLogWriter:
+    """LLM 调用日志的后台批量写入
+
+    - add() 只把记录放入内存队列, 请求路径上不等待数据库
+    - 后台任务攒够 LLM_CALL_LOG_BATCH 条 (默认 200) 或距首条记录
+      LLM_CALL_LOG_FLUSH_INTERVAL 秒 (默认 1) 后, 以一条 INSERT 批量写入
+    - 队列中超过 LLM_CALL_LOG_QUEUE 条 (默认 10000) 时丢弃新记录;
+      写入失败时丢弃该批记录, 两者均只计数, 不影响请求
+    - LLM_CALL_LOG=0 时关闭
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("LLM_CALL_LOG", "1") != "0"
+        self.batch_size = int(os.getenv("LLM_CALL_LOG_BATCH", "200"))
+        self.flush_interval = float(os.getenv("LLM_CALL_LOG_FLUSH_INTERVAL", "1"))
+        self.max_queue = int(os.getenv("LLM_CALL_LOG_QUEUE", "10000"))
+        self._queue: asyncio.Queue[dict[str, Any] | None] | None = None
+
+    def add(self, record: "CallRecord") -> None:
+        """记录一次调用, 写入器未运行时忽略"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(dataclasses.asdict(record))
+        except asyncio.QueueFull:
+            call_log_rows.inc(result="queue_full")
+
+    async def _write(self, rows: list[dict[str, Any]]) -> None:
+        try:
+            async with open_session() as db:
+                await db.execute(insert(LLMCallLog), rows)
+        except Exception:
+            logger.exception("写入 %d 条 LLM 调用日志失败", len(rows))
+            call_log_rows.inc(len(rows), result="db_error")
+        else:
+            call_log_rows.inc(len(rows), result="written")
+
+    async def _run(self, queue: asyncio.Queue[dict[str, Any] | None]) -> None:
+        """收到 None 时写入剩余记录并退出"""
+        loop = asyncio.get_running_loop()
+        while (row := await queue.get()) is not None:
+            rows = [row]
+            flush_at = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    async with asyncio.timeout_at(flush_at):
+                        row = await queue.get()
+                except TimeoutError:
+                    break
+                if row is None:
+                    await self._write(rows)
+                    return
+                rows.append(row)
+            await self._write(rows)
+
+    @asynccontextmanager
+    async def running(self) -> AsyncIterator[None]:
+        """在应用生命周期内运行后台写入任务, 退出时写入队列中剩余的记录"""
+        if not self.enabled:
+            yield
+            return
+        queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(self.max_queue)
+        task = asyncio.create_task(self._run(queue))
+        self._queue = queue
+        try:
+            yield
+        finally:
+            self._queue = None
+            # 队列已满时等待后台任务腾出空间
+            await queue.put(None)
+            await task
+
+
+call_log = CallLogWriter()
@@ -1,16 +1,12 @@
-import json
 import uuid
 from datetime import datetime
 from typing import Any
 
-from ..constant import ASSETS_DIR
 from ..db import TraditionalStory
-from .utils import CompletionMessage, get_openai_client, run_sync
-
-ASSETS_ROOT = ASSETS_DIR / "cultural_corridor"
-PROMPT_GENERATE_STORY = ASSETS_ROOT / "generate_story.md"
-PROMPT_GENERATE_CASE = ASSETS_ROOT / "generate_case.md"
-TEMPLATE_STORY_CONTEXT = ASSETS_ROOT / "story_context.md"
+from .prompts import prompts
+from .structured import complete_json
+from .tokens import fit_prompt
+from .utils import CompletionMessage
 
 DYNASTY_LIST = [
     {"name": "夏朝", "period": "约前2070年-约前1600年"},
@@ -152,9 +148,6 @@ DISCIPLINE_CATEGORIES = [
 class CulturalCorridorService:
     """时空走廊服务"""
 
-    def __init__(self) -> None:
-        self.client, self.model_name = get_openai_client()
-
     async def generate_traditional_story(
         self, dynasty: str | None, theme: str, keywords: list[str]
     ) -> dict[str, Any]:
@@ -170,42 +163,30 @@ class CulturalCorridorService:
         """
 
         # 准备提示内容
-        prompt = (
-            PROMPT_GENERATE_STORY.read_text("utf-8")
-            .replace("{{dynasty}}", dynasty or "不限")
-            .replace("{{theme}}", theme)
-            .replace("{{keywords}}", ", ".join(keywords))
+        prompt = prompts.render(
+            "cultural_corridor/generate_story",
+            dynasty=dynasty or "不限",
+            theme=theme,
+            keywords=", ".join(keywords),
         )
 
-        # 调用OpenAI API
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用OpenAI API, 输出经校验后返回
+        story_data: dict[str, Any] = await complete_json(
+            CompletionMessage().text(prompt),
+            task="cultural_corridor/generate_story",
             temperature=0.7,
         )
 
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("生成故事失败: 返回结果为空")
-
-        # 解析JSON内容
-        try:
-            content = content[content.index("{") : content.rindex("}") + 1]
-            story_data: dict[str, Any] = json.loads(content)
-
-            # 添加ID和创建时间
-            story_data["id"] = str(uuid.uuid4())
-            story_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 添加ID和创建时间
+        story_data["id"] = str(uuid.uuid4())
+        story_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            # 确保包含必要字段
-            story_data.setdefault("theme", theme)
-            for field in "title", "dynasty", "theme", "content", "moral":
-                story_data.setdefault(field, "")
+        # 确保包含必要字段
+        story_data.setdefault("theme", theme)
+        for field in "title", "dynasty", "theme", "content", "moral":
+            story_data.setdefault(field, "")
 
-            return story_data
-        except Exception as err:
-            raise ValueError(f"解析生成内容失败: {err}") from err
+        return story_data
 
     @staticmethod
     def format_story_context(story: TraditionalStory) -> str:
@@ -217,15 +198,15 @@ class CulturalCorridorService:
         Returns:
             格式化后的故事上下文
         """
-        # 从模板文件读取内容并替换占位符
-        return (
-            TEMPLATE_STORY_CONTEXT.read_text("utf-8")
-            .replace("{{title}}", story.title)
-            .replace("{{dynasty}}", story.dynasty or "<朝代:无>")
-            .replace("{{period}}", story.period or "<时期:无>")
-            .replace("{{theme}}", story.theme)
-            .replace("{{content}}", story.content)
-            .replace("{{moral}}", story.moral or "无")
+        # 使用模板填充故事信息
+        return prompts.render(
+            "cultural_corridor/story_context",
+            title=story.title,
+            dynasty=story.dynasty or "<朝代:无>",
+            period=story.period or "<时期:无>",
+            theme=story.theme,
+            content=story.content,
+            moral=story.moral or "无",
         )
 
     async def generate_cross_discipline_case(
@@ -247,47 +228,36 @@ class CulturalCorridorService:
         Returns:
             生成的案例内容
         """
-        # 准备提示内容
-        prompt = (
-            PROMPT_GENERATE_CASE.read_text("utf-8")
-            .replace("{{main_discipline}}", main_discipline)
-            .replace("{{related_disciplines}}", ", ".join(related_disciplines))
-            .replace("{{suitable_grades}}", suitable_grades)
-            .replace("{{story_context}}", story_context or "无需基于特定故事")
+        # 准备提示内容, 故事过长时截断故事正文
+        prompt = fit_prompt(
+            "cultural_corridor/generate_case",
+            trim={"story_context": 1},
+            main_discipline=main_discipline,
+            related_disciplines=", ".join(related_disciplines),
+            suitable_grades=suitable_grades,
+            story_context=story_context or "无需基于特定故事",
         )
 
-        # 调用OpenAI API
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用OpenAI API, 输出经校验后返回
+        case_data: dict[str, Any] = await complete_json(
+            CompletionMessage().text(prompt),
+            task="cultural_corridor/generate_case",
             temperature=0.7,
         )
 
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("生成案例失败: 返回结果为空")
-
-        # 解析JSON内容
-        try:
-            content = content[content.index("{") : content.rindex("}") + 1]
-            case_data: dict[str, Any] = json.loads(content)
-
-            # 添加ID和创建时间
-            case_data["id"] = str(uuid.uuid4())
-            case_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            case_data["story_id"] = story_id
-            case_data["main_discipline"] = main_discipline
-            case_data["related_disciplines"] = ",".join(related_disciplines)
-            case_data["suitable_grades"] = suitable_grades
+        # 添加ID和创建时间
+        case_data["id"] = str(uuid.uuid4())
+        case_data["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        case_data["story_id"] = story_id
+        case_data["main_discipline"] = main_discipline
+        case_data["related_disciplines"] = ",".join(related_disciplines)
+        case_data["suitable_grades"] = suitable_grades
 
-            # 确保包含必要字段
-            for field in "title", "content", "teaching_objectives":
-                case_data.setdefault(field, "")
+        # 确保包含必要字段
+        for field in "title", "content", "teaching_objectives":
+            case_data.setdefault(field, "")
 
-            return case_data
-        except Exception as err:
-            raise ValueError(f"解析生成内容失败: {err}") from err
+        return case_data
 
     @staticmethod
     def get_dynasty_list() -> list[dict[str, Any]]:
@@ -0,0 +1,152 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import enum
+import functools
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+from .metrics import Counter, Gauge
+
+
+class Executor(enum.StrEnum):
+    """同步函数的工作负载类别, 各类别使用独立的执行器, 互不阻塞"""
+
+    IO = "io"
+    """阻塞的网络调用, 线程池, 大小由 EXECUTOR_IO_WORKERS 配置, 默认 32"""
+    CPU = "cpu"
+    """图片解码、压缩等 CPU 密集计算, 进程池, 大小由 EXECUTOR_CPU_WORKERS 配置,
+    默认为 CPU 核数; 函数与参数须可 pickle, 即模块级函数"""
+    DISK = "disk"
+    """文件读写, 线程池, 大小由 EXECUTOR_DISK_WORKERS 配置, 默认 8"""
+
+
+# CPU 执行器子进程启动时预先导入的模块, 避免首个任务等待导入
+CPU_PRELOAD = (f"{__package__}.images", f"{__package__}.analysis")
+
+_DEFAULT_WORKERS = {
+    Executor.IO: 32,
+    Executor.CPU: os.cpu_count() or 1,
+    Executor.DISK: 8,
+}
+
+executor_workers = Gauge(
+    "executor_workers",
+    "执行器的工作线程或进程数上限",
+    ("executor",),
+)
+executor_queue_depth = Gauge(
+    "executor_queue_depth",
+    "已提交但尚未开始执行的任务数",
+    ("executor",),
+)
+executor_saturation = Gauge(
+    "executor_saturation",
+    "执行器中繁忙的工作者占比, 为 1 时新任务需要排队",
+    ("executor",),
+)
+executor_tasks = Counter(
+    "executor_tasks_total",
+    "提交到执行器的任务数",
+    ("executor",),
+)
+
+
+def _preload(*modules: str) -> None:
+    for module in modules:
+        importlib.import_module(module)
+
+
+class ExecutorPool:
+    """一个工作负载类别的执行器, 首次使用时创建, 并统计排队与繁忙情况"""
+
+    def __init__(self, kind: Executor) -> None:
+        self.kind = kind
+        env = f"EXECUTOR_{kind.name}_WORKERS"
+        self.workers = int(os.getenv(env) or _DEFAULT_WORKERS[kind])
+        self._executor: concurrent.futures.Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        executor_workers.set(self.workers, executor=kind)
+
+    def _get(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if self.kind is Executor.CPU:
+                # spawn 启动的子进程不继承父进程的线程与事件循环, 在各平台上行为一致
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_preload,
+                    initargs=CPU_PRELOAD,
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.workers, thread_name_prefix=f"{self.kind}-executor"
+                )
+        return self._executor
+
+    def _update(self, delta: int) -> None:
+        # 任务完成的回调在工作线程中执行
+        with self._lock:
+            self._pending += delta
+            pending = self._pending
+        executor_queue_depth.set(max(0, pending - self.workers), executor=self.kind)
+        executor_saturation.set(
+            min(pending, self.workers) / self.workers, executor=self.kind
+        )
+
+    async def run[R](self, call: Callable[[], R]) -> R:
+        if self.kind is not Executor.CPU:
+            # 线程中沿用当前上下文, 如请求的路由标签
+            call = functools.partial(contextvars.copy_context().run, call)
+        future = self._get().submit(call)
+        executor_tasks.inc(executor=self.kind)
+        self._update(1)
+        future.add_done_callback(lambda _: self._update(-1))
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            # 等待子进程退出, 否则会遗留进程池的信号量
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+executors = {kind: ExecutorPool(kind) for kind in Executor}
+
+
+def run_sync[**P, R](
+    call: Callable[P, R], executor: Executor = Executor.IO
+) -> Callable[P, Awaitable[R]]:
+    """一个用于包装 sync function 为 async function 的装饰器
+
+    参数:
+        call: 被装饰的同步函数
+        executor: 执行该函数的执行器类别, 见 Executor;
+            Executor.CPU 在子进程中执行, call 须为模块级函数
+
+    用法:
+        data = await run_sync(path.read_bytes, Executor.DISK)()
+    """
+
+    @functools.wraps(call)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        return await executors[executor].run(functools.partial(call, *args, **kwargs))
+
+    return wrapper
+
+
+async def warm_up_executors() -> None:
+    """预先启动 CPU 执行器的全部子进程, 在应用启动时调用"""
+    pool = executors[Executor.CPU]
+    await asyncio.gather(*(pool.run(time.time) for _ in range(pool.workers)))
+
+
+def shutdown_executors() -> None:
+    """关闭全部执行器, 在应用退出时调用"""
+    for pool in executors.values():
+        pool.shutdown()
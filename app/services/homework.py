@@ -1,32 +1,28 @@
-import base64
-import json
 from pathlib import Path
 
-from ..constant import ASSETS_DIR
-from .utils import CompletionMessage, get_openai_client, run_sync
+from .executors import Executor, run_sync
+from .images import image_optimizer
+from .json_extract import extract_json
+from .llm import complete
+from .prompts import prompts
+from .utils import CompletionMessage
 
-ASSETS_ROOT = ASSETS_DIR / "homework"
-PROMPT = ASSETS_ROOT / "prompt.md"
 
+async def generate_homework_feedback(image_path: Path):
+    prompt = prompts.render("homework/prompt")
+    image = await run_sync(image_path.read_bytes, Executor.DISK)()
+    [image_url] = await image_optimizer.data_urls([image])
 
-@run_sync
-def generate_homework_feedback(image_path: Path):
-    prompt = PROMPT.read_text("utf-8")
-    client, model_name = get_openai_client()
-    image = base64.b64encode(image_path.read_bytes()).decode()
-
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[CompletionMessage().text(prompt).image(image).build()],
+    output = await complete(
+        CompletionMessage().text(prompt).image(image_url),
+        task="homework/prompt",
     )
-    output = response.choices[0].message.content or ""
 
-    raw_json = output[output.find("{") : output.rfind("}") + 1]
-    if not raw_json:
+    if not output:
         raise ValueError("Failed to generate feedback")
 
     try:
-        feedback = json.loads(raw_json)
+        feedback = extract_json(output)
         return float(feedback["score"]), str(feedback["comment"])
     except Exception as err:
         raise ValueError("Failed to parse feedback") from err
@@ -0,0 +1,139 @@
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import fleep
+from .executors import Executor, run_sync
+from .metrics import Counter, current_route
+
+image_bytes = Counter(
+    "llm_image_bytes_total",
+    "发送给模型的图片字节数, stage 为 original (原图) 或 optimized (压缩后)",
+    ("route", "stage"),
+)
+image_cache_lookups = Counter(
+    "llm_image_cache_lookups_total",
+    "图片 data URL 缓存查询次数",
+    ("result",),
+)
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def encode_image(
+    raw: bytes, max_edge: int, image_format: str, quality: int
+) -> tuple[str, bytes]:
+    """缩放、摆正并重新编码图片, 返回 MIME 类型与图片数据
+
+    模块级函数, 可在 Executor.CPU 的子进程中执行
+    """
+    info = fleep.get(raw[:256])
+    if not info.mime or not any("image" in mime for mime in info.mime):
+        raise ValueError("无效的图片数据")
+
+    try:
+        with Image.open(BytesIO(raw)) as source:
+            image = ImageOps.exif_transpose(source) or source
+            has_metadata = bool(source.info.get("exif") or source.getexif())
+            resize = max(image.size) > max_edge
+            if resize:
+                image.thumbnail((max_edge, max_edge))
+
+            if image.mode not in {"RGB", "L"}:
+                if image_format == "JPEG" and image.has_transparency_data:
+                    # JPEG 不支持透明通道, 铺白色背景
+                    background = Image.new("RGB", image.size, "white")
+                    background.paste(image, mask=image.convert("RGBA"))
+                    image = background
+                elif image_format == "JPEG":
+                    image = image.convert("RGB")
+                else:
+                    image = image.convert("RGBA")
+
+            output = BytesIO()
+            image.save(output, format=image_format, quality=quality)
+    except (UnidentifiedImageError, OSError) as err:
+        raise ValueError("无效的图片数据") from err
+
+    optimized = output.getvalue()
+    if len(optimized) >= len(raw) and not resize and not has_metadata:
+        return info.mime[0], raw
+    return _MIME[image_format], optimized
+
+
+class ImageOptimizer:
+    """视觉提示词的图片预处理
+
+    - 长边缩小到 IMAGE_MAX_EDGE 像素以内, 默认 1600
+    - 按 EXIF 方向摆正后去除全部元数据
+    - 以 IMAGE_FORMAT (jpeg 或 webp, 默认 jpeg) 重新编码, 质量为 IMAGE_QUALITY, 默认 85
+    - 压缩结果比原图更大且原图无需处理时, 保留原图
+    - 按原图内容哈希缓存 data URL, 容量由 IMAGE_CACHE_SIZE 配置, 默认 64
+    """
+
+    def __init__(self) -> None:
+        self.max_edge = int(os.getenv("IMAGE_MAX_EDGE", "1600"))
+        self.format = os.getenv("IMAGE_FORMAT", "jpeg").upper()
+        if self.format not in _MIME:
+            raise ValueError(f"不支持的图片格式: {self.format}")
+        self.quality = int(os.getenv("IMAGE_QUALITY", "85"))
+        self.max_size = int(os.getenv("IMAGE_CACHE_SIZE", "64"))
+        self._cache: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> tuple[str, int] | None:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        image_cache_lookups.inc(result="miss" if cached is None else "hit")
+        return cached
+
+    def _store(self, key: str, mime: str, data: bytes) -> tuple[str, int]:
+        url = f"data:{mime};base64,{base64.b64encode(data).decode()}"
+        with self._lock:
+            self._cache[key] = (url, len(data))
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return url, len(data)
+
+    @staticmethod
+    def _record(raw: bytes, size: int) -> None:
+        route = current_route.get()
+        image_bytes.inc(len(raw), route=route, stage="original")
+        image_bytes.inc(size, route=route, stage="optimized")
+
+    def data_url(self, raw: bytes) -> str:
+        """将图片转换为 data URL, 在当前线程中同步执行, 会占用 CPU"""
+        key = hashlib.sha256(raw).hexdigest()
+        if (cached := self._lookup(key)) is None:
+            mime, data = encode_image(raw, self.max_edge, self.format, self.quality)
+            cached = self._store(key, mime, data)
+        url, size = cached
+        self._record(raw, size)
+        return url
+
+    async def _data_url(self, raw: bytes) -> str:
+        key = hashlib.sha256(raw).hexdigest()
+        if (cached := self._lookup(key)) is None:
+            mime, data = await run_sync(encode_image, Executor.CPU)(
+                raw, self.max_edge, self.format, self.quality
+            )
+            cached = self._store(key, mime, data)
+        url, size = cached
+        self._record(raw, size)
+        return url
+
+    async def data_urls(self, images: Iterable[bytes]) -> list[str]:
+        """在 CPU 执行器的子进程中并行转换图片, 不阻塞事件循环"""
+        return list(await asyncio.gather(*map(self._data_url, images)))
+
+
+image_optimizer = ImageOptimizer()
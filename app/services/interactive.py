@@ -1,20 +1,12 @@
-import json
 import uuid
 from datetime import datetime
 
-from ..constant import ASSETS_DIR
-from .utils import CompletionMessage, get_openai_client, run_sync
-
-ASSETS_ROOT = ASSETS_DIR / "interactive"
-PROMPT_ACTIVITY = ASSETS_ROOT / "activity.md"
-PROMPT_SCENARIO = ASSETS_ROOT / "scenario.md"
-PROMPT_RECOMMENDATION = ASSETS_ROOT / "recommendation.md"
+from .prompts import prompts
+from .structured import complete_json
+from .utils import CompletionMessage
 
 
 class InteractiveGenerator:
-    def __init__(self) -> None:
-        self.client, self.model_name = get_openai_client()
-
     async def generate_activity(
         self,
         activity_type: str,
@@ -37,34 +29,22 @@ class InteractiveGenerator:
         """
 
         # 填充模板
-        prompt = (
-            PROMPT_ACTIVITY.read_text(encoding="utf-8")
-            .replace("{{activity_type}}", activity_type)
-            .replace("{{subject}}", subject)
-            .replace("{{grade}}", grade)
-            .replace("{{topic}}", topic)
-            .replace("{{duration}}", str(duration))
+        prompt = prompts.render(
+            "interactive/activity",
+            activity_type=activity_type,
+            subject=subject,
+            grade=grade,
+            topic=topic,
+            duration=duration,
         )
 
-        # 调用OpenAI API生成活动方案
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用OpenAI API生成活动方案, 输出经校验后返回
+        result: dict = await complete_json(
+            CompletionMessage().text(prompt),
+            task="interactive/activity",
             temperature=0.7,
         )
 
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("生成内容为空")
-
-        # 解析生成的JSON内容
-        try:
-            content = content[content.index("{") : content.rindex("}") + 1]
-            result: dict = json.loads(content)
-        except Exception as err:
-            raise ValueError("解析生成内容失败") from err
-
         metadata = {
             "id": str(uuid.uuid4()),
             "title": result.get("title", topic),
@@ -98,33 +78,21 @@ class InteractiveGenerator:
         """
 
         # 填充模板
-        prompt = (
-            PROMPT_SCENARIO.read_text(encoding="utf-8")
-            .replace("{{scenario_type}}", scenario_type)
-            .replace("{{subject}}", subject)
-            .replace("{{grade}}", grade)
-            .replace("{{theme}}", theme)
+        prompt = prompts.render(
+            "interactive/scenario",
+            scenario_type=scenario_type,
+            subject=subject,
+            grade=grade,
+            theme=theme,
         )
 
-        # 调用OpenAI API生成场景
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用OpenAI API生成场景, 输出经校验后返回
+        result: dict = await complete_json(
+            CompletionMessage().text(prompt),
+            task="interactive/scenario",
             temperature=0.7,
         )
 
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("生成内容为空")
-
-        # 解析生成的JSON内容
-        try:
-            content = content[content.index("{") : content.rindex("}") + 1]
-            result: dict = json.loads(content)
-        except Exception as err:
-            raise ValueError("解析生成内容失败") from err
-
         # 添加元数据
         metadata = {
             "id": str(uuid.uuid4()),
@@ -148,28 +116,14 @@ class InteractiveGenerator:
         Returns:
             dict: 包含多个互动建议的字典
         """
-        # 读取并填充提示词模板
-        prompt = PROMPT_RECOMMENDATION.read_text(encoding="utf-8").replace(
-            "{{topic}}", topic
-        )
+        # 填充提示词模板
+        prompt = prompts.render("interactive/recommendation", topic=topic)
 
-        # 调用 OpenAI API
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用 OpenAI API, 提取并校验建议列表
+        result: list = await complete_json(
+            CompletionMessage().text(prompt),
+            task="interactive/recommendation",
             temperature=0.7,
+            start="[",
         )
-
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("生成内容为空")
-
-        # 解析JSON内容
-        try:
-            content = content[content.index("[") : content.rindex("]") + 1]
-            result: list = json.loads(content)
-        except Exception as err:
-            raise ValueError("解析生成内容失败") from err
-
         return result
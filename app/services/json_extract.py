@@ -0,0 +1,132 @@
+import json
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any, Literal, NamedTuple
+
+
+class MalformedElement(NamedTuple):
+    """无法解析的顶层数组元素, 保留原文供调用方修复或跳过"""
+
+    text: str
+    error: json.JSONDecodeError
+
+
+class JSONExtractor:
+    """从模型输出中增量提取 JSON
+
+    - 跳过第一个 start 字符之前的说明文字 (如 ```json 代码块标记)
+    - 在第一个顶层值闭合时立即停止, 之后的内容全部忽略
+    - 顶层值为数组时, 每个元素闭合后即可通过 feed() 的返回值取得;
+      单个元素无法解析时返回 MalformedElement, 不影响之后的元素
+
+    用法:
+        extractor = JSONExtractor("[")
+        async for chunk in deltas:
+            for item in extractor.feed(chunk):
+                ...
+        result = extractor.value
+    """
+
+    def __init__(self, start: Literal["{", "["] = "{") -> None:
+        self.start = start
+        self._buffer: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start: int | None = None
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        """顶层值是否已经闭合"""
+        return self._done
+
+    @property
+    def value(self) -> Any:
+        """完整的顶层值, 尚未闭合时抛出 ValueError"""
+        if not self._done:
+            raise ValueError("JSON 内容不完整")
+        return json.loads("".join(self._buffer))
+
+    def _emit(self, items: list[Any], end: int) -> None:
+        if self._element_start is not None:
+            text = "".join(self._buffer[self._element_start : end])
+            try:
+                items.append(json.loads(text))
+            except json.JSONDecodeError as error:
+                items.append(MalformedElement(text, error))
+            self._element_start = None
+
+    def feed(self, chunk: str) -> list[Any]:
+        """输入一段文本, 返回其中新闭合的顶层数组元素"""
+        items: list[Any] = []
+        is_array = self.start == "["
+
+        for char in chunk:
+            if self._done:
+                break
+
+            if self._depth == 0:
+                if char == self.start:
+                    self._buffer.append(char)
+                    self._depth = 1
+                continue
+
+            position = len(self._buffer)
+            self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char.isspace():
+                continue
+
+            top_level = is_array and self._depth == 1
+            if top_level and self._element_start is None and char not in ",]":
+                self._element_start = position
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(items, position)
+                    self._done = True
+                elif is_array and self._depth == 1:
+                    self._emit(items, position + 1)
+            elif top_level and char == ",":
+                self._emit(items, position)
+
+        return items
+
+
+def extract_json(text: str, start: Literal["{", "["] = "{") -> Any:
+    """从文本中提取第一个完整的 JSON 对象或数组
+
+    参数:
+        text: 模型输出文本
+        start: 顶层值的起始字符, "{" 表示对象, "[" 表示数组
+
+    异常:
+        ValueError: 找不到完整的 JSON 值或内容无法解析
+    """
+    extractor = JSONExtractor(start)
+    extractor.feed(text)
+    return extractor.value
+
+
+async def iter_json_array(deltas: AsyncIterable[str]) -> AsyncIterator[Any]:
+    """从流式文本中逐个产出顶层 JSON 数组的元素, 无法解析的元素为 MalformedElement"""
+    extractor = JSONExtractor("[")
+    async for delta in deltas:
+        # 顶层数组闭合后继续读完剩余输出, 使流正常结束
+        for item in extractor.feed(delta):
+            yield item
+    if not extractor.done:
+        raise ValueError("JSON 内容不完整")
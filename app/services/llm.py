@@ -0,0 +1,528 @@
+import asyncio
+import contextlib
+import itertools
+import os
+import random
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+import httpx
+import openai
+from google.genai import errors as genai_errors
+from openai import NOT_GIVEN, NotGiven
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.completion_create_params import ResponseFormat
+
+from .cache import completion_cache, completion_key, prompt_hash
+from .call_log import call_log
+from .metrics import (
+    Counter,
+    Histogram,
+    current_request,
+    current_route,
+    percentile,
+)
+from .prompts import prompts
+from .routing import ModelTier, fallbacks_total, model_router
+from .utils import (
+    CompletionMessage,
+    Priority,
+    SingleFlight,
+    get_openai_client,
+    remaining_budget,
+    scheduler,
+    within_deadline,
+)
+
+# 各任务的调度优先级, 未列出的任务使用 Priority.STANDARD
+TASK_PRIORITY: dict[str, Priority] = {
+    "interactive/recommendation": Priority.INTERACTIVE,
+    "question_bank/analyze_mistake": Priority.INTERACTIVE,
+    "analysis/color": Priority.INTERACTIVE,
+    "question_bank/generate": Priority.BULK,
+    "teaching_plan/convert": Priority.BULK,
+}
+
+# 合并相同并发请求的任务: 提示词完全相同的调用共享同一次 LLM 请求
+COALESCED_TASKS: set[str] = {
+    "interactive/recommendation",
+    "cultural_corridor/generate_story",
+    "cultural_corridor/generate_case",
+}
+
+# 启用对冲请求的任务: 调用超过该任务近期 p95 耗时仍未返回时, 再发起一次相同请求
+HEDGED_TASKS: set[str] = {
+    "interactive/recommendation",
+    "question_bank/analyze_mistake",
+    "analysis/color",
+}
+
+_inflight = SingleFlight[str]()
+coalesced_calls = Counter(
+    "llm_coalesced_calls_total",
+    "与进行中的相同请求合并的 LLM 调用数",
+    ("task",),
+)
+
+call_labels = ("route", "template", "model")
+call_duration = Histogram(
+    "llm_call_duration_seconds",
+    "LLM 服务商调用耗时(秒), 不含排队时间",
+    call_labels,
+)
+call_first_token = Histogram(
+    "llm_call_first_token_seconds",
+    "流式 LLM 调用首个 token 的等待时间(秒)",
+    call_labels,
+)
+call_total = Counter(
+    "llm_calls_total",
+    "LLM 服务商调用次数",
+    (*call_labels, "status"),
+)
+call_tokens = Counter(
+    "llm_tokens_total",
+    "LLM 调用消耗的 token 数, kind 为 prompt 或 completion",
+    (*call_labels, "kind"),
+)
+
+
+@dataclass
+class CallRecord:
+    """一次 LLM 服务商调用的耗时与 token 用量"""
+
+    template: str
+    model: str
+    template_version: str | None = None
+    prompt_hash: str = ""
+    """完整渲染后的提示词哈希, 见 cache.prompt_hash()"""
+    route: str = field(default_factory=current_route.get)
+    request_id: str = field(default_factory=current_request.get)
+    created_at: str = field(
+        default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    )
+    status: str = "ok"
+    duration: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def usage(self, prompt_tokens: int | None, completion_tokens: int | None) -> None:
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+
+
+retries_total = Counter(
+    "llm_retries_total",
+    "LLM 调用失败后的重试次数, reason 为失败原因",
+    ("template", "reason"),
+)
+hedged_calls = Counter(
+    "llm_hedged_calls_total",
+    "发出的对冲请求数, outcome 为先返回结果的一方 (primary 或 hedge)",
+    ("template", "outcome"),
+)
+
+# 各任务最近成功调用的耗时, 用于计算对冲请求的触发时间
+_recent_durations: defaultdict[str, deque[float]] = defaultdict(
+    lambda: deque(maxlen=200)
+)
+
+
+def openai_retry_reason(error: BaseException) -> str | None:
+    """OpenAI 调用错误可重试时返回原因, 否则返回 None"""
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return None
+
+
+def gemini_retry_reason(error: BaseException) -> str | None:
+    """Gemini 调用错误可重试时返回原因, 否则返回 None"""
+    if isinstance(error, genai_errors.APIError):
+        if error.code == 429:
+            return "rate_limited"
+        if error.code >= 500:
+            return "server_error"
+        return None
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    return None
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """读取错误响应中的 Retry-After 头 (秒)"""
+    response = getattr(error, "response", None)
+    if not isinstance(response, httpx.Response):
+        return None
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+async def with_retries[T](
+    call: Callable[[], Awaitable[T]],
+    *,
+    template: str,
+    retry_reason: Callable[[BaseException], str | None] = openai_retry_reason,
+) -> T:
+    """对可重试的服务商错误进行重试
+
+    - 最多重试 LLM_MAX_RETRIES 次, 默认 2 次
+    - 退避时间为 full jitter: [0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2^n)]
+      内的随机值, 默认 0.5 秒起、上限 8 秒; 响应带有 Retry-After 时至少等待该时长
+    - 等待时间超出当前请求剩余的时间预算时不再重试, 直接抛出原错误
+    """
+    max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as error:
+            reason = retry_reason(error)
+            if reason is None or attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            if (retry_after := _retry_after(error)) is not None:
+                delay = max(delay, retry_after)
+            budget = remaining_budget()
+            if budget is not None and delay >= budget:
+                raise
+            retries_total.inc(template=template, reason=reason)
+            attempt += 1
+        await asyncio.sleep(delay)
+
+
+def _retry_within_tier(error: BaseException) -> str | None:
+    """有备用档位时超时不在原档位重试, 直接改用备用档位"""
+    if isinstance(error, openai.APITimeoutError):
+        return None
+    return openai_retry_reason(error)
+
+
+async def with_fallback[T](
+    tiers: list[ModelTier],
+    call: Callable[[ModelTier], Awaitable[T]],
+    *,
+    template: str,
+) -> T:
+    """依次尝试各模型档位, 可重试的错误 (含超时) 在原档位重试耗尽后改用下一个档位"""
+    for tier, following in itertools.pairwise(tiers):
+        try:
+            return await call(tier)
+        except Exception as error:
+            if openai_retry_reason(error) is None:
+                raise
+            fallbacks_total.inc(
+                template=template, from_tier=tier.name, to_tier=following.name
+            )
+    return await call(tiers[-1])
+
+
+def _hedge_delay(template: str) -> float | None:
+    """对冲请求的触发时间: 该任务近期成功调用的 p95 耗时, 样本不足时不对冲"""
+    if template not in HEDGED_TASKS or os.getenv("LLM_HEDGE", "1") == "0":
+        return None
+    durations = _recent_durations[template]
+    if len(durations) < 20:
+        return None
+    delay = percentile(sorted(durations), 0.95)
+    return max(delay, float(os.getenv("LLM_HEDGE_MIN_DELAY", "1")))
+
+
+async def hedged[T](call: Callable[[], Awaitable[T]], *, template: str) -> T:
+    """调用超过 p95 耗时仍未返回时发起对冲请求, 取先成功的结果并取消另一个"""
+    if (delay := _hedge_delay(template)) is None:
+        return await call()
+
+    async def run() -> T:
+        return await call()
+
+    primary = asyncio.create_task(run())
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.add(asyncio.create_task(run()))
+        while True:
+            if done := {task for task in tasks if task.done()}:
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    if len(tasks) > 1:
+                        outcome = "primary" if winner is primary else "hedge"
+                        hedged_calls.inc(template=template, outcome=outcome)
+                    return winner.result()
+                if tasks <= done:
+                    # 全部失败, 抛出主请求的错误
+                    return primary.result()
+            await asyncio.wait(tasks - done, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class CallSummary:
+    """最近调用的滑动窗口摘要, 便于快速查看各路由的 LLM 开销
+
+    - 按 (路由, 模板, 模型) 分组, 每组保留最近 LLM_STATS_WINDOW 次调用, 默认 500
+    """
+
+    def __init__(self) -> None:
+        self.window = int(os.getenv("LLM_STATS_WINDOW", "500"))
+        self._calls: defaultdict[tuple[str, str, str], deque[CallRecord]] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+
+    def add(self, record: CallRecord) -> None:
+        self._calls[record.route, record.template, record.model].append(record)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        result: list[dict[str, Any]] = []
+        for (route, template, model), records in sorted(self._calls.items()):
+            durations = sorted(record.duration for record in records)
+            errors = sum(record.status != "ok" for record in records)
+            prompt_tokens = sum(record.prompt_tokens for record in records)
+            completion_tokens = sum(record.completion_tokens for record in records)
+            result.append(
+                {
+                    "route": route,
+                    "template": template,
+                    "model": model,
+                    "calls": len(records),
+                    "error_rate": errors / len(records),
+                    "p50_seconds": percentile(durations, 0.50),
+                    "p95_seconds": percentile(durations, 0.95),
+                    "p99_seconds": percentile(durations, 0.99),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "avg_tokens": (prompt_tokens + completion_tokens) / len(records),
+                }
+            )
+        return result
+
+
+call_summary = CallSummary()
+
+
+@contextlib.contextmanager
+def instrument(
+    template: str, model: str, prompt_hash: str = ""
+) -> Iterator[CallRecord]:
+    """记录一次服务商调用的耗时、结果与 token 用量, 并写入调用日志
+
+    用法:
+        with instrument("interactive/activity", model, digest) as record:
+            response = await client.chat.completions.create(...)
+            record.usage(response.usage.prompt_tokens, ...)
+    """
+    record = CallRecord(template, model, prompts.version(template), prompt_hash)
+    start = time.perf_counter()
+    try:
+        yield record
+    except (asyncio.CancelledError, GeneratorExit):
+        # 请求被取消, 或流式输出未读完就被关闭
+        record.status = "cancelled"
+        raise
+    except Exception:
+        record.status = "error"
+        raise
+    else:
+        _recent_durations[template].append(time.perf_counter() - start)
+    finally:
+        record.duration = time.perf_counter() - start
+        labels = {"route": record.route, "template": template, "model": model}
+        call_duration.observe(record.duration, **labels)
+        call_total.inc(status=record.status, **labels)
+        call_tokens.inc(record.prompt_tokens, kind="prompt", **labels)
+        call_tokens.inc(record.completion_tokens, kind="completion", **labels)
+        call_summary.add(record)
+        call_log.add(record)
+
+
+async def complete(
+    message: CompletionMessage,
+    *,
+    task: str,
+    temperature: float | None = None,
+    response_format: ResponseFormat | NotGiven = NOT_GIVEN,
+) -> str:
+    """调用 LLM 生成补全内容, 所有服务的统一出口
+
+    参数:
+        message: 用户消息
+        task: 任务名称, 与提示词模板路径一致, 如 "interactive/recommendation"
+        temperature: 采样温度, 为 None 时使用模型默认值
+        response_format: 输出格式约束, 见 structured.response_format()
+
+    返回:
+        模型输出的文本内容, 可能为空字符串
+
+    模型按任务档位选择 (见 routing.model_router), 出错或超时后改用备用档位;
+    排队与调用 (含重试、对冲请求) 须在当前请求的截止时间内完成,
+    否则抛出 DeadlineExceeded
+    """
+    client, _ = get_openai_client()
+    messages = [message.build()]
+
+    def cache_key(tier: ModelTier) -> str:
+        return completion_key(tier.model, messages, temperature, prompts.version(task))
+
+    # 按任务配置档位的模型查询缓存; 写入时使用实际应答的模型,
+    # 备用档位的结果不会在之后被当作主档位的结果返回
+    key = cache_key(model_router.tier(task))
+    digest = prompt_hash(messages)
+    priority = TASK_PRIORITY.get(task, Priority.STANDARD)
+
+    async def attempt(tier: ModelTier) -> ChatCompletion:
+        async with within_deadline(), scheduler.slot("openai", priority):
+            with instrument(task, tier.model, digest) as record, tier.track():
+                response = await client.chat.completions.create(
+                    model=tier.model,
+                    messages=messages,
+                    temperature=NOT_GIVEN if temperature is None else temperature,
+                    response_format=response_format,
+                    timeout=tier.timeout,
+                )
+                if usage := response.usage:
+                    record.usage(usage.prompt_tokens, usage.completion_tokens)
+        return response
+
+    async def request() -> str:
+        if (cached := await completion_cache.get(task, key)) is not None:
+            return cached
+
+        tiers = model_router.candidates(task)
+        retry_reason = _retry_within_tier if len(tiers) > 1 else openai_retry_reason
+
+        async def call(tier: ModelTier) -> tuple[ModelTier, ChatCompletion]:
+            return tier, await hedged(
+                lambda: with_retries(
+                    lambda: attempt(tier), template=task, retry_reason=retry_reason
+                ),
+                template=task,
+            )
+
+        tier, response = await with_fallback(tiers, call, template=task)
+        content = response.choices[0].message.content or ""
+        if content:
+            await completion_cache.set(task, cache_key(tier), content)
+        return content
+
+    if task not in COALESCED_TASKS:
+        return await request()
+    if key in _inflight:
+        coalesced_calls.inc(task=task)
+    return await _inflight.do(key, request)
+
+
+async def stream(
+    message: CompletionMessage,
+    *,
+    task: str,
+    temperature: float | None = None,
+) -> AsyncIterator[str]:
+    """以流式方式调用 LLM, 逐段产出模型输出的文本增量
+
+    参数与 complete() 相同; 完整输出在结束后写入补全缓存,
+    缓存命中时一次性产出全部内容
+
+    只在收到第一段输出前重试或改用备用档位, 不发起对冲请求;
+    截止时间作用于每次等待输出
+    """
+    client, _ = get_openai_client()
+    messages = [message.build()]
+
+    def cache_key(tier: ModelTier) -> str:
+        return completion_key(tier.model, messages, temperature, prompts.version(task))
+
+    # 与 complete() 相同, 写入缓存时使用实际应答的模型
+    digest = prompt_hash(messages)
+    key = cache_key(model_router.tier(task))
+    if (cached := await completion_cache.get(task, key)) is not None:
+        yield cached
+        return
+
+    tiers = model_router.candidates(task)
+    retry_reason = _retry_within_tier if len(tiers) > 1 else openai_retry_reason
+
+    async def open_stream(
+        tier: ModelTier,
+    ) -> tuple[
+        ModelTier,
+        openai.AsyncStream[ChatCompletionChunk],
+        CallRecord,
+        contextlib.ExitStack,
+    ]:
+        """发起一次流式调用, 每次尝试 (含重试、改用备用档位) 各记录一次调用
+
+        打开失败时立即记录; 打开成功时返回仍在计时的记录, 由调用方在输出结束后关闭
+        """
+        with contextlib.ExitStack() as opening:
+            record = opening.enter_context(instrument(task, tier.model, digest))
+            async with within_deadline():
+                with tier.track():
+                    response = await client.chat.completions.create(
+                        model=tier.model,
+                        messages=messages,
+                        temperature=NOT_GIVEN if temperature is None else temperature,
+                        stream=True,
+                        # 在最后一个数据块中返回 token 用量
+                        stream_options={"include_usage": True},
+                        # 流式调用中为两个数据块之间的最长等待时间
+                        timeout=tier.timeout,
+                    )
+            return tier, response, record, opening.pop_all()
+
+    chunks: list[str] = []
+    async with contextlib.AsyncExitStack() as stack:
+        # 超时不能跨越 yield 生效, 因此只在各个等待点上应用截止时间
+        async with within_deadline():
+            await stack.enter_async_context(
+                scheduler.slot("openai", TASK_PRIORITY.get(task, Priority.STANDARD))
+            )
+        start = time.perf_counter()
+        tier, response, record, instrumented = await with_fallback(
+            tiers,
+            lambda tier: with_retries(
+                lambda: open_stream(tier), template=task, retry_reason=retry_reason
+            ),
+            template=task,
+        )
+        # 调用方提前停止迭代 (客户端断开、超时、取消) 时关闭响应, 归还连接
+        stack.push_async_callback(response.close)
+        with instrumented:
+            iterator = aiter(response)
+            while True:
+                async with within_deadline():
+                    chunk = await anext(iterator, None)
+                if chunk is None:
+                    break
+                if usage := chunk.usage:
+                    record.usage(usage.prompt_tokens, usage.completion_tokens)
+                if chunk.choices and (delta := chunk.choices[0].delta.content):
+                    if not chunks:
+                        call_first_token.observe(
+                            time.perf_counter() - start,
+                            route=record.route,
+                            template=task,
+                            model=tier.model,
+                        )
+                    chunks.append(delta)
+                    yield delta
+
+    if content := "".join(chunks):
+        await completion_cache.set(task, cache_key(tier), content)
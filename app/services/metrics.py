@@ -0,0 +1,146 @@
+import abc
+import bisect
+import contextvars
+import math
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+
+_registry: list["Metric"] = []
+
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_route", default="-"
+)
+"""当前请求匹配的路由模板, 如 "POST /api/interactive/activities", 用作指标标签"""
+
+current_request: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_request", default="-"
+)
+"""当前请求的标识, 调用日志据此将同一请求的多次 LLM 调用归为一组"""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric(abc.ABC):
+    """Prometheus 指标基类
+
+    - 创建时自动注册到全局指标表, 由 render() 统一导出
+    - 标签值通过关键字参数传入, 例如 counter.inc(task="xxx");
+      数值参数只能按位置传入, 以免与标签名冲突
+    """
+
+    type_name = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """指标的各条样本, 每条为一行 Prometheus 文本格式"""
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Iterable[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: defaultdict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, /, **labels: str) -> None:
+        self._values[self._key(labels)] += amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, /, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, /, **labels: str) -> None:
+        self._values[self._key(labels)] -= amount
+
+
+class Histogram(Metric):
+    """分桶直方图, 用于延迟等分布类数据"""
+
+    type_name = "histogram"
+    DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = (*sorted(buckets), math.inf)
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: defaultdict[tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, /, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def samples(self) -> Iterable[str]:
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts, strict=True):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                labels = _format_labels((*self.labels, "le"), (*key, le))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {self._sums[key]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """已排序数据的最近秩百分位数, 数据为空时返回 0"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def render() -> str:
+    """以 Prometheus 文本格式导出所有指标"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
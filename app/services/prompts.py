@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import jinja2
+
+from ..constant import ASSETS_DIR
+from .executors import Executor, run_sync
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = {".md", ".jinja2"}
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    """模板名称, 即相对 assets 目录去掉后缀的路径, 如 "interactive/activity" """
+    version: str
+    """模板源文件内容的哈希, 模板修改后随之变化"""
+    template: jinja2.Template
+    mtime_ns: int
+
+    def render(self, **params: Any) -> str:
+        return self.template.render(**params)
+
+
+class PromptRegistry:
+    """提示词模板注册表
+
+    - 启动时一次性读取并编译 assets 下的全部模板, 请求中只在内存中渲染
+    - 每个模板带有内容哈希作为版本号, 可用于缓存键与日志
+    - 环境变量 PROMPT_HOT_RELOAD=1 时, watch() 定期检查文件修改并重新加载,
+      检查间隔由 PROMPT_RELOAD_INTERVAL 配置, 默认 1 秒
+    """
+
+    def __init__(self, root: Path = ASSETS_DIR) -> None:
+        self.root = root
+        self.env = jinja2.Environment(
+            autoescape=False,  # noqa: S701
+            keep_trailing_newline=True,
+        )
+        self._templates: dict[str, PromptTemplate] = {}
+        self.reload()
+
+    def _name(self, path: Path) -> str:
+        return path.relative_to(self.root).with_suffix("").as_posix()
+
+    def _load(self, path: Path, mtime_ns: int) -> PromptTemplate:
+        source = path.read_text("utf-8")
+        return PromptTemplate(
+            name=self._name(path),
+            version=hashlib.sha256(source.encode()).hexdigest()[:12],
+            template=self.env.from_string(source),
+            mtime_ns=mtime_ns,
+        )
+
+    def reload(self) -> list[str]:
+        """重新加载有修改的模板, 返回发生变化的模板名称"""
+        templates: dict[str, PromptTemplate] = {}
+        changed: list[str] = []
+        for path in sorted(self.root.rglob("*")):
+            if path.suffix not in TEMPLATE_SUFFIXES or not path.is_file():
+                continue
+            name = self._name(path)
+            mtime_ns = path.stat().st_mtime_ns
+            current = self._templates.get(name)
+            if current is not None and current.mtime_ns == mtime_ns:
+                templates[name] = current
+                continue
+            templates[name] = self._load(path, mtime_ns)
+            if current is None or current.version != templates[name].version:
+                changed.append(name)
+
+        changed.extend(name for name in self._templates if name not in templates)
+        self._templates = templates
+        return changed
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **params: Any) -> str:
+        """渲染模板, 如 prompts.render("interactive/scenario", theme=theme)"""
+        return self._templates[name].render(**params)
+
+    def version(self, name: str) -> str | None:
+        """获取模板版本号, 未注册的模板返回 None"""
+        template = self._templates.get(name)
+        return template.version if template else None
+
+    async def watch(self) -> None:
+        """开发环境下的热加载循环, 在应用生命周期内运行"""
+        interval = float(os.getenv("PROMPT_RELOAD_INTERVAL", "1"))
+        reload = run_sync(self.reload, Executor.DISK)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if changed := await reload():
+                    logger.info("提示词模板已重新加载: %s", ", ".join(changed))
+            except (OSError, jinja2.TemplateError):
+                # 模板编辑到一半时可能读取失败或语法错误, 保留旧版本
+                logger.exception("提示词模板重新加载失败")
+
+    @contextlib.asynccontextmanager
+    async def hot_reload(self) -> AsyncIterator[None]:
+        """PROMPT_HOT_RELOAD 开启时在 async with 块内运行 watch()"""
+        if os.getenv("PROMPT_HOT_RELOAD", "").lower() not in {"1", "true", "yes"}:
+            yield
+            return
+
+        task = asyncio.create_task(self.watch())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+prompts = PromptRegistry()
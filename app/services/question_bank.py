@@ -1,22 +1,151 @@
+import asyncio
+import itertools
 import json
+import logging
+import math
+import os
 import random
+import re
 import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any
+
+from .json_extract import MalformedElement, iter_json_array
+from .llm import stream
+from .metrics import Counter
+from .prompts import prompts
+from .structured import complete_json, parse_item
+from .utils import CompletionMessage
+
+logger = logging.getLogger(__name__)
+
+duplicates_dropped = Counter(
+    "question_bank_duplicates_dropped_total",
+    "分批生成时因题干近似重复而去除的题目数",
+)
+questions_shortfall = Counter(
+    "question_bank_shortfall_total",
+    "补齐后仍未生成的题目数",
+)
+
+
+@dataclass
+class QuestionShard:
+    """一批并行生成的题目"""
+
+    question_types: list[str]
+    knowledge_points: list[str]
+    count: int
+
+
+def _unique(values: list[str]) -> list[str]:
+    return list(dict.fromkeys(values))
+
+
+def plan_shards(
+    question_types: list[str],
+    knowledge_points: list[str],
+    count: int,
+    shard_size: int,
+) -> list[QuestionShard]:
+    """按题型与知识点将题目拆分为每批不超过 shard_size 题的若干批次
+
+    题型与知识点的组合依次分配给各批次, 组合多于批次数时合并到同一批,
+    少于批次数时循环使用
+    """
+    total = math.ceil(count / max(shard_size, 1))
+    if total <= 1:
+        return [QuestionShard(question_types, knowledge_points, count)]
+
+    combos = list(
+        itertools.product(
+            [[t] for t in question_types] or [question_types],
+            [[k] for k in knowledge_points] or [knowledge_points],
+        )
+    )
+    base, extra = divmod(count, total)
+    shards: list[QuestionShard] = []
+    for index in range(total):
+        group = combos[index::total] or [combos[index % len(combos)]]
+        shards.append(
+            QuestionShard(
+                question_types=_unique([t for types, _ in group for t in types]),
+                knowledge_points=_unique([k for _, points in group for k in points]),
+                count=base + (index < extra),
+            )
+        )
+    return shards
+
+
+class StemDeduper:
+    """去除题干近似重复的题目
+
+    - 题干去掉空白与标点后按字符二元组比较, Jaccard 相似度不低于 threshold 即视为重复
+    """
 
-from ..constant import ASSETS_DIR
-from .utils import CompletionMessage, get_openai_client, run_sync
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self._seen: list[set[str]] = []
 
-ASSETS_ROOT = ASSETS_DIR / "question_bank"
-PROMPT_GENERATE = ASSETS_ROOT / "generate.md"
-PROMPT_ANALYZE_MISTAKE = ASSETS_ROOT / "analyze_mistake.md"
+    @staticmethod
+    def _shingles(stem: str) -> set[str]:
+        text = re.sub(r"[\W_]+", "", stem.lower())
+        return {text[i : i + 2] for i in range(len(text) - 1)} or {text}
+
+    def add(self, stem: str) -> bool:
+        """记录题干, 与已有题干近似重复时返回 False"""
+        shingles = self._shingles(stem)
+        for seen in self._seen:
+            if len(shingles & seen) / len(shingles | seen) >= self.threshold:
+                return False
+        self._seen.append(shingles)
+        return True
+
+
+async def _merge(iterators: list[AsyncIterator[Any]]) -> AsyncIterator[Any]:
+    """并发消费多个异步迭代器, 按到达顺序产出元素
+
+    - 部分迭代器出错时记录日志并继续, 全部未产出任何元素时抛出第一个错误
+    - 提前关闭时取消仍在运行的迭代器
+    """
+    queue: asyncio.Queue[Any] = asyncio.Queue()
+    finished = object()
+    errors: list[Exception] = []
+
+    async def drain(iterator: AsyncIterator[Any]) -> None:
+        try:
+            async for item in iterator:
+                queue.put_nowait(item)
+        except Exception as error:
+            logger.warning("分批生成题目失败: %s", error)
+            errors.append(error)
+        finally:
+            queue.put_nowait(finished)
+
+    tasks = [asyncio.create_task(drain(iterator)) for iterator in iterators]
+    produced = False
+    try:
+        running = len(tasks)
+        while running:
+            item = await queue.get()
+            if item is finished:
+                running -= 1
+                continue
+            produced = True
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if errors and not produced:
+        raise errors[0]
 
 
 class QuestionBankService:
     """题库服务"""
 
-    def __init__(self) -> None:
-        self.client, self.model_name = get_openai_client()
-
     async def generate_questions(
         self,
         subject: str,
@@ -26,7 +155,34 @@ class QuestionBankService:
         knowledge_points: list[str],
         count: int = 5,
     ) -> list[dict]:
-        """生成题目
+        """生成题目, 参数同 stream_questions()
+
+        Returns:
+            List[dict]: 生成的题目列表
+        """
+        return [
+            question
+            async for question in self.stream_questions(
+                subject, grade, question_types, difficulty, knowledge_points, count
+            )
+        ]
+
+    async def stream_questions(
+        self,
+        subject: str,
+        grade: str,
+        question_types: list[str],
+        difficulty: int,
+        knowledge_points: list[str],
+        count: int = 5,
+    ) -> AsyncIterator[dict]:
+        """流式生成题目, 每道题目在模型输出完毕后立即产出
+
+        - 题目数量超过 QUESTION_SHARD_SIZE (默认 5) 时按题型与知识点拆分为多批并行生成,
+          合并时去除题干相似度不低于 QUESTION_DEDUP_THRESHOLD (默认 0.85) 的重复题目
+        - 部分批次失败或去重后数量不足时, 再生成一批补齐差额, 最多补
+          QUESTION_TOPUP_ROUNDS (默认 1) 次; 仍不足时产出的题目少于 count,
+          由调用方比较数量后告知客户端
 
         Args:
             subject: 学科
@@ -36,56 +192,106 @@ class QuestionBankService:
             knowledge_points: 知识点列表
             count: 生成题目数量
 
-        Returns:
-            List[dict]: 生成的题目列表
+        Yields:
+            dict: 生成的题目
         """
+        shards = plan_shards(
+            question_types,
+            knowledge_points,
+            count,
+            int(os.getenv("QUESTION_SHARD_SIZE", "5")),
+        )
+        deduper = StemDeduper(float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.85")))
+
+        rounds = int(os.getenv("QUESTION_TOPUP_ROUNDS", "1"))
+
+        produced = 0
+        for attempt in range(rounds + 1):
+            if attempt:
+                # 补齐差额, 题型与知识点不再拆分
+                logger.warning("生成题目不足, 补生成 %d 道", count - produced)
+                shards = [
+                    QuestionShard(question_types, knowledge_points, count - produced)
+                ]
+            try:
+                async for q in _merge(
+                    [
+                        self._generate_shard(
+                            subject, grade, difficulty, shard, index, shards
+                        )
+                        for index, shard in enumerate(shards, 1)
+                    ]
+                ):
+                    if not deduper.add(str(q.get("title", ""))):
+                        duplicates_dropped.inc()
+                        continue
+                    yield q
+                    produced += 1
+                    if produced >= count:
+                        return
+            except Exception:
+                # 一道题目都没有生成时照常报错, 否则交给下一轮补齐
+                if not produced:
+                    raise
+                logger.exception("补生成题目失败")
+
+        questions_shortfall.inc(count - produced)
+
+    async def _generate_shard(
+        self,
+        subject: str,
+        grade: str,
+        difficulty: int,
+        shard: QuestionShard,
+        index: int,
+        shards: list[QuestionShard],
+    ) -> AsyncIterator[dict]:
+        """生成一批题目"""
 
         # 填充模板
-        prompt = (
-            PROMPT_GENERATE.read_text(encoding="utf-8")
-            .replace("{{subject}}", subject)
-            .replace("{{grade}}", grade)
-            .replace("{{question_types}}", ", ".join(question_types))
-            .replace("{{difficulty}}", str(difficulty))
-            .replace("{{knowledge_points}}", ", ".join(knowledge_points))
-            .replace("{{count}}", str(count))
+        prompt = prompts.render(
+            "question_bank/generate",
+            subject=subject,
+            grade=grade,
+            question_types=", ".join(shard.question_types),
+            difficulty=difficulty,
+            knowledge_points=", ".join(shard.knowledge_points),
+            count=shard.count,
+            shard=index,
+            shards=len(shards),
         )
 
-        # 调用OpenAI API生成题目
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+        # 调用OpenAI API流式生成题目
+        deltas = stream(
+            CompletionMessage().text(prompt),
+            task="question_bank/generate",
             temperature=0.7,
         )
 
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("题目生成失败: 返回结果为空")
-
-        # 解析生成的JSON内容
+        # 增量解析JSON数组, 每个元素闭合即为一道完整题目
         try:
-            content = content[content.index("[") : content.rindex("]") + 1]
-            questions = json.loads(content)
-
-            # 确保是列表格式
-            if not isinstance(questions, list):
-                questions = [questions]
-
-            # 补充ID和创建时间
-            for q in questions:
+            async for item in iter_json_array(deltas):
+                # 无法解析的题目交给 parse_item 单独修复
+                if not isinstance(item, dict | MalformedElement):
+                    continue
+                try:
+                    q = await parse_item("question_bank/generate", item)
+                except ValueError:
+                    # 修复失败的单道题目直接丢弃, 不影响其余题目
+                    continue
+
+                # 补充ID和创建时间
                 q["id"] = str(uuid.uuid4())
                 q["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 # 将选项转换为JSON字符串
                 if "options" in q and isinstance(q["options"], list):
                     q["options"] = json.dumps(q["options"], ensure_ascii=False)
+                yield q
 
-        except json.JSONDecodeError as err:
+        except ValueError as err:
             # 如果返回内容不是标准JSON，返回错误
             raise ValueError("题目生成失败，无法解析返回结果") from err
 
-        return questions
-
     async def analyze_mistake(self, question: dict, student_answer: str) -> dict:
         """分析学生错误答案，提供错误原因分析
 
@@ -113,28 +319,19 @@ class QuestionBankService:
         question_info += f"学生答案：{student_answer}\n"
 
         # 填充模板
-        prompt = PROMPT_ANALYZE_MISTAKE.read_text("utf-8").replace(
-            "{{question_info}}", question_info
+        prompt = prompts.render(
+            "question_bank/analyze_mistake", question_info=question_info
         )
 
         # 调用OpenAI API分析错误
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
-            temperature=0.5,
-        )
-
-        content = response.choices[0].message.content
-
-        if not content:
-            raise ValueError("错误分析失败: 返回结果为空")
-
-        # 解析生成的JSON内容
         try:
-            content = content[content.index("{") : content.rindex("}") + 1]
-            result = json.loads(content)
-        except json.JSONDecodeError as err:
-            raise ValueError("错误分析失败，无法解析返回结果") from err
+            result: dict = await complete_json(
+                CompletionMessage().text(prompt),
+                task="question_bank/analyze_mistake",
+                temperature=0.5,
+            )
+        except ValueError as err:
+            raise ValueError(f"错误分析失败: {err}") from err
 
         return result
 
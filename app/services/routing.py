@@ -0,0 +1,191 @@
+import contextlib
+import itertools
+import os
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from .metrics import Counter, percentile
+
+TIERS = ("fast", "standard", "quality")
+
+# 各任务使用的模型档位, 未列出的任务使用 standard
+TASK_TIER: dict[str, str] = {
+    "interactive/recommendation": "fast",
+    "question_bank/analyze_mistake": "fast",
+    "analysis/color": "fast",
+    "structured/repair": "fast",
+    "teaching_plan/generate": "quality",
+}
+
+# 档位出错或超时后依次尝试的备用档位
+FALLBACK_TIERS: dict[str, tuple[str, ...]] = {
+    "fast": ("standard",),
+    "standard": ("fast",),
+    "quality": ("standard",),
+}
+
+DEFAULT_TIMEOUT = {"fast": 20.0, "standard": 60.0, "quality": 120.0}
+
+fallbacks_total = Counter(
+    "llm_model_fallbacks_total",
+    "因出错、超时或档位降级而改用备用档位的 LLM 调用数",
+    ("template", "from_tier", "to_tier"),
+)
+
+
+@dataclass
+class ModelTier:
+    """一个模型档位及其最近调用的结果"""
+
+    name: str
+    model: str
+    timeout: float
+    """单次调用超时(秒), 超时后可改用备用档位"""
+    window: int = 100
+    _calls: deque[tuple[bool, float]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._calls = deque(maxlen=self.window)
+
+    def record(self, *, ok: bool, duration: float) -> None:
+        self._calls.append((ok, duration))
+
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        """记录 with 块内一次调用的结果与耗时, 被取消的调用不计入"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(ok=False, duration=time.perf_counter() - start)
+            raise
+        self.record(ok=True, duration=time.perf_counter() - start)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(not ok for ok, _ in self._calls) / len(self._calls)
+
+    def latency(self, q: float) -> float:
+        return percentile(sorted(d for ok, d in self._calls if ok), q)
+
+    def degraded(self, max_error_rate: float) -> bool:
+        """最近调用错误率过高, 或多数调用接近超时"""
+        if len(self._calls) < 10:
+            return False
+        return (
+            self.error_rate >= max_error_rate or self.latency(0.5) >= 0.8 * self.timeout
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "model": self.model,
+            "timeout": self.timeout,
+            "calls": len(self._calls),
+            "error_rate": self.error_rate,
+            "p50_seconds": self.latency(0.50),
+            "p95_seconds": self.latency(0.95),
+        }
+
+
+class ModelRouter:
+    """按任务选择模型档位
+
+    - 档位模型: standard 为 OPENAI_MODEL_NAME, fast / quality 分别由
+      OPENAI_MODEL_FAST / OPENAI_MODEL_QUALITY 配置, 未配置时同 standard
+    - 单次调用超时: LLM_TIER_TIMEOUT_{TIER}, 默认 fast 20、standard 60、quality 120 秒
+    - LLM_TASK_TIERS 可覆盖任务档位, 如 "homework/prompt=fast,analysis/color=standard"
+    - 档位最近错误率不低于 LLM_TIER_MAX_ERROR_RATE (默认 0.5) 或中位耗时接近超时
+      时视为降级, 优先使用备用档位; 每 LLM_TIER_PROBE_INTERVAL (默认 10) 次调用
+      仍有一次使用原档位, 以便其恢复后重新启用
+    - 运行时可通过 configure() 修改, 见 /api/llm/routing
+    """
+
+    def __init__(self) -> None:
+        default = os.getenv("OPENAI_MODEL_NAME") or "gpt-3.5-turbo"
+        self.tiers = {
+            name: ModelTier(
+                name,
+                default
+                if name == "standard"
+                else os.getenv(f"OPENAI_MODEL_{name.upper()}") or default,
+                float(
+                    os.getenv(f"LLM_TIER_TIMEOUT_{name.upper()}")
+                    or DEFAULT_TIMEOUT[name]
+                ),
+            )
+            for name in TIERS
+        }
+        self.task_tiers = dict(TASK_TIER)
+        for item in os.getenv("LLM_TASK_TIERS", "").split(","):
+            if "=" in item:
+                task, tier = (part.strip() for part in item.split("=", 1))
+                if tier not in self.tiers:
+                    raise ValueError(f"LLM_TASK_TIERS 中的档位不存在: {tier}")
+                self.task_tiers[task] = tier
+        self.max_error_rate = float(os.getenv("LLM_TIER_MAX_ERROR_RATE", "0.5"))
+        self.probe_interval = int(os.getenv("LLM_TIER_PROBE_INTERVAL", "10"))
+        self._counter = itertools.count()
+
+    def tier(self, task: str) -> ModelTier:
+        """任务配置的档位"""
+        return self.tiers[self.task_tiers.get(task, "standard")]
+
+    def candidates(self, task: str) -> list[ModelTier]:
+        """按尝试顺序返回任务可用的档位, 模型相同的备用档位会被跳过"""
+        primary = self.tier(task)
+        result = [primary]
+        for name in FALLBACK_TIERS.get(primary.name, ()):
+            tier = self.tiers[name]
+            if all(tier.model != chosen.model for chosen in result):
+                result.append(tier)
+
+        probe = next(self._counter) % self.probe_interval == 0
+        if len(result) > 1 and primary.degraded(self.max_error_rate) and not probe:
+            healthy = [t for t in result[1:] if not t.degraded(self.max_error_rate)]
+            if healthy:
+                fallbacks_total.inc(
+                    template=task, from_tier=primary.name, to_tier=healthy[0].name
+                )
+                result.remove(healthy[0])
+                result.insert(0, healthy[0])
+        return result
+
+    def configure(
+        self,
+        models: dict[str, str] | None = None,
+        timeouts: dict[str, float] | None = None,
+        task_tiers: dict[str, str] | None = None,
+    ) -> None:
+        """运行时修改档位模型、超时与任务档位, 修改模型后清空该档位的统计
+
+        异常:
+            KeyError: 档位名称不存在
+            ValueError: 超时不大于 0
+        """
+        for name in [*(models or {}), *(timeouts or {}), *(task_tiers or {}).values()]:
+            if name not in self.tiers:
+                raise KeyError(name)
+        for name, timeout in (timeouts or {}).items():
+            if timeout <= 0:
+                raise ValueError(f"{name} 档位的超时须大于 0")
+        for name, model in (models or {}).items():
+            if model != self.tiers[name].model:
+                tier = self.tiers[name]
+                self.tiers[name] = ModelTier(name, model, tier.timeout, tier.window)
+        for name, timeout in (timeouts or {}).items():
+            self.tiers[name].timeout = timeout
+        self.task_tiers.update(task_tiers or {})
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "tiers": {name: tier.snapshot() for name, tier in self.tiers.items()},
+            "tasks": dict(sorted(self.task_tiers.items())),
+        }
+
+
+model_router = ModelRouter()
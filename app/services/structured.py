@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+from collections.abc import Iterable
+from typing import Any, Literal
+
+from openai import NOT_GIVEN, NotGiven
+from openai.types.chat.completion_create_params import ResponseFormat
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+
+from .json_extract import MalformedElement, extract_json
+from .llm import complete
+from .metrics import Counter
+from .prompts import prompts
+from .utils import CompletionMessage
+
+logger = logging.getLogger(__name__)
+
+structured_outputs = Counter(
+    "llm_structured_outputs_total",
+    "模型结构化输出的校验结果, result 为 valid、repaired 或 failed",
+    ("template", "result"),
+)
+
+# 各任务的输出模型, 由路由模块通过 register_output() 登记
+OUTPUT_MODELS: dict[str, type[BaseModel]] = {}
+
+
+def register_output(
+    task: str,
+    model: type[BaseModel],
+    *,
+    exclude: Iterable[str] = (),
+    overrides: dict[str, Any] | None = None,
+) -> type[BaseModel]:
+    """从响应模型派生任务的输出模型并登记
+
+    参数:
+        task: 任务名称, 与提示词模板路径一致
+        model: 路由的响应模型
+        exclude: 由服务端填充、不需要模型生成的字段, 如 id、created_at
+        overrides: 模型输出与响应格式不同的字段, 值为 (类型, Field(...))
+    """
+    excluded = set(exclude)
+    fields: dict[str, Any] = {
+        name: (info.annotation, info)
+        for name, info in model.model_fields.items()
+        if name not in excluded
+    }
+    fields.update(overrides or {})
+    output = create_model(f"{model.__name__}Output", **fields)
+    OUTPUT_MODELS[task] = output
+    return output
+
+
+def _adapter(task: str, start: Literal["{", "["]) -> TypeAdapter[Any] | None:
+    if (model := OUTPUT_MODELS.get(task)) is None:
+        return None
+    return TypeAdapter(list[model] if start == "[" else model)
+
+
+def response_format(task: str) -> ResponseFormat | NotGiven:
+    """根据 LLM_JSON_MODE 生成请求的 response_format
+
+    - 未设置: 不约束输出格式, 依赖提示词中的 JSON 示例
+    - json_object: 要求模型输出合法的 JSON 对象
+    - json_schema: 按输出模型的 JSON Schema 约束输出
+    """
+    mode = os.getenv("LLM_JSON_MODE", "").lower()
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "json_schema" and (model := OUTPUT_MODELS.get(task)):
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": task.replace("/", "_"),
+                "schema": model.model_json_schema(),
+            },
+        }
+    return NOT_GIVEN
+
+
+def _describe(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "\n".join(
+            f"- {'.'.join(map(str, item['loc'])) or '(根)'}: {item['msg']}"
+            for item in error.errors()[:10]
+        )
+    return f"- {error}"
+
+
+async def _repair(content: str, error: ValueError, schema: Any) -> str:
+    """只把出错的输出与错误信息交给模型修正, 代价远小于重新生成"""
+    prompt = prompts.render(
+        "structured/repair",
+        schema=json.dumps(schema, ensure_ascii=False),
+        errors=_describe(error),
+        content=content,
+    )
+    return await complete(
+        CompletionMessage().text(prompt),
+        task="structured/repair",
+        temperature=0,
+    )
+
+
+async def parse_output(task: str, content: str, start: Literal["{", "["] = "{") -> Any:
+    """从模型输出中提取 JSON, 并按任务的输出模型校验
+
+    - 任务未登记输出模型时只提取 JSON, 不做校验
+    - 解析或校验失败时进行一次修复, 修复后仍不合法则抛出 ValueError
+    """
+    adapter = _adapter(task, start)
+    if adapter is None:
+        return extract_json(content, start)
+
+    def validate(text: str) -> Any:
+        data = extract_json(text, start)
+        return adapter.dump_python(adapter.validate_python(data), mode="json")
+
+    try:
+        result = validate(content)
+    except ValueError as error:
+        logger.warning("%s 输出校验失败, 尝试修复: %s", task, error)
+        repaired = await _repair(content, error, adapter.json_schema())
+        try:
+            result = validate(repaired)
+        except ValueError as err:
+            structured_outputs.inc(template=task, result="failed")
+            raise ValueError(f"模型输出格式错误: {err}") from err
+        structured_outputs.inc(template=task, result="repaired")
+        return result
+
+    structured_outputs.inc(template=task, result="valid")
+    return result
+
+
+async def parse_item(task: str, item: Any) -> dict[str, Any]:
+    """校验流式输出的单个数组元素, 失败时仅修复该元素
+
+    item 为 MalformedElement 时按其原文修复
+    """
+    if isinstance(item, MalformedElement):
+        content = item.text
+    else:
+        content = json.dumps(item, ensure_ascii=False)
+    result: dict[str, Any] = await parse_output(task, content)
+    return result
+
+
+async def complete_json(
+    message: CompletionMessage,
+    *,
+    task: str,
+    temperature: float | None = None,
+    start: Literal["{", "["] = "{",
+) -> Any:
+    """调用 LLM 生成 JSON 内容, 返回经输出模型校验的数据
+
+    参数:
+        message: 用户消息
+        task: 任务名称, 与提示词模板路径一致
+        temperature: 采样温度, 为 None 时使用模型默认值
+        start: 顶层值的起始字符, "{" 表示对象, "[" 表示数组
+
+    异常:
+        ValueError: 输出为空, 或修复后仍无法通过校验
+    """
+    content = await complete(
+        message,
+        task=task,
+        temperature=temperature,
+        # 数组任务的提示词可能直接要求输出数组, JSON 模式只允许对象
+        response_format=response_format(task) if start == "{" else NOT_GIVEN,
+    )
+    if not content:
+        raise ValueError("生成内容为空")
+    return await parse_output(task, content, start)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import uuid
 from io import BytesIO
@@ -9,18 +10,29 @@ from google.genai import types
 from PIL import Image
 
 from ..constant import CACHE_DIR
-from .utils import run_sync
+from .executors import Executor, run_sync
+from .llm import gemini_retry_reason, instrument, with_retries
+from .utils import scheduler, within_deadline
 
 GEMINI_MODEL = "gemini-2.0-flash-exp-image-generation"
 STYLED_CACHE_DIR = CACHE_DIR / "styled"
 STYLED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def save_png(data: bytes, path: Path) -> None:
+    """将生成的图片转存为 PNG, 在 CPU 执行器的子进程中执行"""
+    with Image.open(BytesIO(data)) as image:
+        image.save(path, format="PNG")
+
+
 class StyleTransferService:
     def __init__(self) -> None:
-        # 初始化Gemini客户端
+        # 初始化Gemini客户端, GEMINI_BASE_URL 可指向代理或本地模拟服务
         try:
-            self.client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+            self.client = genai.Client(
+                api_key=os.environ["GEMINI_API_KEY"],
+                http_options=types.HttpOptions(base_url=os.getenv("GEMINI_BASE_URL")),
+            )
         except Exception as e:
             raise RuntimeError(f"Gemini API初始化失败: {e}") from e
 
@@ -30,15 +42,32 @@ class StyleTransferService:
         style_prompt: str,
     ) -> Path:
         """处理图片风格转换请求"""
+        prompt = f"请将这张图片转换为以下风格: \n{style_prompt}"
+        digest = hashlib.sha256(prompt.encode() + hashlib.sha256(image).digest())
 
         # 调用Gemini API生成风格化图片
-        response = await run_sync(self.client.models.generate_content)(
-            model=GEMINI_MODEL,
-            contents=[
-                f"请将这张图片转换为以下风格: \n{style_prompt}",
-                Image.open(BytesIO(image)),
-            ],
-            config=types.GenerateContentConfig(response_modalities=["Text", "Image"]),
+        async def attempt() -> types.GenerateContentResponse:
+            async with within_deadline(), scheduler.slot("gemini"):
+                with instrument(
+                    "style_transfer/generate", GEMINI_MODEL, digest.hexdigest()
+                ) as record:
+                    response = await self.client.aio.models.generate_content(
+                        model=GEMINI_MODEL,
+                        contents=[prompt, Image.open(BytesIO(image))],
+                        config=types.GenerateContentConfig(
+                            response_modalities=["Text", "Image"]
+                        ),
+                    )
+                    if usage := response.usage_metadata:
+                        record.usage(
+                            usage.prompt_token_count, usage.candidates_token_count
+                        )
+            return response
+
+        response = await with_retries(
+            attempt,
+            template="style_transfer/generate",
+            retry_reason=gemini_retry_reason,
         )
 
         if (
@@ -51,9 +80,10 @@ class StyleTransferService:
         # 处理响应
         for part in content.parts:
             if part.inline_data is not None and part.inline_data.data is not None:
-                generated = Image.open(BytesIO(part.inline_data.data))
                 output_path = STYLED_CACHE_DIR / f"{uuid.uuid4()}.png"
-                generated.save(output_path, format="PNG")
+                await run_sync(save_png, Executor.CPU)(
+                    part.inline_data.data, output_path
+                )
                 return output_path
         else:
             raise HTTPException(status_code=500, detail="AI 生成图片失败")
@@ -1,85 +1,90 @@
-import base64
-import json
 import random
 import shutil
 import uuid
 import zipfile
-
-import jinja2
+from collections.abc import AsyncIterator
 
 from ..constant import ASSETS_DIR, CACHE_DIR
-from . import fleep
-from .utils import CompletionMessage, get_openai_client, run_sync
+from .executors import Executor, run_sync
+from .images import image_optimizer
+from .json_extract import extract_json
+from .llm import complete, stream
+from .prompts import prompts
+from .tokens import fit_prompt
+from .utils import CompletionMessage
 
 ASSETS_ROOT = ASSETS_DIR / "teaching_plan"
-PROMPT_GENERATE = ASSETS_ROOT / "generate.md"
-PROMPT_CONVERT = ASSETS_ROOT / "convert.md"
 DOCUMENT_TEMPLATE_FILE = ASSETS_ROOT / "template.zip"
-DOCUMENT_XML_TEMPLATE: jinja2.Template = jinja2.Template(
-    (ASSETS_ROOT / "document.xml.jinja2").read_text("utf-8")
-)
 RENDER_TOOLS: dict[str, object] = {
     "enumerate": lambda it: enumerate(it, 1),
     "paraId": lambda: "".join(random.choice("0123456789ABCDEF") for _ in range(8)),
 }
 
 
-def _convert_images(images: list[bytes]) -> list[str]:
-    result: list[str] = []
-    for raw in images:
-        info = fleep.get(raw[:256])
-        if not info.mime or not any("image" in mime for mime in info.mime):
-            raise ValueError("Invalid image format")
-        encoded = base64.b64encode(raw).decode("utf-8")
-        result.append(f"data:{info.mime[0]};base64,{encoded}")
-    return result
+async def _convert_images(images: list[bytes]) -> list[str]:
+    return await image_optimizer.data_urls(images)
 
 
 class TeachingPlanGenerator:
-    def __init__(self) -> None:
-        self.client, self.model_name = get_openai_client()
-
     async def generate(self, grade: str, images: list[bytes]) -> str:
-        prompt = PROMPT_GENERATE.read_text("utf-8")
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[
-                CompletionMessage()
-                .text(prompt.replace("{{grade}}", grade))
-                .images(_convert_images(images))
-                .build()
-            ],
+        prompt = prompts.render("teaching_plan/generate", grade=grade)
+        result = await complete(
+            CompletionMessage().text(prompt).images(await _convert_images(images)),
+            task="teaching_plan/generate",
         )
-        result = response.choices[0].message.content or ""
         return result[result.find("#") :]
 
-    async def _convert_json(self, content: str):
-        prompt = PROMPT_CONVERT.read_text("utf-8").replace("{{content}}", content)
-        response = await run_sync(self.client.chat.completions.create)(
-            model=self.model_name,
-            messages=[CompletionMessage().text(prompt).build()],
+    async def generate_stream(
+        self, grade: str, images: list[bytes]
+    ) -> AsyncIterator[str]:
+        """流式生成教案, 逐段产出 Markdown 文本
+
+        与 generate() 一致, 丢弃第一个标题 "#" 之前的内容
+        """
+        prompt = prompts.render("teaching_plan/generate", grade=grade)
+        deltas = stream(
+            CompletionMessage().text(prompt).images(await _convert_images(images)),
+            task="teaching_plan/generate",
         )
-        output = response.choices[0].message.content or ""
-        return output[output.find("{") : output.rfind("}") + 1]
 
-    def _pack_docx(self, document: str):
-        output_file = CACHE_DIR / f"{uuid.uuid4()}.docx"
-        shutil.copyfile(DOCUMENT_TEMPLATE_FILE, output_file)
-        with zipfile.ZipFile(output_file, "a") as docx:
-            docx.writestr("word/document.xml", document)
-        return output_file
+        # 缓冲直到出现第一个标题, 之后直接转发
+        buffer, started = "", False
+        async for delta in deltas:
+            if started:
+                yield delta
+                continue
+            buffer += delta
+            if (start := buffer.find("#")) >= 0:
+                started = True
+                yield buffer[start:]
 
-    async def convert(self, teaching_plan: str):
-        converted_json = await self._convert_json(teaching_plan)
-        if not converted_json:
+    async def _convert_json(self, content: str) -> dict:
+        # 教案内容就是要转换的文档, 截断会让导出的文档缺失内容, 超长时直接拒绝
+        prompt = fit_prompt(
+            "teaching_plan/convert", trim={}, strict=True, content=content
+        )
+        output = await complete(
+            CompletionMessage().text(prompt),
+            task="teaching_plan/convert",
+        )
+        if not output:
             raise ValueError(
                 "API returned empty content when converting teaching plan to JSON"
             )
 
         try:
-            data = json.loads(converted_json)
-        except json.JSONDecodeError as err:
+            return extract_json(output)
+        except ValueError as err:
             raise ValueError("Failed to parse JSON content from API response") from err
 
-        document = DOCUMENT_XML_TEMPLATE.render(RENDER_TOOLS | data)
-        return self._pack_docx(document)
+    def _pack_docx(self, document: str):
+        output_file = CACHE_DIR / f"{uuid.uuid4()}.docx"
+        shutil.copyfile(DOCUMENT_TEMPLATE_FILE, output_file)
+        with zipfile.ZipFile(output_file, "a") as docx:
+            docx.writestr("word/document.xml", document)
+        return output_file
+
+    async def convert(self, teaching_plan: str):
+        data = await self._convert_json(teaching_plan)
+        document = prompts.render("teaching_plan/document.xml", **(RENDER_TOOLS | data))
+        return await run_sync(self._pack_docx, Executor.DISK)(document)
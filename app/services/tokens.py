@@ -0,0 +1,150 @@
+import functools
+import logging
+import math
+import os
+import re
+from typing import Any
+
+from fastapi import HTTPException
+
+from .metrics import Counter, Histogram
+from .prompts import prompts
+
+logger = logging.getLogger(__name__)
+
+# 各任务提示词的 token 上限, 未列出的任务使用 LLM_PROMPT_MAX_TOKENS, 默认 8000
+TOKEN_BUDGET: dict[str, int] = {
+    "cultural_corridor/generate_case": 4000,
+    "teaching_plan/convert": 12000,
+}
+
+prompt_tokens = Histogram(
+    "llm_prompt_tokens",
+    "经预算检查的提示词 token 数 (本地估算, 裁剪前)",
+    ("template",),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+trimmed_tokens = Counter(
+    "llm_prompt_tokens_trimmed_total",
+    "超出预算的提示词被裁剪掉的 token 数 (本地估算)",
+    ("template",),
+)
+
+TRIM_MARKER = "\n……（以下内容过长，中间部分已省略）……\n"
+
+# 中日韩文字与全角标点, 启发式估算中按每字一个 token 计算
+_WIDE_CHARS = re.compile(r"[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+@functools.cache
+def _encoding() -> Any | None:
+    """安装了可选依赖 tiktoken 时使用其分词器, 编码由 LLM_TOKENIZER 配置"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding(os.getenv("LLM_TOKENIZER", "o200k_base"))
+    except Exception:
+        # 编码文件需首次下载, 离线环境下退回启发式估算
+        logger.warning("tiktoken 编码加载失败, 使用启发式估算 token 数")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """估算文本的 token 数
+
+    未安装 tiktoken 时按中文每字 1 个、其余每 4 个字符 1 个估算, 结果偏保守
+    """
+    if (encoding := _encoding()) is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """截断到不超过 max_tokens 个 token, 保留开头 2/3 与结尾 1/3, 中间插入省略标记"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max_tokens - count_tokens(TRIM_MARKER)
+    if keep <= 0:
+        return ""
+
+    if (encoding := _encoding()) is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        head = keep * 2 // 3
+        tail = keep - head
+        # 在多字节字符中间切开时会解码出替换字符, 去掉即可
+        return (
+            encoding.decode(tokens[:head]).rstrip("\ufffd")
+            + TRIM_MARKER
+            + encoding.decode(tokens[len(tokens) - tail :]).lstrip("\ufffd")
+        )
+
+    chars = len(text) * keep // count_tokens(text)
+    while True:
+        head = chars * 2 // 3
+        result = text[:head] + TRIM_MARKER + text[len(text) - (chars - head) :]
+        if chars <= 0 or count_tokens(result) <= max_tokens:
+            return result
+        chars = chars * 9 // 10
+
+
+class PromptTooLong(HTTPException):
+    """输入不可裁剪且超出任务的 token 上限时返回 413"""
+
+    def __init__(self, task: str, tokens: int, budget: int) -> None:
+        super().__init__(
+            status_code=413,
+            detail=f"内容过长 (约 {tokens} tokens, 上限 {budget}), 请缩减后重试",
+        )
+        self.task = task
+
+
+def fit_prompt(
+    task: str, trim: dict[str, int], *, strict: bool = False, **params: str
+) -> str:
+    """渲染提示词, 超出任务的 token 上限时裁剪过长的参数后重新渲染
+
+    参数:
+        task: 任务名称, 与提示词模板路径一致
+        trim: 可裁剪的参数名及其优先级, 数值越小越先裁剪
+        strict: 裁剪后仍超出上限时抛出 PromptTooLong, 而不是照常返回
+        params: 模板参数
+
+    裁剪时按优先级依次截断参数 (保留首尾), 直到满足上限;
+    全部可裁剪参数截断后仍超出时照常返回, 由服务商决定是否拒绝
+    """
+    budget = TOKEN_BUDGET.get(task) or int(os.getenv("LLM_PROMPT_MAX_TOKENS", "8000"))
+    prompt = prompts.render(task, **params)
+    original = total = count_tokens(prompt)
+    prompt_tokens.observe(total, template=task)
+    if total <= budget:
+        return prompt
+
+    for name in sorted(trim, key=trim.__getitem__):
+        # 省略标记本身也占 token, 截断后仍可能略超上限, 再截断一次
+        for _ in range(2):
+            if total <= budget or not params[name]:
+                break
+            size = count_tokens(params[name])
+            params[name] = truncate(params[name], max(0, size - (total - budget)))
+            prompt = prompts.render(task, **params)
+            total = count_tokens(prompt)
+
+    if strict and total > budget:
+        logger.warning("%s 提示词超出上限: %d > %d", task, total, budget)
+        raise PromptTooLong(task, total, budget)
+
+    trimmed_tokens.inc(original - total, template=task)
+    logger.info(
+        "%s 提示词 %d tokens 超出上限 %d, 裁剪后 %d tokens, 节省 %d",
+        task,
+        original,
+        budget,
+        total,
+        original - total,
+    )
+    if total > budget:
+        logger.warning("%s 提示词裁剪后仍超出上限: %d > %d", task, total, budget)
+    return prompt
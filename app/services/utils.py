@@ -1,20 +1,41 @@
 import asyncio
-import base64
+import contextvars
+import enum
 import functools
+import heapq
+import itertools
+import math
 import os
-from collections.abc import Awaitable, Callable, Iterable
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager, suppress
 from typing import Self
 
-from openai import OpenAI
+import httpx
+from fastapi import HTTPException
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from openai.types.chat import (
     ChatCompletionContentPartParam,
     ChatCompletionUserMessageParam,
 )
 
 from . import fleep as fleep
+from .executors import Executor as Executor
+from .executors import run_sync as run_sync
+from .images import image_optimizer
+from .metrics import Counter, Gauge, Histogram
 
 
-def get_openai_client():
+@functools.cache
+def get_openai_client() -> tuple[AsyncOpenAI, str]:
+    """获取进程内共享的 OpenAI 异步客户端
+
+    - 客户端只创建一次, 底层 HTTP 连接池在所有请求间复用 (keep-alive)
+    - 连接池大小通过环境变量配置:
+        - OPENAI_MAX_CONNECTIONS: 最大连接数, 默认 100
+        - OPENAI_MAX_KEEPALIVE_CONNECTIONS: 最大空闲保活连接数, 默认 20
+        - OPENAI_KEEPALIVE_EXPIRY: 空闲连接保活时间(秒), 默认 30
+    """
     openai_api_key = os.getenv("OPENAI_API_KEY")
     openai_base_url = os.getenv("OPENAI_BASE_URL")
     openai_model_name = os.getenv("OPENAI_MODEL_NAME") or "gpt-3.5-turbo"
@@ -22,13 +43,31 @@ def get_openai_client():
     if not openai_api_key:
         raise ValueError("OPENAI_API_KEY 环境变量未设置")
 
-    client = OpenAI(
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(
+            os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")
+        ),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+    )
+    client = AsyncOpenAI(
         api_key=openai_api_key,
         base_url=openai_base_url,
+        http_client=DefaultAsyncHttpxClient(limits=limits),
+        # 重试由 llm.py 在请求截止时间内统一处理
+        max_retries=0,
     )
     return client, openai_model_name
 
 
+async def close_openai_client() -> None:
+    """关闭共享的 OpenAI 客户端, 释放连接池"""
+    if get_openai_client.cache_info().currsize:
+        client, _ = get_openai_client()
+        get_openai_client.cache_clear()
+        await client.close()
+
+
 class CompletionMessage:
     content: list[ChatCompletionContentPartParam]
 
@@ -40,13 +79,12 @@ class CompletionMessage:
         return self
 
     def image(self, image_url: str | bytes) -> Self:
-        if isinstance(image_url, bytes):
-            info = fleep.get(image_url)
-            if not info or not info.mime:
-                raise ValueError("无效的图片数据")
+        """添加图片, 原始图片数据经 image_optimizer 压缩后以 data URL 发送
 
-            encoded = base64.b64encode(image_url).decode("utf-8")
-            image_url = f"data:{info.mime[0]};base64,{encoded}"
+        请求处理中优先用 await image_optimizer.data_urls() 预先转换, 避免阻塞事件循环
+        """
+        if isinstance(image_url, bytes):
+            image_url = image_optimizer.data_url(image_url)
 
         self.content.append(
             {"type": "image_url", "image_url": {"url": image_url, "detail": "auto"}}
@@ -62,15 +100,255 @@ class CompletionMessage:
         return {"role": "user", "content": self.content}
 
 
-def run_sync[**P, R](call: Callable[P, R]) -> Callable[P, Awaitable[R]]:
-    """一个用于包装 sync function 为 async function 的装饰器
+class SingleFlight[T]:
+    """合并相同键的并发调用
+
+    - 同一键同时只有一个调用在执行, 其余调用方等待并共享其结果
+    - 单个调用方被取消不会影响共享的调用
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Future[T]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        if (future := self._calls.get(key)) is None:
+            future = self._calls[key] = asyncio.ensure_future(call())
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+
+class Priority(enum.IntEnum):
+    """LLM 调用的优先级, 数值越小越先获得调用名额"""
+
+    INTERACTIVE = 0
+    """交互类请求, 用户正在页面上等待结果"""
+    STANDARD = 1
+    """普通生成请求"""
+    BULK = 2
+    """批量生成请求, 可以为其他请求让路"""
+
+
+class ProviderOverloaded(HTTPException):
+    """LLM 调用排队过长时快速失败, 返回 503 并提示重试时间"""
+
+    def __init__(self, provider: str, retry_after: float) -> None:
+        super().__init__(
+            status_code=503,
+            detail=f"AI 服务繁忙 ({provider}), 请稍后再试",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+class _PriorityLimiter:
+    """按优先级排队的并发限制器, 同优先级先到先得"""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self._queue: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.limit and not self._queue:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._counter), future)
+        heapq.heappush(self._queue, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已经转交给当前任务, 归还给下一个等待者
+                self.release()
+            else:
+                # release() 可能已在任务恢复前弹出了这个已取消的等待项
+                with suppress(ValueError):
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+            raise
+
+    def release(self) -> None:
+        # 名额直接转交给优先级最高的等待者, active 不变
+        while self._queue:
+            *_, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class _TokenBucket:
+    """令牌桶限速器, rate 为每秒令牌数, rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
 
-    参数:
-        call: 被装饰的同步函数
+    async def take(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+scheduler_queue_depth = Gauge(
+    "llm_scheduler_queue_depth",
+    "等待 LLM 调用名额的请求数",
+    ("provider",),
+)
+scheduler_active = Gauge(
+    "llm_scheduler_active",
+    "正在进行的 LLM 调用数",
+    ("provider",),
+)
+scheduler_wait_seconds = Histogram(
+    "llm_scheduler_wait_seconds",
+    "LLM 调用排队等待时间(秒)",
+    ("provider", "priority"),
+)
+scheduler_rejected = Counter(
+    "llm_scheduler_rejected_total",
+    "因排队过长被拒绝的 LLM 调用数",
+    ("provider", "priority"),
+)
+
+
+class LLMScheduler:
+    """LLM 调用准入调度器
+
+    - 全局并发上限: LLM_MAX_CONCURRENCY, 默认 32
+    - 各服务商并发上限: {PROVIDER}_MAX_CONCURRENCY, 默认 16
+    - 各服务商令牌桶限速: {PROVIDER}_RATE_LIMIT (次/秒, 0 为不限) 与
+      {PROVIDER}_RATE_BURST, 默认 10 次/秒, 突发 20 次
+    - 排队请求数超过 LLM_MAX_QUEUE (默认 64) 时直接拒绝, 返回 503
+    - 名额按 Priority 分配, 交互请求优先于批量请求
     """
 
-    @functools.wraps(call)
-    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-        return await asyncio.to_thread(call, *args, **kwargs)
+    def __init__(self) -> None:
+        self.max_queue = int(os.getenv("LLM_MAX_QUEUE", "64"))
+        self._global = _PriorityLimiter(int(os.getenv("LLM_MAX_CONCURRENCY", "32")))
+        self._providers: dict[str, tuple[_PriorityLimiter, _TokenBucket]] = {}
+        self._durations: dict[str, float] = {}
+
+    def _provider(self, provider: str) -> tuple[_PriorityLimiter, _TokenBucket]:
+        if provider not in self._providers:
+            prefix = provider.upper()
+            self._providers[provider] = (
+                _PriorityLimiter(int(os.getenv(f"{prefix}_MAX_CONCURRENCY", "16"))),
+                _TokenBucket(
+                    float(os.getenv(f"{prefix}_RATE_LIMIT", "10")),
+                    float(os.getenv(f"{prefix}_RATE_BURST", "20")),
+                ),
+            )
+        return self._providers[provider]
+
+    def _report(self, provider: str) -> None:
+        limiter, _ = self._provider(provider)
+        waiting = limiter.waiting + self._global.waiting
+        scheduler_queue_depth.set(waiting, provider=provider)
+        scheduler_active.set(limiter.active, provider=provider)
+
+    def check_capacity(
+        self, provider: str, priority: Priority = Priority.STANDARD
+    ) -> None:
+        """排队过长时抛出 ProviderOverloaded"""
+        limiter, _ = self._provider(provider)
+        waiting = limiter.waiting + self._global.waiting
+        if waiting < self.max_queue:
+            return
+
+        scheduler_rejected.inc(provider=provider, priority=priority.name.lower())
+        duration = self._durations.get(provider, 5.0)
+        retry_after = max(1.0, waiting / max(limiter.limit, 1) * duration)
+        raise ProviderOverloaded(provider, retry_after)
+
+    @asynccontextmanager
+    async def slot(
+        self, provider: str, priority: Priority = Priority.STANDARD
+    ) -> AsyncIterator[None]:
+        """获取一次 LLM 调用名额, 在 async with 块内完成调用"""
+        self.check_capacity(provider, priority)
+        limiter, bucket = self._provider(provider)
+
+        start = time.monotonic()
+        await self._global.acquire(priority)
+        try:
+            self._report(provider)
+            await limiter.acquire(priority)
+            try:
+                await bucket.take()
+                acquired = time.monotonic()
+                scheduler_wait_seconds.observe(
+                    acquired - start,
+                    provider=provider,
+                    priority=priority.name.lower(),
+                )
+                self._report(provider)
+                try:
+                    yield
+                finally:
+                    # 记录调用耗时的滑动平均, 用于估算 Retry-After
+                    duration = time.monotonic() - acquired
+                    previous = self._durations.get(provider, duration)
+                    self._durations[provider] = 0.8 * previous + 0.2 * duration
+            finally:
+                limiter.release()
+        finally:
+            self._global.release()
+            self._report(provider)
+
+
+scheduler = LLMScheduler()
+
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class DeadlineExceeded(HTTPException):
+    """请求的时间预算耗尽, 返回 504"""
+
+    def __init__(self) -> None:
+        super().__init__(status_code=504, detail="AI 服务响应超时, 请稍后再试")
+
+
+def set_deadline(seconds: float) -> None:
+    """设置当前请求的截止时间, 之后的 LLM 调用 (含排队与重试) 须在此前完成"""
+    _deadline.set(asyncio.get_running_loop().time() + seconds)
+
+
+def remaining_budget() -> float | None:
+    """当前请求剩余的时间预算(秒), 未设置截止时间时返回 None"""
+    if (deadline := _deadline.get()) is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
 
-    return wrapper
+@asynccontextmanager
+async def within_deadline() -> AsyncIterator[None]:
+    """在当前请求的截止时间内执行 async with 块, 超时抛出 DeadlineExceeded"""
+    try:
+        async with asyncio.timeout_at(_deadline.get()):
+            yield
+    except TimeoutError as err:
+        raise DeadlineExceeded from err
@@ -1,4 +1,4 @@
-import { request } from './index';
+import { API_BASE_URL, request } from './index';
 
 // 生成教案响应
 export interface GeneratePlanResponse {
@@ -26,6 +26,60 @@ export async function generateLessonPlan(
   });
 }
 
+// 流式生成教案回调
+export interface StreamPlanHandlers {
+  onDelta: (text: string) => void;
+}
+
+// 流式生成教案（Server-Sent Events），返回教案ID
+export async function streamLessonPlan(
+  grade: string,
+  images: File[],
+  handlers: StreamPlanHandlers,
+): Promise<string> {
+  const formData = new FormData();
+  formData.append('grade', grade);
+  images.forEach((file) => {
+    formData.append('images', file);
+  });
+
+  const response = await fetch(`${API_BASE_URL}/teaching/generate_plan/stream`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`教案生成失败: HTTP ${response.status}`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    // 事件之间以空行分隔
+    let boundary: number;
+    while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'delta') handlers.onDelta(payload.text);
+      else if (event === 'done') return payload.plan_id as string;
+      else if (event === 'error') throw new Error(payload.detail);
+    }
+  }
+  throw new Error('教案生成中断');
+}
+
 // 导出Word文档
 export async function exportPlanAsDocx(planId: string): Promise<Blob> {
   return request.get(`/teaching/plan_document/${planId}`, {
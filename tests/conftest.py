@@ -0,0 +1,74 @@
+"""
+测试夹具: 应用连接临时目录中的 SQLite 数据库, 每个测试使用全新的数据库
+
+DATABASE_URL 须在导入应用之前设置, 引擎在导入时创建; 内存数据库只能使用
+StaticPool, 与应用的连接池参数不兼容, 因此使用临时文件
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+DATABASE = Path(tempfile.mkdtemp()) / "test.sqlite3"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE}"
+# 导入时即创建客户端, 测试不调用 AI 服务
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+# 补全缓存的磁盘层位于 CACHE_DIR, 测试中关闭
+os.environ["LLM_CACHE_DISABLE"] = "*"
+
+from collections.abc import AsyncIterator, Iterator  # noqa: E402
+from contextlib import contextmanager  # noqa: E402
+from typing import Any  # noqa: E402
+
+import pytest  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine  # noqa: E402
+
+from app.db import run_migrations  # noqa: E402
+from app.db.config import get_engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def database() -> AsyncIterator[AsyncEngine]:
+    """应用的数据库引擎, 测试开始时数据库为空, 结束后删除"""
+    yield get_engine()
+
+    # 连接绑定在各测试自己的事件循环上, 关闭后删除数据库文件
+    await get_engine().dispose()
+    for path in DATABASE.parent.glob(f"{DATABASE.name}*"):
+        path.unlink()
+
+
+@pytest.fixture
+async def client(
+    database: AsyncEngine,  # noqa: ARG001
+) -> AsyncIterator[AsyncClient]:
+    """按迁移建好结构的空数据库上的应用客户端 (不执行应用的启动流程)"""
+    await run_migrations()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@contextmanager
+def count_queries() -> Iterator[list[int]]:
+    """统计块内执行的 SQL 语句数, 结果为列表的唯一元素"""
+    counter = [0]
+
+    def count(*_: Any) -> None:
+        counter[0] += 1
+
+    sync_engine = get_engine().sync_engine
+    event.listen(sync_engine, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count)
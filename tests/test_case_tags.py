@@ -0,0 +1,136 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db import CrossDisciplineCase, open_session, run_migrations
+from app.db.models.cultural_corridor import (
+    case_disciplines,
+    case_grades,
+    normalize_grade,
+    split_disciplines,
+    split_grades,
+)
+
+from .test_migrations import create_legacy_schema
+
+pytestmark = pytest.mark.anyio
+
+
+def case(case_id: str, disciplines: str, grades: str) -> dict[str, str]:
+    return {
+        "id": case_id,
+        "title": f"案例 {case_id}",
+        "main_discipline": "语文",
+        "related_disciplines": disciplines,
+        "suitable_grades": grades,
+        "content": "内容",
+        "teaching_objectives": "目标",
+        "created_at": f"2026-01-01 00:00:{case_id[-1]}0",
+    }
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("物理,数学", ["物理", "数学"]),
+        (
+            "物理，数学、历史；地理;生物/化学",
+            ["物理", "数学", "历史", "地理", "生物", "化学"],
+        ),
+        (" 物理 , 物理,, 数学应用 ", ["物理", "数学应用"]),
+        ("", []),
+    ],
+)
+def test_split_disciplines(text: str, expected: list[str]) -> None:
+    assert split_disciplines(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("grade", "expected"),
+    [
+        ("七年级", "七年级"),
+        ("初一", "七年级"),
+        ("初三", "九年级"),
+        ("7年级", "七年级"),
+        ("七", "七年级"),
+        ("7", "七年级"),
+        (" 高二 ", "高二"),
+        ("初中", "初中"),
+        ("大学", "大学"),
+    ],
+)
+def test_normalize_grade(grade: str, expected: str) -> None:
+    assert normalize_grade(grade) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("七至八年级", ["七年级", "八年级"]),
+        ("7-9年级", ["七年级", "八年级", "九年级"]),
+        ("初一到初三", ["七年级", "八年级", "九年级"]),
+        ("高一到高三", ["高一", "高二", "高三"]),
+        ("九年级至高一", ["九年级", "高一"]),
+        ("七年级、初一, 8年级", ["七年级", "八年级"]),
+        ("五至六年级/初一", ["五年级", "六年级", "七年级"]),
+        # 无法识别的写法、反向范围原样保留
+        ("初中", ["初中"]),
+        ("八至七年级", ["八至七年级"]),
+        ("初中至高中", ["初中至高中"]),
+        ("", []),
+    ],
+)
+def test_split_grades(text: str, expected: list[str]) -> None:
+    assert split_grades(text) == expected
+
+
+async def test_upgrade_backfills_case_tags(database: AsyncEngine) -> None:
+    async with database.begin() as conn:
+        await conn.run_sync(create_legacy_schema)
+        await conn.execute(
+            insert(CrossDisciplineCase),
+            [case("c-1", "物理、数学", "七至八年级"), case("c-2", "数学应用", "初中")],
+        )
+
+    await run_migrations()
+
+    async with database.connect() as conn:
+        disciplines = await conn.execute(
+            select(case_disciplines).order_by(*case_disciplines.c)
+        )
+        assert disciplines.all() == [
+            ("c-1", "数学"),
+            ("c-1", "物理"),
+            ("c-2", "数学应用"),
+        ]
+        grades = await conn.execute(select(case_grades).order_by(*case_grades.c))
+        assert grades.all() == [
+            ("c-1", "七年级"),
+            ("c-1", "八年级"),
+            ("c-2", "初中"),
+        ]
+
+
+async def test_case_filters_match_whole_tags(client: AsyncClient) -> None:
+    async with open_session() as db:
+        db.add(CrossDisciplineCase(**case("c-1", "物理,数学", "七至八年级")))
+        db.add(CrossDisciplineCase(**case("c-2", "数学应用", "高一到高三")))
+
+    async def ids(**params: str) -> list[str]:
+        response = await client.get("/api/cultural-corridor/cases", params=params)
+        assert response.status_code == 200, response.text
+        return sorted(item["id"] for item in response.json())
+
+    assert await ids(related_discipline="数学") == ["c-1"]
+    assert await ids(related_discipline="数学应用") == ["c-2"]
+    assert await ids(suitable_grade="初二") == ["c-1"]
+    assert await ids(suitable_grade="高二") == ["c-2"]
+    assert await ids(suitable_grade="九年级") == []
+
+    # 修改案例后关联表随之更新
+    async with open_session() as db:
+        updated = await db.get_one(CrossDisciplineCase, "c-1")
+        updated.suitable_grades = "九年级"
+    assert await ids(suitable_grade="初二") == []
+    assert await ids(suitable_grade="9") == ["c-1"]
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+import openai
+import pytest
+
+from app.services import llm
+from app.services.utils import DeadlineExceeded, set_deadline, within_deadline
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = httpx.Request("POST", "https://llm.test/v1/chat/completions")
+
+
+def rate_limited(retry_after: float | None = None) -> openai.RateLimitError:
+    headers = {} if retry_after is None else {"retry-after": str(retry_after)}
+    response = httpx.Response(429, headers=headers, request=REQUEST)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def failing(*errors: Exception) -> tuple[Callable[[], Awaitable[str]], list[int]]:
+    """依次抛出 errors 中的错误, 之后返回 "ok"; 第二个返回值为调用次数"""
+    attempts = [0]
+
+    async def call() -> str:
+        attempts[0] += 1
+        if attempts[0] <= len(errors):
+            raise errors[attempts[0] - 1]
+        return "ok"
+
+    return call, attempts
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("LLM_MAX_RETRIES", "2")
+    monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+
+
+async def test_retries_retryable_errors() -> None:
+    call, attempts = failing(rate_limited(), openai.APITimeoutError(REQUEST))
+    assert await llm.with_retries(call, template="test") == "ok"
+    assert attempts[0] == 3
+
+
+async def test_gives_up_after_max_retries() -> None:
+    call, attempts = failing(*(rate_limited() for _ in range(5)))
+    with pytest.raises(openai.RateLimitError):
+        await llm.with_retries(call, template="test")
+    assert attempts[0] == 3
+
+
+async def test_does_not_retry_other_errors() -> None:
+    call, attempts = failing(ValueError("bad request"))
+    with pytest.raises(ValueError, match="bad request"):
+        await llm.with_retries(call, template="test")
+    assert attempts[0] == 1
+
+
+async def test_stops_retrying_at_deadline() -> None:
+    async def run() -> None:
+        # Retry-After 超出剩余预算, 不再等待, 直接抛出原错误
+        set_deadline(0.5)
+        call, attempts = failing(rate_limited(retry_after=5))
+        start = time.perf_counter()
+        with pytest.raises(openai.RateLimitError):
+            await llm.with_retries(call, template="test")
+        assert attempts[0] == 1
+        assert time.perf_counter() - start < 0.5
+
+    # 截止时间保存在上下文变量中, 在独立任务内设置以免影响其他测试
+    await asyncio.create_task(run())
+
+
+async def test_within_deadline_raises_504() -> None:
+    async def run() -> None:
+        set_deadline(0.05)
+        with pytest.raises(DeadlineExceeded) as exceeded:
+            async with within_deadline():
+                await asyncio.sleep(1)
+        assert exceeded.value.status_code == 504
+
+    await asyncio.create_task(run())
+
+
+async def test_hedged_request_wins_when_primary_stalls(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    template = "test/hedged"
+    monkeypatch.setattr(llm, "HEDGED_TASKS", {template})
+    monkeypatch.setenv("LLM_HEDGE_MIN_DELAY", "0.01")
+    monkeypatch.setitem(llm._recent_durations, template, [0.01] * 20)
+
+    started = 0
+    cancelled = asyncio.Event()
+
+    async def call() -> str:
+        nonlocal started
+        started += 1
+        if started == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return f"call {started}"
+
+    assert await llm.hedged(call, template=template) == "call 2"
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
+async def test_no_hedge_without_samples() -> None:
+    call, attempts = failing()
+    assert await llm.hedged(call, template="test/unhedged") == "ok"
+    assert attempts[0] == 1
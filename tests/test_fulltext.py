@@ -0,0 +1,101 @@
+import pytest
+from httpx import AsyncClient
+
+from app.db import TraditionalStory, open_session
+from app.db.fulltext import _query_terms, tokenize
+
+pytestmark = pytest.mark.anyio
+
+STORIES = {
+    "s-1": ("卧薪尝胆", "越王勾践兵败后卧薪尝胆, 终于复国"),
+    "s-2": ("温故知新", "孔子说: 温故而知新, 可以为师矣"),
+    "s-3": ("编程入门", "用 Python 统计 GDP增长率2023 的数据"),
+}
+
+
+@pytest.fixture
+async def stories(client: AsyncClient) -> AsyncClient:
+    """写入故事, 检索表由 ORM 事件同步"""
+    async with open_session() as db:
+        for i, (story_id, (title, content)) in enumerate(STORIES.items()):
+            db.add(
+                TraditionalStory(
+                    id=story_id,
+                    title=title,
+                    theme="成语",
+                    content=content,
+                    created_at=f"2026-01-01 00:00:0{i}",
+                )
+            )
+    return client
+
+
+async def search(client: AsyncClient, keyword: str) -> set[str]:
+    response = await client.get(
+        "/api/cultural-corridor/stories", params={"keyword": keyword}
+    )
+    assert response.status_code == 200, response.text
+    return {story["id"] for story in response.json()}
+
+
+def test_tokenize() -> None:
+    assert tokenize("卧薪尝胆") == ["卧薪", "薪尝", "尝胆", "胆"]
+    assert tokenize("GDP增长率2023") == ["gdp", "增长", "长率", "率", "2023"]
+    assert _query_terms("Py 尝胆 胆") == [
+        (["py"], True),
+        (["尝胆"], False),
+        (["胆"], True),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("keyword", "expected"),
+    [
+        # 汉字短语: 等同子串匹配, 不跨越标点
+        ("卧薪尝胆", {"s-1"}),
+        ("薪尝胆", {"s-1"}),
+        ("而知新", {"s-2"}),
+        ("尝胆复国", set()),
+        # 单个汉字: 包括段尾的字
+        ("胆", {"s-1"}),
+        ("新", {"s-2"}),
+        ("国", {"s-1"}),
+        # 字母数字: 单词前缀匹配, 不区分大小写
+        ("python", {"s-3"}),
+        ("py", {"s-3"}),
+        ("PYTH", {"s-3"}),
+        ("thon", set()),
+        ("GDP", {"s-3"}),
+        ("gd", {"s-3"}),
+        ("2023", {"s-3"}),
+        ("202", {"s-3"}),
+        # 混合关键词拆开后分别匹配
+        ("GDP增长", {"s-3"}),
+        ("GDP尝胆", set()),
+        # 空格分隔的多个关键词须同时匹配
+        ("孔子 温故", {"s-2"}),
+        ("孔子 勾践", set()),
+        ("!!", set()),
+    ],
+)
+async def test_keyword_match(
+    stories: AsyncClient, keyword: str, expected: set[str]
+) -> None:
+    assert await search(stories, keyword) == expected
+
+
+async def test_title_ranks_first(stories: AsyncClient) -> None:
+    async with open_session() as db:
+        db.add(
+            TraditionalStory(
+                id="s-4",
+                title="勾践复国",
+                theme="成语",
+                content="讲述卧薪尝胆的另一个版本",
+                created_at="2026-01-02 00:00:00",
+            )
+        )
+    response = await stories.get(
+        "/api/cultural-corridor/stories", params={"keyword": "卧薪尝胆"}
+    )
+    assert [story["id"] for story in response.json()] == ["s-1", "s-4"]
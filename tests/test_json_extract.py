@@ -0,0 +1,86 @@
+from collections.abc import AsyncIterator
+
+import pytest
+from pydantic import BaseModel
+
+from app.services import structured
+from app.services.json_extract import (
+    JSONExtractor,
+    MalformedElement,
+    extract_json,
+    iter_json_array,
+)
+
+
+def feed_all(chunks: list[str]) -> list[object]:
+    extractor = JSONExtractor("[")
+    return [item for chunk in chunks for item in extractor.feed(chunk)]
+
+
+def test_skips_text_around_value() -> None:
+    text = '好的, 结果如下:\n```json\n{"a": [1, 2]}\n```\n以上 {"b": 1}'
+    assert extract_json(text) == {"a": [1, 2]}
+
+
+def test_braces_and_escaped_quotes_in_strings() -> None:
+    text = r'[{"title": "求 {x} 与 [y]", "answer": "他说 \"]\" 与 \\"}, 2]'
+    items = feed_all([text[i : i + 3] for i in range(0, len(text), 3)])
+    assert items == [{"title": "求 {x} 与 [y]", "answer": '他说 "]" 与 \\'}, 2]
+
+
+def test_elements_are_emitted_when_closed() -> None:
+    extractor = JSONExtractor("[")
+    assert extractor.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert extractor.feed(": 2}") == [{"b": 2}]
+    assert not extractor.done
+    assert extractor.feed("] 多余的说明 [3]") == []
+    assert extractor.done
+    assert extractor.value == [{"a": 1}, {"b": 2}]
+
+
+def test_malformed_element_does_not_stop_array() -> None:
+    items = feed_all(['[{"a":1},', '{"b":2,},', '{"c":3}]'])
+    assert items[0] == {"a": 1}
+    assert isinstance(items[1], MalformedElement)
+    assert items[1].text == '{"b":2,}'
+    assert items[2] == {"c": 3}
+
+
+def test_incomplete_value() -> None:
+    with pytest.raises(ValueError, match="不完整"):
+        extract_json('{"a": "}')
+    with pytest.raises(ValueError, match="不完整"):
+        extract_json("没有 JSON")
+
+
+@pytest.mark.anyio
+async def test_iter_json_array_continues_after_malformed_element() -> None:
+    async def deltas() -> AsyncIterator[str]:
+        for chunk in ['说明 [{"a":1},', '{"b":2,},', '{"c":3}]', "\n结束"]:
+            yield chunk
+
+    items = [item async for item in iter_json_array(deltas())]
+    assert [type(item) for item in items] == [dict, MalformedElement, dict]
+    assert items[2] == {"c": 3}
+
+
+class Item(BaseModel):
+    b: int
+
+
+@pytest.mark.anyio
+async def test_parse_item_repairs_malformed_element(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    repaired: list[str] = []
+
+    async def repair(content: str, *_: object) -> str:
+        repaired.append(content)
+        return '{"b": 2}'
+
+    monkeypatch.setattr(structured, "_repair", repair)
+    monkeypatch.setitem(structured.OUTPUT_MODELS, "test/item", Item)
+    (element,) = feed_all(['[{"b":2,}]'])
+    assert await structured.parse_item("test/item", element) == {"b": 2}
+    # 只把出错的元素原文交给模型修复
+    assert repaired == ['{"b":2,}']
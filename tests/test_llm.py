@@ -0,0 +1,69 @@
+from collections.abc import AsyncGenerator, AsyncIterator
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+
+from app.services import llm
+from app.services.utils import CompletionMessage
+
+pytestmark = pytest.mark.anyio
+
+
+def chunk(text: str) -> Any:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None
+    )
+
+
+class FakeStream:
+    """模拟 openai.AsyncStream, 记录是否已关闭"""
+
+    def __init__(self, texts: list[str]) -> None:
+        self.texts = texts
+        self.closed = False
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._chunks()
+
+    async def _chunks(self) -> AsyncIterator[Any]:
+        for text in self.texts:
+            yield chunk(text)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def streams(monkeypatch: pytest.MonkeyPatch) -> list[FakeStream]:
+    """替换 OpenAI 客户端, 每次流式调用返回一个新的 FakeStream"""
+    created: list[FakeStream] = []
+
+    async def create(**_: Any) -> FakeStream:
+        created.append(FakeStream(["一", "二", "三"]))
+        return created[-1]
+
+    completions = SimpleNamespace(create=create)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(llm, "get_openai_client", lambda: (client, "test"))
+    return created
+
+
+async def test_stream_closes_response_when_consumer_stops_early(
+    streams: list[FakeStream],
+) -> None:
+    message = CompletionMessage().text("提前停止")
+    deltas = cast("AsyncGenerator[str]", llm.stream(message, task="test/stream"))
+    assert await anext(deltas) == "一"
+    await deltas.aclose()
+    assert len(streams) == 1
+    assert streams[0].closed
+
+
+async def test_stream_closes_response_when_exhausted(
+    streams: list[FakeStream],
+) -> None:
+    message = CompletionMessage().text("完整输出")
+    deltas = [delta async for delta in llm.stream(message, task="test/stream")]
+    assert deltas == ["一", "二", "三"]
+    assert streams[0].closed
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import Connection, insert, inspect, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db import KnowledgePoint, Question, run_migrations
+from app.db.config import Base
+from app.db.migrations import MIGRATIONS, schema_version
+from app.db.models.question import question_knowledge_association as link
+
+pytestmark = pytest.mark.anyio
+
+
+def create_legacy_schema(conn: Connection) -> None:
+    """引入迁移之前的数据库: 按模型建表, 没有索引与 schema_version"""
+    Base.metadata.create_all(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(conn)
+
+
+async def test_upgrade_merges_duplicate_knowledge_points(
+    database: AsyncEngine,
+) -> None:
+    async with database.begin() as conn:
+        await conn.run_sync(create_legacy_schema)
+        point = {"name": "分数", "subject": "数学", "level": 1}
+        await conn.execute(
+            insert(KnowledgePoint), [{"id": "kp-1"} | point, {"id": "kp-2"} | point]
+        )
+        await conn.execute(
+            insert(KnowledgePoint).values(
+                id="kp-3", name="约分", subject="数学", level=2, parent_id="kp-2"
+            )
+        )
+        question = {"title": "题目", "question_type": "单选", "answer": "A"}
+        await conn.execute(
+            insert(Question), [{"id": "q-1"} | question, {"id": "q-2"} | question]
+        )
+        await conn.execute(
+            insert(link),
+            [
+                {"question_id": "q-1", "knowledge_point_id": "kp-1"},
+                {"question_id": "q-1", "knowledge_point_id": "kp-2"},
+                {"question_id": "q-2", "knowledge_point_id": "kp-2"},
+            ],
+        )
+
+    await run_migrations()
+
+    async with database.connect() as conn:
+        versions = await conn.scalars(select(schema_version.c.version))
+        assert set(versions) == {migration.version for migration in MIGRATIONS}
+
+        points = await conn.execute(
+            select(KnowledgePoint.id, KnowledgePoint.parent_id).order_by(
+                KnowledgePoint.id
+            )
+        )
+        assert points.all() == [("kp-1", None), ("kp-3", "kp-1")]
+
+        links = await conn.execute(
+            select(link.c.question_id, link.c.knowledge_point_id).order_by(
+                link.c.question_id
+            )
+        )
+        assert links.all() == [("q-1", "kp-1"), ("q-2", "kp-1")]
+
+        indexes = await conn.run_sync(
+            lambda sync: inspect(sync).get_indexes("knowledge_points")
+        )
+        unique = {index["name"] for index in indexes if index["unique"]}
+        assert "ux_knowledge_points_name_subject" in unique
@@ -0,0 +1,118 @@
+from typing import Any
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db import (
+    CrossDisciplineCase,
+    InteractiveActivity,
+    MistakeRecord,
+    Question,
+    ScenarioSimulation,
+    TraditionalStory,
+    open_session,
+)
+from app.routers._pagination import keyset
+
+pytestmark = pytest.mark.anyio
+
+# (模型, 筛选条件, 应使用的索引)
+FILTERED_PAGES: list[tuple[Any, dict[str, Any], str]] = [
+    (Question, {"subject": "数学"}, "ix_questions_subject_created"),
+    (
+        Question,
+        {"subject": "数学", "grade": "三年级"},
+        "ix_questions_subject_grade_created",
+    ),
+    (Question, {"grade": "三年级"}, "ix_questions_grade_created"),
+    (Question, {"question_type": "单选"}, "ix_questions_type_created"),
+    (Question, {"difficulty": 3}, "ix_questions_difficulty_created"),
+    (MistakeRecord, {"student_id": "s1"}, "ix_mistake_records_student_created"),
+    (
+        MistakeRecord,
+        {"student_id": "s1", "is_resolved": False},
+        "ix_mistake_records_student_resolved_created",
+    ),
+    (TraditionalStory, {"dynasty": "汉"}, "ix_traditional_stories_dynasty_created"),
+    (TraditionalStory, {"theme": "爱国"}, "ix_traditional_stories_theme_created"),
+    (
+        TraditionalStory,
+        {"dynasty": "汉", "theme": "爱国"},
+        "ix_traditional_stories_dynasty_theme_created",
+    ),
+    (
+        CrossDisciplineCase,
+        {"main_discipline": "数学"},
+        "ix_cross_discipline_case_main_discipline_created",
+    ),
+    (
+        InteractiveActivity,
+        {"subject": "语文"},
+        "ix_interactive_activities_subject_created",
+    ),
+    (
+        InteractiveActivity,
+        {"grade": "三年级"},
+        "ix_interactive_activities_grade_created",
+    ),
+    (
+        InteractiveActivity,
+        {"subject": "语文", "grade": "三年级"},
+        "ix_interactive_activities_subject_grade_created",
+    ),
+    (
+        InteractiveActivity,
+        {"activity_type": "game"},
+        "ix_interactive_activities_type_created",
+    ),
+    (
+        ScenarioSimulation,
+        {"subject": "历史"},
+        "ix_scenario_simulations_subject_created",
+    ),
+    (ScenarioSimulation, {"grade": "五年级"}, "ix_scenario_simulations_grade_created"),
+    (
+        ScenarioSimulation,
+        {"subject": "历史", "grade": "五年级"},
+        "ix_scenario_simulations_subject_grade_created",
+    ),
+    (
+        ScenarioSimulation,
+        {"scenario_type": "historical"},
+        "ix_scenario_simulations_type_created",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    ("model", "filters", "index"),
+    FILTERED_PAGES,
+    ids=[f"{m.__tablename__}:{','.join(f)}" for m, f, _ in FILTERED_PAGES],
+)
+@pytest.mark.parametrize("after", [None, ["2026-01-01 00:00:00", "x"]])
+async def test_filtered_page_reads_index_in_order(
+    client: object,  # noqa: ARG001 按迁移建好结构
+    database: AsyncEngine,
+    model: Any,
+    filters: dict[str, Any],
+    index: str,
+    after: list[Any] | None,
+) -> None:
+    query = select(model).filter_by(**filters)
+    page = keyset(query, (model.created_at, model.id), after, 50)
+    sql = page.compile(database.sync_engine, compile_kwargs={"literal_binds": True})
+    async with database.connect() as conn:
+        plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+        detail = "; ".join(row.detail for row in plan)
+    # 在筛选索引上定位后按序读取一页, 不需要额外排序
+    assert f"USING INDEX {index}" in detail or f"COVERING INDEX {index}" in detail
+    assert "TEMP B-TREE" not in detail
+
+
+async def test_created_at_defaults_to_insert_time(client: object) -> None:  # noqa: ARG001
+    async with open_session() as db:
+        db.add(Question(id="q-1", title="题目", question_type="单选", answer="A"))
+    async with open_session() as db:
+        question = await db.get_one(Question, "q-1")
+        assert question.created_at
@@ -0,0 +1,111 @@
+from collections.abc import Callable
+
+import pytest
+from httpx import AsyncClient
+
+from app.db import KnowledgePoint, Question, open_session
+
+from .conftest import count_queries
+
+pytestmark = pytest.mark.anyio
+
+URL = "/api/question_bank/questions"
+
+
+async def seed(count: int, start: int = 0) -> None:
+    """写入 count 道题目, 属性按序号轮换, 每道题关联两个知识点"""
+    async with open_session() as db:
+        points = {
+            (name, subject): KnowledgePoint(
+                id=f"kp-{subject}-{name}", name=name, subject=subject
+            )
+            for subject in ("数学", "语文")
+            for name in ("分数", "方程", "古诗")
+        }
+        for point in points.values():
+            await db.merge(point)
+        await db.flush()
+
+        for i in range(start, start + count):
+            subject = ("数学", "语文")[i % 2]
+            names = (("分数", "方程"), ("方程", "古诗"), ("古诗", "分数"))[i % 3]
+            db.add(
+                Question(
+                    id=f"q-{i:05d}",
+                    title=f"题目 {i}",
+                    question_type="填空" if i % 4 == 0 else "单选",
+                    subject=subject,
+                    grade=("三年级", "四年级", "五年级")[i % 3],
+                    difficulty=i % 5 + 1,
+                    answer="A",
+                    created_at=f"2026-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}",
+                    knowledge_points=[
+                        await db.get_one(KnowledgePoint, f"kp-{subject}-{name}")
+                        for name in names
+                    ],
+                )
+            )
+
+
+async def list_questions(client: AsyncClient, **params: str | int) -> list[dict]:
+    response = await client.get(URL, params={"limit": 200, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_query_count_does_not_grow_with_rows(client: AsyncClient) -> None:
+    await seed(10)
+    with count_queries() as few:
+        assert len(await list_questions(client)) == 10
+
+    await seed(40, start=10)
+    with count_queries() as many:
+        questions = await list_questions(client)
+    assert len(questions) == 50
+    assert all(len(q["knowledge_points"]) == 2 for q in questions)
+    assert many[0] == few[0]
+
+
+async def test_query_count_with_filters(client: AsyncClient) -> None:
+    await seed(10)
+    with count_queries() as few:
+        await list_questions(client, subject="数学", knowledge_point="分数")
+
+    await seed(40, start=10)
+    with count_queries() as many:
+        assert await list_questions(client, subject="数学", knowledge_point="分数")
+    assert many[0] == few[0]
+
+
+@pytest.mark.parametrize(
+    ("params", "expected"),
+    [
+        ({"subject": "语文"}, lambda i: i % 2 == 1),
+        ({"grade": "四年级"}, lambda i: i % 3 == 1),
+        ({"question_type": "填空"}, lambda i: i % 4 == 0),
+        ({"difficulty": 3}, lambda i: i % 5 == 2),
+        ({"knowledge_point": "古诗"}, lambda i: i % 3 != 0),
+        ({"subject": "数学", "difficulty": 1}, lambda i: i % 10 == 0),
+    ],
+)
+async def test_filters(
+    client: AsyncClient, params: dict[str, str | int], expected: Callable[[int], bool]
+) -> None:
+    await seed(30)
+    questions = await list_questions(client, **params)
+    ids = {f"q-{i:05d}" for i in range(30) if expected(i)}
+    assert {q["id"] for q in questions} == ids
+    # 按创建时间从新到旧
+    assert [q["id"] for q in questions] == sorted(ids, reverse=True)
+
+
+async def test_pages_follow_cursor(client: AsyncClient) -> None:
+    await seed(25)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10} | ({"cursor": cursor} if cursor else {})
+        response = await client.get(URL, params=params)
+        seen += [q["id"] for q in response.json()]
+        if not (cursor := response.headers.get("X-Next-Cursor")):
+            break
+    assert seen == [f"q-{i:05d}" for i in reversed(range(25))]
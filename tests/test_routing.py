@@ -0,0 +1,74 @@
+import pytest
+from httpx import AsyncClient
+
+from app.routers import llm as llm_router
+from app.services.routing import ModelRouter
+
+pytestmark = pytest.mark.anyio
+
+URL = "/api/llm/routing"
+UPDATE = {"models": {"fast": "fast-model"}, "timeouts": {"fast": 5}}
+
+
+@pytest.fixture(autouse=True)
+def router(monkeypatch: pytest.MonkeyPatch) -> ModelRouter:
+    """每个测试使用独立的路由表, 修改不影响其他测试"""
+    router = ModelRouter()
+    monkeypatch.setattr(llm_router, "model_router", router)
+    return router
+
+
+async def test_update_disabled_without_admin_token(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch, router: ModelRouter
+) -> None:
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    response = await client.put(URL, json=UPDATE)
+    assert response.status_code == 403
+    assert router.tiers["fast"].model != "fast-model"
+
+
+async def test_update_requires_matching_token(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch, router: ModelRouter
+) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    for headers in ({}, {"Authorization": "Bearer wrong"}):
+        response = await client.put(URL, json=UPDATE, headers=headers)
+        assert response.status_code == 401
+    assert router.tiers["fast"].model != "fast-model"
+
+    response = await client.put(
+        URL, json=UPDATE, headers={"Authorization": "Bearer secret"}
+    )
+    assert response.status_code == 200
+    assert response.json()["tiers"]["fast"]["model"] == "fast-model"
+    assert router.tiers["fast"].timeout == 5
+
+
+@pytest.mark.parametrize("seconds", [0, -1])
+async def test_update_rejects_non_positive_timeout(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+    router: ModelRouter,
+    seconds: float,
+) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = await client.put(
+        URL,
+        json={"timeouts": {"fast": seconds}},
+        headers={"Authorization": "Bearer secret"},
+    )
+    assert response.status_code == 422
+    assert router.tiers["fast"].timeout > 0
+
+
+def test_configure_rejects_non_positive_timeout() -> None:
+    router = ModelRouter()
+    with pytest.raises(ValueError, match="大于 0"):
+        router.configure(timeouts={"fast": 0})
+    assert router.tiers["fast"].timeout > 0
+
+
+async def test_routing_is_readable_without_token(client: AsyncClient) -> None:
+    response = await client.get(URL)
+    assert response.status_code == 200
+    assert set(response.json()["tiers"]) == {"fast", "standard", "quality"}
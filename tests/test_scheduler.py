@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from app.services.utils import LLMScheduler, Priority, ProviderOverloaded
+from app.services.utils import _PriorityLimiter as PriorityLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_release_hands_slot_to_highest_priority() -> None:
+    limiter = PriorityLimiter(1)
+    await limiter.acquire(Priority.STANDARD)
+    order: list[int] = []
+
+    async def wait(priority: int) -> None:
+        await limiter.acquire(priority)
+        order.append(priority)
+
+    # 同优先级先到先得
+    waiters = [asyncio.create_task(wait(p)) for p in (2, 0, 1, 0)]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 4
+
+    for _ in waiters:
+        limiter.release()
+        await asyncio.sleep(0)
+        # 名额直接转交, 占用数不变
+        assert limiter.active == 1
+    assert order == [0, 0, 1, 2]
+
+    limiter.release()
+    assert limiter.active == 0
+    assert limiter.waiting == 0
+
+
+async def test_cancelled_waiter_returns_handed_over_slot() -> None:
+    limiter = PriorityLimiter(1)
+    await limiter.acquire(0)
+    first = asyncio.create_task(limiter.acquire(0))
+    second = asyncio.create_task(limiter.acquire(1))
+    await asyncio.sleep(0)
+
+    # 名额转交给 first 后, first 在恢复运行前被取消
+    limiter.release()
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    await asyncio.wait_for(second, 1)
+    assert limiter.active == 1
+    assert limiter.waiting == 0
+
+
+async def test_waiter_cancelled_before_release_is_skipped() -> None:
+    limiter = PriorityLimiter(1)
+    await limiter.acquire(0)
+    waiter = asyncio.create_task(limiter.acquire(0))
+    await asyncio.sleep(0)
+
+    # release() 在被取消的任务恢复之前弹出它的等待项
+    waiter.cancel()
+    limiter.release()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert limiter.active == 0
+    assert limiter.waiting == 0
+
+
+async def test_full_queue_rejects_with_retry_after(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("LLM_MAX_QUEUE", "1")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "1")
+    monkeypatch.setenv("TEST_RATE_LIMIT", "0")
+    scheduler = LLMScheduler()
+    release = asyncio.Event()
+
+    async def call() -> None:
+        async with scheduler.slot("test"):
+            await release.wait()
+
+    running = asyncio.create_task(call())
+    queued = asyncio.create_task(call())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ProviderOverloaded) as rejected:
+        async with scheduler.slot("test", Priority.INTERACTIVE):
+            pass
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+
+    release.set()
+    await asyncio.gather(running, queued)
+    async with scheduler.slot("test"):
+        pass
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.services.utils import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_callers_share_one_call() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def call() -> str:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "结果"
+
+    callers = [asyncio.create_task(flight.do("key", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert "key" in flight
+    release.set()
+
+    assert await asyncio.gather(*callers) == ["结果"] * 3
+    assert calls == 1
+    assert "key" not in flight
+
+
+async def test_different_keys_do_not_coalesce() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+
+    async def call(value: str) -> str:
+        await asyncio.sleep(0)
+        return value
+
+    first = flight.do("a", lambda: call("a"))
+    second = flight.do("b", lambda: call("b"))
+    assert await asyncio.gather(first, second) == ["a", "b"]
+
+
+async def test_shared_call_survives_caller_cancellation() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+    started, release = asyncio.Event(), asyncio.Event()
+    cancelled = False
+
+    async def call() -> str:
+        nonlocal cancelled
+        started.set()
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return "结果"
+
+    leader = asyncio.create_task(flight.do("key", call))
+    follower = asyncio.create_task(flight.do("key", call))
+    await started.wait()
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    release.set()
+
+    assert await follower == "结果"
+    assert not cancelled
+
+
+async def test_error_is_shared_and_not_cached() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+    attempts = 0
+
+    async def call() -> str:
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        raise ValueError("失败")
+
+    results = await asyncio.gather(
+        flight.do("key", call), flight.do("key", call), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert attempts == 1
+
+    with pytest.raises(ValueError, match="失败"):
+        await flight.do("key", call)
+    assert attempts == 2
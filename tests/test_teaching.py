@@ -0,0 +1,48 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+
+from app.routers import teaching
+from app.services.teaching_plan import TeachingPlanGenerator
+
+pytestmark = pytest.mark.anyio
+
+
+async def stream_plan(client: AsyncClient) -> str:
+    response = await client.post(
+        "/api/teaching/generate_plan/stream",
+        data={"grade": "三年级"},
+        files={"images": ("page.png", b"image", "image/png")},
+    )
+    assert response.status_code == 200
+    return response.text
+
+
+async def test_stream_without_plan_reports_error(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def generate_stream(*_: Any) -> AsyncIterator[str]:
+        return
+        yield
+
+    monkeypatch.setattr(TeachingPlanGenerator, "generate_stream", generate_stream)
+    cached = dict(teaching.teaching_plan_cache)
+    body = await stream_plan(client)
+    assert "event: error" in body
+    assert "event: done" not in body
+    assert teaching.teaching_plan_cache == cached
+
+
+async def test_stream_saves_plan(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def generate_stream(*_: Any) -> AsyncIterator[str]:
+        yield "# 教案\n"
+        yield "内容"
+
+    monkeypatch.setattr(TeachingPlanGenerator, "generate_stream", generate_stream)
+    body = await stream_plan(client)
+    assert "event: done" in body
+    assert "# 教案\n内容" in teaching.teaching_plan_cache.values()
@@ -0,0 +1,79 @@
+from typing import Any
+
+import pytest
+
+from app.services import tokens
+from app.services.tokens import PromptTooLong, count_tokens, fit_prompt, truncate
+
+TASK = "test/prompt"
+
+
+@pytest.fixture(autouse=True)
+def template(monkeypatch: pytest.MonkeyPatch) -> None:
+    """按启发式估算 token 数, 模板为各参数按名称顺序拼接"""
+    monkeypatch.setattr(tokens, "_encoding", lambda: None)
+
+    def render(_: str, **params: Any) -> str:
+        return "\n".join(f"{name}: {params[name]}" for name in sorted(params))
+
+    monkeypatch.setattr(tokens.prompts, "render", render)
+
+
+def budget(monkeypatch: pytest.MonkeyPatch, value: int) -> None:
+    monkeypatch.setitem(tokens.TOKEN_BUDGET, TASK, value)
+
+
+def test_prompt_within_budget_is_unchanged(monkeypatch: pytest.MonkeyPatch) -> None:
+    budget(monkeypatch, 100)
+    prompt = fit_prompt(TASK, trim={"story": 1}, story="故事", grade="三年级")
+    assert prompt == "grade: 三年级\nstory: 故事"
+
+
+def test_trims_lowest_priority_first(monkeypatch: pytest.MonkeyPatch) -> None:
+    budget(monkeypatch, 500)
+    story, notes = "甲" * 400, "乙" * 300
+    prompt = fit_prompt(
+        TASK, trim={"story": 1, "notes": 2}, story=story, notes=notes, grade="三年级"
+    )
+    assert count_tokens(prompt) <= 500
+    # 先裁剪 story 即可满足上限, notes 与不可裁剪的参数保持原样
+    assert f"notes: {notes}" in prompt
+    assert "grade: 三年级" in prompt
+    assert tokens.TRIM_MARKER in prompt
+    assert "甲" * 400 not in prompt
+
+
+def test_trims_next_parameter_when_first_is_not_enough(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    budget(monkeypatch, 200)
+    prompt = fit_prompt(
+        TASK, trim={"story": 1, "notes": 2}, story="甲" * 400, notes="乙" * 300
+    )
+    assert count_tokens(prompt) <= 200
+    assert "乙" * 300 not in prompt
+
+
+def test_over_budget_without_strict_returns_prompt(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    budget(monkeypatch, 10)
+    prompt = fit_prompt(TASK, trim={}, content="教案" * 50)
+    assert prompt == f"content: {'教案' * 50}"
+
+
+def test_strict_raises_413(monkeypatch: pytest.MonkeyPatch) -> None:
+    budget(monkeypatch, 10)
+    with pytest.raises(PromptTooLong) as error:
+        fit_prompt(TASK, trim={}, strict=True, content="教案" * 50)
+    assert error.value.status_code == 413
+
+
+def test_truncate_keeps_head_and_tail() -> None:
+    text = "开头" + "中" * 500 + "结尾"
+    result = truncate(text, 100)
+    assert count_tokens(result) <= 100
+    assert result.startswith("开头")
+    assert result.endswith("结尾")
+    assert tokens.TRIM_MARKER in result
+    assert truncate("短文本", 100) == "短文本"